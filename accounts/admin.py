@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as DefaultUserAdmin
 from django.utils.translation import gettext_lazy as _
 
 from django.contrib.auth import get_user_model
-from .models import Profile, Relation
+from .models import Profile, Relation, RelationJob
 from .forms import *
 
 User = get_user_model()
@@ -58,3 +58,10 @@ class RelationAdmin(admin.ModelAdmin):
     )
 
     list_editable = ('state',)
+
+
+@admin.register(RelationJob)
+class RelationJobAdmin(admin.ModelAdmin):
+    list_display = ('profile', 'kind', 'status', 'processed', 'total', 'created', 'finished',)
+    list_filter = ('kind', 'status',)
+    readonly_fields = ('profile', 'kind', 'total', 'processed', 'error', 'created', 'finished',)
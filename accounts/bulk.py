@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Profile, Relation
+
+# most targets a single bulk request may name
+RELATION_BULK_MAX_TARGETS = getattr(settings, 'RELATION_BULK_MAX_TARGETS', 200)
+
+FOLLOWED, REQUESTED, BLOCKED = Relation.RelationState.FOLLOWED, Relation.RelationState.REQUESTED, \
+    Relation.RelationState.BLOCKED
+
+# per target results
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def _resolve(actor, uids):
+    """
+    the targets named by `uids` as `{uid: (pk, private)}` and the states of the relations between them and `actor`,
+    in both directions, as `{(actor id, account id): state}`. two queries whatever the number of targets.
+    """
+    targets = {uid: (pk, private) for uid, pk, private in
+               Profile.objects.filter(uid__in=uids).values_list('uid', 'pk', 'private')}
+    pks = [pk for pk, _ in targets.values()]
+    relations = Relation.objects.filter(Q(actor=actor.pk, account__in=pks) | Q(actor__in=pks, account=actor.pk))
+    states = {(actor_id, account_id): state for actor_id, account_id, state in
+              relations.values_list('actor', 'account', 'state')}
+    return targets, states
+
+
+def _targets(actor, uids, results):
+    """
+    `(uid, pk, private, state of the actor's relation to it)` of the targets that exist, are not the actor and didn't
+    block it, in request order. the results of the others are set in `results`.
+    """
+    targets, states = _resolve(actor, uids)
+    for uid in dict.fromkeys(uids):
+        pk, private = targets.get(uid, (None, None))
+        if pk is None or states.get((pk, actor.pk)) == BLOCKED:
+            results[uid] = NOT_FOUND  # blocked actors can't see their blockers, as with single targets
+        elif pk == actor.pk:
+            results[uid] = SELF
+        else:
+            yield uid, pk, private, states.get((actor.pk, pk))
+
+
+def _changed(pairs, state):
+    from .signals import relations_changed
+    if pairs:
+        relations_changed.send(sender=Relation, pairs=pairs, state=state)
+
+
+def follow(actor, uids):
+    """
+    follows the profiles of `uids` (sends requests to the private ones) with a single `bulk_create`.
+    returns `{uid: result}`.
+    """
+    results, relations = {}, []
+    for uid, pk, private, state in _targets(actor, uids, results):
+        if state is not None:
+            results[uid] = 'already_related'
+            continue
+
+        relation = Relation(actor_id=actor.pk, account_id=pk, state=REQUESTED if private else FOLLOWED)
+        relations.append(relation)
+        results[uid] = 'requested' if private else 'followed'
+
+    Relation.objects.bulk_create(relations, ignore_conflicts=True)
+    for state in (FOLLOWED, REQUESTED):
+        _changed([(actor.pk, r.account_id) for r in relations if r.state == state], state)
+    return results
+
+
+def unfollow(actor, uids):
+    results, pks = {}, []
+    for uid, pk, private, state in _targets(actor, uids, results):
+        if state == FOLLOWED:
+            pks.append(pk)
+        results[uid] = 'unfollowed' if state == FOLLOWED else 'not_following'
+
+    Relation.objects.filter(actor=actor.pk, account__in=pks, state=FOLLOWED).delete()
+    _changed([(actor.pk, pk) for pk in pks], None)
+    return results
+
+
+def block(actor, uids):
+    """
+    blocks the profiles of `uids`: existing relations of the actor to them are updated in one query, the missing
+    ones created with one `bulk_create` and their relations to the actor (what `terminate_reversed_relations` does
+    for single blocks) deleted with a single query.
+    """
+    results, existing, missing = {}, [], []
+    for uid, pk, private, state in _targets(actor, uids, results):
+        if state == BLOCKED:
+            results[uid] = 'already_blocked'
+            continue
+
+        (missing if state is None else existing).append(pk)
+        results[uid] = 'blocked'
+
+    blocked = existing + missing
+    with transaction.atomic():
+        Relation.objects.filter(actor=actor.pk, account__in=existing).update(state=BLOCKED)
+        Relation.objects.bulk_create(
+            (Relation(actor_id=actor.pk, account_id=pk, state=BLOCKED) for pk in missing), ignore_conflicts=True
+        )
+        reversed_relations = Relation.objects.filter(~Q(state=BLOCKED), actor__in=blocked, account=actor.pk)
+        terminated = list(reversed_relations.values_list('actor', flat=True))
+        reversed_relations.delete()
+
+    _changed([(actor.pk, pk) for pk in blocked], BLOCKED)
+    _changed([(pk, actor.pk) for pk in terminated], None)
+    return results
+
+
+def unblock(actor, uids):
+    results, pks = {}, []
+    for uid, pk, private, state in _targets(actor, uids, results):
+        if state == BLOCKED:
+            pks.append(pk)
+        results[uid] = 'unblocked' if state == BLOCKED else 'not_blocked'
+
+    Relation.objects.filter(actor=actor.pk, account__in=pks, state=BLOCKED).delete()
+    _changed([(actor.pk, pk) for pk in pks], None)
+    return results
+
+
+OPERATIONS = {'follow': follow, 'unfollow': unfollow, 'block': block, 'unblock': unblock}
@@ -0,0 +1,123 @@
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Relation
+
+FOLLOWED, REQUESTED, BLOCKED = Relation.RelationState.FOLLOWED, Relation.RelationState.REQUESTED, \
+    Relation.RelationState.BLOCKED
+
+# kind of adjacency -> (field the profile is matched against, field holding the neighbours, relation state)
+KINDS = {
+    'followers': ('account', 'actor', FOLLOWED),
+    'followings': ('actor', 'account', FOLLOWED),
+    'requests': ('account', 'actor', REQUESTED),
+    'blocked': ('actor', 'account', BLOCKED),
+}
+
+
+class SocialGraph:
+    """
+    per process cache of the follow graph. the neighbours of a profile are kept, per kind, as a sorted `array` of
+    64 bit ids (8 bytes per edge), loaded from `Relation` on first use.
+
+    relations saved or deleted in this process patch the loaded arrays in place. changes made by other processes
+    are picked up when an array expires, `ttl` seconds after it was loaded. at most `max_entries` arrays are kept,
+    the least recently used ones are evicted first.
+    """
+
+    def __init__(self, enabled=False, max_entries=10000, ttl=60):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (profile id, kind) -> (loaded at, array of ids)
+        self._lock = threading.RLock()
+
+    def neighbours(self, profile_id, kind):
+        """a copy of the sorted ids of the `kind` neighbours of the profile"""
+        ids = self._get(profile_id, kind)
+        with self._lock:
+            return array('q', ids)
+
+    def contains(self, profile_id, kind, other_id):
+        ids = self._get(profile_id, kind)
+        with self._lock:
+            index = bisect_left(ids, other_id)
+            return index < len(ids) and ids[index] == other_id
+
+    def _get(self, profile_id, kind):
+        key = (profile_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        ids = self._load(profile_id, kind)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), ids)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return ids
+
+    @staticmethod
+    def _load(profile_id, kind):
+        field, neighbour, state = KINDS[kind]
+        relations = Relation.objects.filter(**{field: profile_id, 'state': state})
+        return array('q', relations.order_by(neighbour).values_list(neighbour, flat=True))
+
+    def _patch(self, profile_id, kind, other_id, add):
+        entry = self._entries.get((profile_id, kind))
+        if entry is None:
+            return
+
+        ids = entry[1]
+        index = bisect_left(ids, other_id)
+        present = index < len(ids) and ids[index] == other_id
+        if add and not present:
+            ids.insert(index, other_id)
+        elif not add and present:
+            del ids[index]
+
+    def relation_changed(self, actor_id, account_id, state=None):
+        """patches the loaded arrays after the relation from `actor_id` to `account_id` got `state` (`None`: deleted)"""
+        with self._lock:
+            self._patch(actor_id, 'followings', account_id, add=state == FOLLOWED)
+            self._patch(actor_id, 'blocked', account_id, add=state == BLOCKED)
+            self._patch(account_id, 'followers', actor_id, add=state == FOLLOWED)
+            self._patch(account_id, 'requests', actor_id, add=state == REQUESTED)
+
+    def invalidate(self, *profile_ids):
+        with self._lock:
+            for profile_id in profile_ids:
+                for kind in KINDS:
+                    self._entries.pop((profile_id, kind), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def footprint(self):
+        """number of cached arrays and edges, and the bytes they take including the index around them"""
+        with self._lock:
+            arrays = [ids for _, ids in self._entries.values()]
+            size = sys.getsizeof(self._entries) + sum(
+                sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+                for key, entry in self._entries.items()
+            )
+
+        return {'entries': len(arrays), 'edges': sum(len(ids) for ids in arrays), 'bytes': size}
+
+
+graph = SocialGraph(
+    enabled=getattr(settings, 'SOCIAL_GRAPH_CACHE', False),
+    max_entries=getattr(settings, 'SOCIAL_GRAPH_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'SOCIAL_GRAPH_CACHE_TTL', 60),
+)
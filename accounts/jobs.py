@@ -0,0 +1,182 @@
+import atexit
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Profile, Relation, RelationJob
+
+logger = logging.getLogger(__name__)
+
+# how the jobs too large to run within the request get run, see `SyncRunner` and `ThreadRunner`
+RELATION_JOB_RUNNER = getattr(settings, 'RELATION_JOB_RUNNER', 'accounts.jobs.SyncRunner')
+RELATION_JOB_RUNNER_OPTIONS = getattr(settings, 'RELATION_JOB_RUNNER_OPTIONS', {})
+# relations changed per transaction
+RELATION_JOB_BATCH_SIZE = getattr(settings, 'RELATION_JOB_BATCH_SIZE', 1000)
+# jobs over at most this many relations are run within the request, as a single chunk by default
+RELATION_JOB_INLINE_LIMIT = getattr(settings, 'RELATION_JOB_INLINE_LIMIT', 1000)
+# seconds without progress after which a running job counts as abandoned (its process exited) and gets run again
+RELATION_JOB_STALE_AFTER = getattr(settings, 'RELATION_JOB_STALE_AFTER', 300)
+
+REQUESTED, FOLLOWED = Relation.RelationState.REQUESTED, Relation.RelationState.FOLLOWED
+
+
+def count_requests(profile_id):
+    return Relation.objects.filter(account=profile_id, state=REQUESTED).count()
+
+
+def accept_requests(job, batch_size):
+    """
+    turns the pending follow requests to the profile of `job` into follows, `batch_size` of them per transaction:
+    one UPDATE per chunk, whose side effects (timelines, caches, the social graph) are then applied in batch by the
+    receivers of `relations_changed`. stops if the profile turned private again in the meantime.
+    """
+    from .signals import relations_changed
+
+    while True:
+        with transaction.atomic():
+            if not Profile.objects.filter(pk=job.profile_id, private=False).exists():
+                return RelationJob.Status.CANCELLED
+
+            chunk = list(Relation.objects.select_for_update().filter(
+                account=job.profile_id, state=REQUESTED
+            ).order_by('id').values_list('id', 'actor')[:batch_size])
+            if not chunk:
+                return RelationJob.Status.DONE
+
+            Relation.objects.filter(pk__in=[pk for pk, _ in chunk]).update(state=FOLLOWED)
+            RelationJob.objects.filter(pk=job.pk).update(processed=F('processed') + len(chunk),
+                                                         heartbeat=timezone.now())
+
+        # after the commit, so that the caches can't get refilled from the old rows
+        relations_changed.send(sender=Relation, pairs=[(actor, job.profile_id) for _, actor in chunk], state=FOLLOWED)
+
+
+# kind -> (function counting the relations a job of that kind changes, function running it)
+KINDS = {
+    RelationJob.Kind.ACCEPT_REQUESTS: (count_requests, accept_requests),
+}
+
+
+class SyncRunner:
+    """runs the jobs right away, in the request (or command) submitting them"""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or RELATION_JOB_BATCH_SIZE
+
+    def submit(self, job_id):
+        self.run(job_id)
+
+    def run(self, job_id):
+        """runs the job unless it's not pending anymore (e.g. another runner claimed it), returns its final status"""
+        if not RelationJob.objects.filter(pk=job_id, status=RelationJob.Status.PENDING).update(
+                status=RelationJob.Status.RUNNING, heartbeat=timezone.now()):
+            return None
+
+        job = RelationJob.objects.get(pk=job_id)
+        error = ''
+        try:
+            status = KINDS[job.kind][1](job, self.batch_size)
+        except Exception as e:
+            logger.exception('relation job %d failed', job_id)
+            status, error = RelationJob.Status.FAILED, repr(e)
+
+        RelationJob.objects.filter(pk=job_id).update(status=status, error=error, finished=timezone.now())
+        return status
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class ThreadRunner(SyncRunner):
+    """
+    runs the jobs one after the other in a background thread of the process submitting them, so that the request
+    returns as soon as the job is created. jobs still pending when the process exits are left for the
+    `run_relation_jobs` command, which also runs again the ones interrupted midway once they are stale (see
+    `reclaim_stale`).
+    """
+
+    def __init__(self, batch_size=None, poll_interval=1.0):
+        super().__init__(batch_size)
+        self.poll_interval = poll_interval
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        atexit.register(self.stop)
+
+    def submit(self, job_id):
+        self._ensure_started()
+        self.queue.put(job_id)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='relation-jobs', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                try:
+                    job_id = self.queue.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+                self.run(job_id)
+                self.queue.task_done()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """waits for the submitted jobs to finish"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+            self._thread = None
+
+
+def reclaim_stale(stale_after=None):
+    """
+    puts the running jobs without progress for `stale_after` seconds back to pending, returns how many. running a
+    job again is safe: it only picks the relations still left to change, under a row lock.
+    """
+    stale_after = RELATION_JOB_STALE_AFTER if stale_after is None else stale_after
+    return RelationJob.objects.filter(
+        status=RelationJob.Status.RUNNING, heartbeat__lt=timezone.now() - timedelta(seconds=stale_after)
+    ).update(status=RelationJob.Status.PENDING)
+
+
+inline_runner = SyncRunner()
+relation_job_runner = import_string(RELATION_JOB_RUNNER)(**RELATION_JOB_RUNNER_OPTIONS)
+
+
+def start(profile, kind):
+    """
+    creates a job of `kind` for `profile`. small ones are run right away; the rest are handed to
+    `relation_job_runner` once the transaction commits.
+    """
+    count, _ = KINDS[kind]
+    job = RelationJob.objects.create(profile=profile, kind=kind, total=count(profile.pk))
+    if job.total <= RELATION_JOB_INLINE_LIMIT:
+        inline_runner.run(job.pk)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: relation_job_runner.submit(job.pk))
+    return job
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from accounts.jobs import SyncRunner, reclaim_stale
+from accounts.models import RelationJob
+
+
+class Command(BaseCommand):
+    help = 'runs the pending relation jobs and the stale running ones, e.g. left over when the process running ' \
+           'them exited. meant to run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--retry-running', action='store_true',
+                            help='runs all the jobs marked as running again, not only the stale ones, when no other '
+                                 'runner is alive')
+
+    def handle(self, *args, batch_size, retry_running, **options):
+        if retry_running:
+            RelationJob.objects.filter(status=RelationJob.Status.RUNNING).update(status=RelationJob.Status.PENDING)
+        else:
+            reclaim_stale()
+
+        runner = SyncRunner(batch_size=batch_size)
+        pending = RelationJob.objects.filter(status=RelationJob.Status.PENDING).order_by('created')
+        for job_id in pending.values_list('pk', flat=True):
+            status = runner.run(job_id)
+            if status is not None:
+                self.stdout.write(f'job {job_id}: {status}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounts.graph import SocialGraph, KINDS
+from accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'loads the social graph of the given number of profiles into a fresh cache and reports its memory footprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=1000)
+
+    def handle(self, *args, profiles, **options):
+        graph = SocialGraph(enabled=True, max_entries=profiles * len(KINDS), ttl=float('inf'))
+        for pk in Profile.objects.order_by('pk').values_list('pk', flat=True)[:profiles]:
+            for kind in KINDS:
+                graph.neighbours(pk, kind)
+
+        footprint = graph.footprint()
+        per_edge = footprint['bytes'] / footprint['edges'] if footprint['edges'] else 0
+        self.stdout.write(
+            f"{footprint['entries']} arrays, {footprint['edges']} edges, {footprint['bytes']} bytes "
+            f"({per_edge:.1f} bytes/edge)"
+        )
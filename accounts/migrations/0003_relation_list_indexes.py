@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_image_sources'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='relation',
+            index=models.Index(fields=['account', 'state', 'created', 'id'], name='relation_account_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relation',
+            index=models.Index(fields=['actor', 'state', 'created', 'id'], name='relation_actor_list_idx'),
+        ),
+    ]
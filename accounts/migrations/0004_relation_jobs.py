@@ -0,0 +1,36 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_relation_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('accept_requests', 'accept requests')], max_length=20, verbose_name='kind')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('cancelled', 'cancelled'), ('failed', 'failed')], default='pending', max_length=10, verbose_name='status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='total')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='processed')),
+                ('error', models.TextField(blank=True, default='', verbose_name='error')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='finished')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relation_jobs', to='accounts.profile', verbose_name='profile')),
+            ],
+            options={
+                'verbose_name': 'Relation Job',
+                'verbose_name_plural': 'Relation Jobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='relationjob',
+            index=models.Index(fields=['status', 'created'], name='relationjob_status_idx'),
+        ),
+    ]
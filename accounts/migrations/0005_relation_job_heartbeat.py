@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_relation_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relationjob',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='heartbeat'),
+        ),
+    ]
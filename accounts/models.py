@@ -1,11 +1,16 @@
 from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Q
 
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
+from images.models import ImageSource
+
 import uuid
 
 
@@ -87,6 +92,8 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     picture = models.ImageField(default="profile_pictures/default.jpg", upload_to='profile_pictures/', blank=True,
                                 verbose_name=_('profile picture'))
+    picture_source = models.ForeignKey(ImageSource, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                       related_name='+', verbose_name=_('picture source'))
 
     bio = models.CharField(max_length=100, default="", blank=True, verbose_name=_('bio'))
 
@@ -94,6 +101,9 @@ class Profile(models.Model):
     private = models.BooleanField(default=False)
     uid = models.UUIDField(default=uuid.uuid4, unique=True, blank=True, verbose_name=_('unique id'))
 
+    # visits of the profile's own user are not counted
+    visit_owner_field = 'user'
+
     def __str__(self):
         return f'{self.user}'
 
@@ -123,19 +133,89 @@ class Profile(models.Model):
     def blocked_users(self):
         return self.__class__.objects.filter(pk__in=self.block_list())
 
+    def can_view(self, viewer):
+        """whether `viewer` may see the posts of this profile: not blocked by it and, if it's private, following it"""
+        viewer_id = _pk(viewer)
+        if viewer_id == self.pk:
+            return True
+
+        if Relation.objects.is_blocked(self, viewer_id):
+            return False
+
+        return not self.is_private or Relation.objects.is_following(viewer_id, self)
+
     def change_state(self):
+        """
+        toggles the privacy of the profile. `profile_state_changed` is sent once a private profile is saved as public
+        (its receivers accept the pending requests, see `accounts.jobs`)
+        """
         from accounts.signals import profile_state_changed
-        if self.is_private:
-            profile_state_changed.send(sender=self.__class__, instance=self)
-
+        was_private = self.is_private
         self.private = not self.private
         self.save()
 
+        if was_private:
+            profile_state_changed.send(sender=self.__class__, instance=self)
+
     class Meta:
         verbose_name = _('Profile')
         verbose_name_plural = _('Profiles')
 
 
+def _pk(profile):
+    return profile.pk if isinstance(profile, models.Model) else profile
+
+
+RELATION_CACHE_TIMEOUT = getattr(settings, 'RELATION_CACHE_TIMEOUT', 300)
+
+
+class RelationManager(models.Manager):
+    @staticmethod
+    def pair_cache_key(first, second):
+        return 'relation:{}:{}'.format(*sorted((_pk(first), _pk(second))))
+
+    def pair_states(self, first, second):
+        """
+        the states of the relations between two profiles in both directions, as `{(actor id, account id): state}`.
+        answered with a single query over the (actor, account) unique index, then cached until one of the two
+        relations is saved or deleted.
+        """
+        key = self.pair_cache_key(first, second)
+        states = cache.get(key)
+        if states is None:
+            first, second = _pk(first), _pk(second)
+            relations = self.filter(Q(actor=first, account=second) | Q(actor=second, account=first))
+            states = {(actor, account): state for actor, account, state in
+                      relations.values_list('actor', 'account', 'state')}
+            cache.set(key, states, RELATION_CACHE_TIMEOUT)
+
+        return states
+
+    def invalidate_pair(self, first, second):
+        cache.delete(self.pair_cache_key(first, second))
+
+    def invalidate_pairs(self, pairs):
+        cache.delete_many([self.pair_cache_key(first, second) for first, second in pairs])
+
+    def get_state(self, actor, account):
+        return self.pair_states(actor, account).get((_pk(actor), _pk(account)))
+
+    # membership checks are answered by the social graph cache when it's enabled (`accounts.graph`). the lists of
+    # the profiles stay subqueries, the arrays of large accounts would not fit in the parameters of a query
+
+    def is_following(self, actor, account):
+        from .graph import graph
+        if graph.enabled:
+            return graph.contains(_pk(account), 'followers', _pk(actor))
+        return self.get_state(actor, account) == self.model.RelationState.FOLLOWED
+
+    def is_blocked(self, blocker, blocked):
+        from .graph import graph
+        if graph.enabled:
+            return graph.contains(_pk(blocker), 'blocked', _pk(blocked))
+        return self.get_state(blocker, blocked) == self.model.RelationState.BLOCKED
+
+
 class Relation(models.Model):
     class RelationState(models.TextChoices):
         FOLLOWED = 'FLW', 'FOLLOWED'
@@ -152,6 +232,8 @@ class Relation(models.Model):
 
     created = models.DateTimeField(auto_now_add=True, verbose_name=_('created'))
 
+    objects = RelationManager()
+
     def __str__(self):
         return f"{self.state}"
 
@@ -203,3 +285,42 @@ class Relation(models.Model):
         verbose_name = _('Relation')
         verbose_name_plural = _('Relations')
         unique_together = (('actor', 'account'),)
+        indexes = (
+            # the relation lists of a profile, paginated newest first
+            models.Index(fields=('account', 'state', 'created', 'id'), name='relation_account_list_idx'),
+            models.Index(fields=('actor', 'state', 'created', 'id'), name='relation_actor_list_idx'),
+        )
+
+
+class RelationJob(models.Model):
+    """a set based change of the relations of a profile, run in chunks by `accounts.jobs`"""
+
+    class Kind(models.TextChoices):
+        ACCEPT_REQUESTS = 'accept_requests', 'accept requests'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'pending'
+        RUNNING = 'running', 'running'
+        DONE = 'done', 'done'
+        CANCELLED = 'cancelled', 'cancelled'
+        FAILED = 'failed', 'failed'
+
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='relation_jobs',
+                                verbose_name=_('profile'))
+    kind = models.CharField(_('kind'), max_length=20, choices=Kind.choices)
+    status = models.CharField(_('status'), max_length=10, choices=Status.choices, default=Status.PENDING)
+    total = models.PositiveIntegerField(_('total'), default=0)
+    processed = models.PositiveIntegerField(_('processed'), default=0)
+    error = models.TextField(_('error'), blank=True, default='')
+    created = models.DateTimeField(_('created'), auto_now_add=True)
+    # last progress of a running job, one that stays behind for long got abandoned by its runner
+    heartbeat = models.DateTimeField(_('heartbeat'), null=True, blank=True)
+    finished = models.DateTimeField(_('finished'), null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.kind} of {self.profile} ({self.status})'
+
+    class Meta:
+        verbose_name = _('Relation Job')
+        verbose_name_plural = _('Relation Jobs')
+        indexes = (models.Index(fields=('status', 'created'), name='relationjob_status_idx'),)
@@ -1,8 +1,14 @@
 import rest_framework.exceptions
+from django.db.models import CharField, Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
 from blog.models import Post
-from .models import User, Profile, Relation
+from blog.plans import SerializationPlan
+from images.serializers import RenditionsField
+from . import bulk
+from .models import User, Profile, Relation, RelationJob
 
 
 class UserRegistrationSerializer(serializers.HyperlinkedModelSerializer):
@@ -62,10 +68,32 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
 
+def _viewer_relation_state(request=None, **context):
+    """the state of the relation from the viewer to the outer profile, as a subquery"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return Value(None, output_field=CharField())
+    # by the viewer's user id, so the request doesn't need to load its profile
+    relations = Relation.objects.filter(account=OuterRef('pk'), actor__user=user.pk).values('state')
+    return Subquery(relations[:1])
+
+
+def _post_count(**context):
+    posts = Post.objects.filter(author=OuterRef('pk')).order_by().values('author').annotate(value=Count('id'))
+    return Coalesce(Subquery(posts.values('value')), 0, output_field=IntegerField())
+
+
 class ProfileSerializer(serializers.HyperlinkedModelSerializer):
     user = UserSerializer(read_only=True)
     relation = serializers.SerializerMethodField(method_name='get_state')
     num_posts = serializers.SerializerMethodField(method_name='get_num_posts')
+    picture_renditions = RenditionsField(source='picture_source')
+
+    plan = SerializationPlan(
+        select_related=('user', 'picture_source'),
+        prefetch_related=('picture_source__renditions',),
+        annotations={'relation_state': _viewer_relation_state, 'post_count': _post_count},
+    )
 
     class Meta:
         model = Profile
@@ -73,6 +101,7 @@ class ProfileSerializer(serializers.HyperlinkedModelSerializer):
             'url',
             'user',
             'picture',
+            'picture_renditions',
             'bio',
             'website',
             'private',
@@ -84,6 +113,8 @@ class ProfileSerializer(serializers.HyperlinkedModelSerializer):
         }
 
     def get_state(self, obj):
+        if hasattr(obj, 'relation_state'):
+            return obj.relation_state
         try:
             relation = Relation.objects.get(account=obj, actor=self.context.get('request').user.profile)
             return relation.state
@@ -91,55 +122,38 @@ class ProfileSerializer(serializers.HyperlinkedModelSerializer):
             pass
 
     def get_num_posts(self, obj):
+        if hasattr(obj, 'post_count'):
+            return obj.post_count
         return Post.objects.filter(author=obj).count()
 
 
-class RequestSerializer(serializers.ModelSerializer):
-    follow_requests = serializers.HyperlinkedRelatedField(read_only=True,
-                                                          view_name='accounts:profile-detail',
-                                                          lookup_field='uid',
-                                                          lookup_url_kwarg='uid',
-                                                          many=True)
+class RelatedProfileSerializer(serializers.ModelSerializer):
+    """
+    a profile on the other side of a relation (a follower, a followed or blocked account, a request), from the
+    `uid` and `username` annotations made by the relation lists of `ProfileViewSet`
+    """
+    url = serializers.SerializerMethodField()
+    username = serializers.CharField(read_only=True)
 
     class Meta:
-        model = Profile
-        fields = ('follow_requests',)
+        model = Relation
+        fields = ('url', 'username', 'created',)
 
+    def get_url(self, obj):
+        return reverse('accounts:profile-detail', kwargs={'uid': obj.uid}, request=self.context.get('request'))
 
-class FollowersSerializer(serializers.ModelSerializer):
-    profile_followers = serializers.HyperlinkedRelatedField(read_only=True,
-                                                            view_name='accounts:profile-detail',
-                                                            lookup_field='uid',
-                                                            lookup_url_kwarg='uid',
-                                                            many=True,
-                                                            )
 
-    class Meta:
-        model = Profile
-        fields = ('profile_followers',)
+class BulkRelationSerializer(serializers.Serializer):
+    uids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False,
+                                 max_length=bulk.RELATION_BULK_MAX_TARGETS)
 
 
-class FollowingsSerializer(serializers.ModelSerializer):
-    profile_followings = serializers.HyperlinkedRelatedField(read_only=True,
-                                                             view_name='accounts:profile-detail',
-                                                             lookup_field='uid',
-                                                             lookup_url_kwarg='uid',
-                                                             many=True,
-                                                             )
+class RelationJobSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
 
     class Meta:
-        model = Profile
-        fields = ('profile_followings',)
-
+        model = RelationJob
+        fields = ('url', 'kind', 'status', 'total', 'processed', 'error', 'created', 'finished',)
 
-class BlockListSerializer(serializers.ModelSerializer):
-    blocked_users = serializers.HyperlinkedRelatedField(read_only=True,
-                                                        view_name='accounts:profile-detail',
-                                                        lookup_field='uid',
-                                                        lookup_url_kwarg='uid',
-                                                        many=True,
-                                                        )
-
-    class Meta:
-        model = Profile
-        fields = ('blocked_users',)
+    def get_url(self, obj):
+        return reverse('accounts:profile-job', kwargs={'job_id': obj.pk}, request=self.context.get('request'))
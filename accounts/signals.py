@@ -1,19 +1,24 @@
 from django.db.models import Q
 from django.dispatch import receiver, Signal
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 
-from .models import User, Profile, Relation
+from .models import User, Profile, Relation, RelationJob
+from .graph import graph
+from . import jobs
+from images import pipeline
+from blog.response_cache import response_cache
 
 profile_state_changed = Signal()
 profile_blocked = Signal()
+# sent after relations got changed in bulk (a queryset update, a `bulk_create` or the delete of a set), with the
+# `pairs` of (actor id, account id) and their new `state` (`None` when they got deleted). its receivers handle the
+# whole set at once; deletes also send `post_delete` per row, whose receivers are idempotent with them
+relations_changed = Signal()
 
 
 @receiver(profile_state_changed, sender=Profile)
 def accept_requested_profiles_as_followed(sender, instance, *args, **kwargs):
-    requests = Relation.objects.filter(account=instance, state=Relation.RelationState.REQUESTED)
-    for relation in requests:
-        relation.state = Relation.RelationState.FOLLOWED
-        relation.save()
+    return jobs.start(instance, RelationJob.Kind.ACCEPT_REQUESTS)
 
 
 @receiver(profile_blocked, sender=Relation)
@@ -42,3 +47,57 @@ def delete_user(sender, instance, **kwargs):
     """
     user = instance.user
     user.delete()
+
+
+@receiver(post_save, sender=Relation)
+@receiver(post_delete, sender=Relation)
+def invalidate_relation_cache(sender, instance, **kwargs):
+    sender.objects.invalidate_pair(instance.actor_id, instance.account_id)
+
+
+@receiver(relations_changed, sender=Relation)
+def invalidate_relation_cache_in_bulk(sender, pairs, *args, **kwargs):
+    sender.objects.invalidate_pairs(pairs)
+
+
+@receiver(relations_changed, sender=Relation)
+def patch_social_graph_in_bulk(sender, pairs, state, *args, **kwargs):
+    for actor_id, account_id in pairs:
+        graph.relation_changed(actor_id, account_id, state)
+
+
+@receiver(post_save, sender=Relation)
+def patch_social_graph_on_save(sender, instance, **kwargs):
+    graph.relation_changed(instance.actor_id, instance.account_id, instance.state)
+
+
+@receiver(post_delete, sender=Relation)
+def patch_social_graph_on_delete(sender, instance, **kwargs):
+    graph.relation_changed(instance.actor_id, instance.account_id)
+
+
+@receiver(profile_blocked, sender=Relation)
+def invalidate_social_graph_on_block(sender, instance, **kwargs):
+    graph.invalidate(instance.actor_id, instance.account_id)
+
+
+@receiver(pre_save, sender=Profile)
+def link_picture_source(sender, instance, *args, **kwargs):
+    pipeline.link(instance, 'picture', 'picture_source')
+
+
+@receiver(post_save, sender=Profile)
+def queue_picture_renditions(sender, instance, *args, **kwargs):
+    pipeline.queue_renditions(instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(profile_state_changed, sender=Profile)
+def invalidate_cached_profile(sender, instance, *args, **kwargs):
+    response_cache.invalidate('profile', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_profile_of_user(sender, instance, created, *args, **kwargs):
+    if not created:
+        response_cache.invalidate('profile', *Profile.objects.filter(user=instance).values_list('pk', flat=True))
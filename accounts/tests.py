@@ -1,3 +1,291 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from blog.models import Post, TimelineEntry
+from . import jobs
+from .graph import graph
+from .models import User, Relation, RelationJob
+
+
+class TestCanView(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='author@test.local', username='author', password='pass').profile
+        cls.viewer = User.objects.create_user(email='viewer@test.local', username='viewer', password='pass').profile
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_profile(self):
+        self.assertTrue(self.author.can_view(self.viewer))
+
+    def test_private_profile_requires_following(self):
+        self.author.private = True
+        self.assertFalse(self.author.can_view(self.viewer))
+
+        Relation.objects.create(actor=self.viewer, account=self.author, state=Relation.RelationState.FOLLOWED)
+        self.assertTrue(self.author.can_view(self.viewer))
+
+    def test_blocked_viewer(self):
+        relation = Relation.objects.create(actor=self.author, account=self.viewer)
+        relation.block()
+        self.assertFalse(self.author.can_view(self.viewer))
+
+        relation.unblock()
+        self.assertTrue(self.author.can_view(self.viewer))
+
+    def test_pair_is_cached(self):
+        with self.assertNumQueries(1):
+            self.author.can_view(self.viewer)
+            self.author.can_view(self.viewer)
+
+
+class TestSocialGraph(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first, cls.second, cls.third = (
+            User.objects.create_user(email=f'{name}@test.local', username=name, password='pass').profile
+            for name in ('first', 'second', 'third')
+        )
+
+    def setUp(self):
+        self.graph = graph
+        patcher = mock.patch.object(graph, 'enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(graph.clear)
+
+    def test_relation_changes_patch_loaded_arrays(self):
+        self.assertEqual(self.graph.neighbours(self.first.pk, 'followers').tolist(), [])
+        self.assertEqual(self.graph.neighbours(self.first.pk, 'requests').tolist(), [])
+
+        relation = Relation.objects.create(actor=self.second, account=self.first,
+                                           state=Relation.RelationState.FOLLOWED)
+        Relation.objects.create(actor=self.third, account=self.first, state=Relation.RelationState.REQUESTED)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.graph.neighbours(self.first.pk, 'followers').tolist(), [self.second.pk])
+            self.assertEqual(self.graph.neighbours(self.first.pk, 'requests').tolist(), [self.third.pk])
+
+        relation.block()
+        self.assertFalse(self.graph.contains(self.first.pk, 'followers', self.second.pk))
+        self.assertEqual(list(self.second.block_list()), [self.first.pk])
+
+    def test_membership_checks_use_the_graph(self):
+        Relation.objects.create(actor=self.second, account=self.first, state=Relation.RelationState.FOLLOWED)
+        self.graph.neighbours(self.first.pk, 'followers')
+        self.graph.neighbours(self.first.pk, 'blocked')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(Relation.objects.is_following(self.second, self.first))
+            self.assertFalse(Relation.objects.is_following(self.third, self.first))
+            self.assertFalse(Relation.objects.is_blocked(self.first, self.second))
+
+        # the lists stay a single query with a subquery, whatever the number of neighbours
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.first.profile_followers()), [self.second])
+
+    def test_footprint(self):
+        Relation.objects.create(actor=self.second, account=self.first, state=Relation.RelationState.FOLLOWED)
+        self.graph.neighbours(self.first.pk, 'followers')
+
+        footprint = self.graph.footprint()
+        self.assertEqual((footprint['entries'], footprint['edges']), (1, 1))
+        self.assertGreater(footprint['bytes'], 0)
+
+
+class TestProfileList(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(email='viewer@test.local', username='viewer', password='pass')
+        cls.profiles = [
+            User.objects.create_user(email=f'user{i}@test.local', username=f'user{i}', password='pass').profile
+            for i in range(6)
+        ]
+        Post.objects.bulk_create(Post(author=cls.profiles[0], title=f'post {i}', content='text') for i in range(3))
+        Relation.objects.create(actor=cls.viewer.profile, account=cls.profiles[0],
+                                state=Relation.RelationState.FOLLOWED)
+        Relation.objects.create(actor=cls.viewer.profile, account=cls.profiles[1],
+                                state=Relation.RelationState.REQUESTED)
+
+    def setUp(self):
+        self.client.force_authenticate(self.viewer)
+
+    def test_page_costs_constant_queries(self):
+        # the count of the paginator and the page itself, whatever the page size
+        for page_size in (2, 20):
+            with mock.patch.object(PageNumberPagination, 'page_size', page_size), self.assertNumQueries(2):
+                response = self.client.get(reverse('accounts:profile-list'))
+            self.assertEqual(response.status_code, 200)
+
+        results = {row['user']['username']: row for row in response.data['results']}
+        self.assertEqual(results['user0']['relation'], Relation.RelationState.FOLLOWED)
+        self.assertEqual(results['user1']['relation'], Relation.RelationState.REQUESTED)
+        self.assertIsNone(results['user2']['relation'])
+        self.assertEqual(results['user0']['num_posts'], 3)
+        self.assertEqual(results['user2']['num_posts'], 0)
+
+
+class TestRelationLists(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@test.local', username='owner', password='pass')
+        cls.followers = [
+            User.objects.create_user(email=f'fan{i}@test.local', username=f'fan{i}', password='pass').profile
+            for i in range(5)
+        ]
+        for follower in cls.followers:
+            Relation.objects.create(actor=follower, account=cls.owner.profile, state=Relation.RelationState.FOLLOWED)
+        Relation.objects.create(actor=cls.owner.profile, account=cls.followers[0],
+                                state=Relation.RelationState.BLOCKED)
+
+    def setUp(self):
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('accounts:profile-followers', kwargs={'uid': self.owner.profile.uid})
+
+    def test_pages_newest_first(self):
+        usernames, url = [], self.url + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            usernames += [row['username'] for row in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(usernames, [f'fan{i}' for i in reversed(range(5))])
+
+        blocked = self.client.get(reverse('accounts:profile-block-list', kwargs={'uid': self.owner.profile.uid}))
+        self.assertEqual([row['username'] for row in blocked.data['results']], ['fan0'])
+
+    def test_stream(self):
+        response = self.client.get(self.url, {'stream': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['username'] for row in rows], [f'fan{i}' for i in reversed(range(5))])
+        self.assertTrue(rows[0]['url'].endswith(f'/profile/{self.followers[4].uid}/'))
+
+
+class TestAcceptRequests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@test.local', username='owner', password='pass')
+        cls.owner.profile.private = True
+        cls.owner.profile.save()
+        Post.objects.bulk_create(Post(author=cls.owner.profile, title=f'post {i}', content='text') for i in range(2))
+        cls.requesters = [
+            User.objects.create_user(email=f'fan{i}@test.local', username=f'fan{i}', password='pass').profile
+            for i in range(5)
+        ]
+        for requester in cls.requesters:
+            Relation.objects.create(actor=requester, account=cls.owner.profile, state=Relation.RelationState.REQUESTED)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('accounts:profile-change-privacy')
+
+    def assert_all_accepted(self):
+        self.assertFalse(Relation.objects.filter(state=Relation.RelationState.REQUESTED).exists())
+        self.assertEqual(TimelineEntry.objects.filter(author=self.owner.profile).count(), 2 * len(self.requesters))
+        self.assertTrue(Relation.objects.is_following(self.requesters[0], self.owner.profile))
+
+    def test_small_sets_are_accepted_in_the_request(self):
+        self.assertFalse(Relation.objects.is_following(self.requesters[0], self.owner.profile))  # cached
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['job']['status'], response.data['job']['processed']), ('done', 5))
+        self.assert_all_accepted()
+
+    def test_large_sets_are_accepted_in_the_background(self):
+        with mock.patch.object(jobs, 'RELATION_JOB_INLINE_LIMIT', 1), \
+                mock.patch.object(jobs, 'relation_job_runner', jobs.SyncRunner(batch_size=2)), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data['job']['status'], 'pending')
+
+        job = self.client.get(response.data['job']['url']).data
+        self.assertEqual((job['status'], job['total'], job['processed']), ('done', 5, 5))
+        self.assert_all_accepted()
+
+    def test_stale_running_jobs_are_run_again(self):
+        def running_job(heartbeat):
+            return RelationJob.objects.create(profile=self.owner.profile, kind=RelationJob.Kind.ACCEPT_REQUESTS,
+                                              status=RelationJob.Status.RUNNING, total=5, heartbeat=heartbeat)
+
+        self.owner.profile.private = False
+        self.owner.profile.save()
+        alive = running_job(timezone.now())
+        stale = running_job(timezone.now() - timedelta(seconds=jobs.RELATION_JOB_STALE_AFTER + 1))
+        call_command('run_relation_jobs')
+
+        alive.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual(alive.status, RelationJob.Status.RUNNING)
+        self.assertEqual((stale.status, stale.processed), (RelationJob.Status.DONE, 5))
+        self.assert_all_accepted()
+
+
+class TestBulkRelations(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.actor = User.objects.create_user(email='actor@test.local', username='actor', password='pass')
+        cls.public, cls.private, cls.blocker = (
+            User.objects.create_user(email=f'{name}@test.local', username=name, password='pass').profile
+            for name in ('public', 'private', 'blocker')
+        )
+        cls.private.private = True
+        cls.private.save()
+        Post.objects.create(author=cls.public, title='post', content='text')
+        Relation.objects.create(actor=cls.blocker, account=cls.actor.profile, state=Relation.RelationState.BLOCKED)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.actor)
+
+    def post(self, operation, *profiles):
+        response = self.client.post(reverse(f'accounts:profile-bulk-{operation}'),
+                                    {'uids': [str(profile.uid) for profile in profiles]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [row['result'] for row in response.data['results']]
+
+    def test_follow_and_unfollow(self):
+        profile = self.actor.profile
+        with self.assertNumQueries(5):  # targets, relations, bulk insert, then the timeline backfill and its insert
+            results = self.post('follow', self.public, self.private, self.blocker, profile)
+        self.assertEqual(results, ['followed', 'requested', 'not_found', 'self'])
+        self.assertTrue(TimelineEntry.objects.filter(owner=profile, author=self.public).exists())
+        self.assertEqual(self.post('follow', self.public), ['already_related'])
+
+        self.assertEqual(self.post('unfollow', self.public, self.private), ['unfollowed', 'not_following'])
+        self.assertFalse(Relation.objects.is_following(profile, self.public))
+        self.assertFalse(TimelineEntry.objects.filter(owner=profile).exists())
+
+    def test_block_terminates_reversed_relations(self):
+        Relation.objects.create(actor=self.public, account=self.actor.profile, state=Relation.RelationState.FOLLOWED)
+        Relation.objects.create(actor=self.actor.profile, account=self.public, state=Relation.RelationState.FOLLOWED)
+
+        self.assertEqual(self.post('block', self.public, self.private), ['blocked', 'blocked'])
+        self.assertEqual(self.post('block', self.public), ['already_blocked'])
+        self.assertFalse(Relation.objects.filter(actor=self.public).exists())
+        self.assertTrue(Relation.objects.is_blocked(self.actor.profile, self.private))
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.actor.profile).exists())
 
-# Create your tests here.
+        self.assertEqual(self.post('unblock', self.public, self.blocker), ['unblocked', 'not_found'])
+        self.assertIsNone(Relation.objects.get_state(self.actor.profile, self.public))
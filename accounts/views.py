@@ -1,21 +1,64 @@
+import json
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, NotFound
+from rest_framework.fields import DateTimeField
 from rest_framework.generics import get_object_or_404, GenericAPIView
 from rest_framework.mixins import RetrieveModelMixin, DestroyModelMixin, ListModelMixin, UpdateModelMixin
 from rest_framework.views import Response
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+from rest_framework.reverse import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_403_FORBIDDEN
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .serializers import *
+from . import bulk
 from .permissions import IsProfileOwner
-from analytics.mixins import ObjectHitMixin
+from analytics.mixins import ObjectHitMixin, ObjectStatsMixin
+from blog.conditional import ConditionalRetrieveMixin
+from blog.pagination import KeysetPagination
+from blog.plans import PlannedQuerysetMixin
+from blog.response_cache import CachedRetrieveMixin
+from images.models import ImageSource
 
 profile_owner_actions = ('requests', 'followers', 'followings', 'block_list', 'more_settings')
 
-
-class ProfileViewSet(ObjectHitMixin, RetrieveModelMixin,
+# the relations listed by each action: (the side of the relation the user is on, the side of the listed profiles,
+# state)
+relation_lists = {
+    'requests': ('account', 'actor', Relation.RelationState.REQUESTED),
+    'followers': ('account', 'actor', Relation.RelationState.FOLLOWED),
+    'followings': ('actor', 'account', Relation.RelationState.FOLLOWED),
+    'block_list': ('actor', 'account', Relation.RelationState.BLOCKED),
+}
+
+RELATION_STREAM_CHUNK_SIZE = getattr(settings, 'RELATION_STREAM_CHUNK_SIZE', 2000)
+# stands for the uid in the profile url reversed once per stream
+_UID_PLACEHOLDER = '00000000-0000-0000-0000-000000000000'
+
+
+def stream_relation_list(request, queryset):
+    """
+    the rows of `RelatedProfileSerializer` as NDJSON lines, read in chunks through `iterator()` (a server side cursor
+    on postgres) as plain values so that memory stays flat however long the list is
+    """
+    url = reverse('accounts:profile-detail', kwargs={'uid': _UID_PLACEHOLDER}, request=request)
+    created = DateTimeField()
+    rows = queryset.values_list('uid', 'username', 'created').iterator(chunk_size=RELATION_STREAM_CHUNK_SIZE)
+    for uid, username, date in rows:
+        row = {'url': url.replace(_UID_PLACEHOLDER, str(uid)), 'username': username,
+               'created': created.to_representation(date)}
+        yield json.dumps(row) + '\n'
+
+
+class ProfileViewSet(CachedRetrieveMixin, ConditionalRetrieveMixin, ObjectHitMixin,
+                     ObjectStatsMixin,
+                     PlannedQuerysetMixin,
+                     RetrieveModelMixin,
                      UpdateModelMixin,
                      DestroyModelMixin,
                      ListModelMixin,
@@ -24,6 +67,8 @@ class ProfileViewSet(ObjectHitMixin, RetrieveModelMixin,
     serializer_class = ProfileSerializer
     lookup_field = "uid"
     lookup_url_kwarg = "uid"
+    cache_kind = 'profile'
+    viewer_version_fields = ('relation',)
 
     def get_permissions(self):
         if self.action not in profile_owner_actions:
@@ -31,6 +76,25 @@ class ProfileViewSet(ObjectHitMixin, RetrieveModelMixin,
 
         return IsAuthenticated(), IsProfileOwner(),
 
+    def get_version(self):
+        relation = Relation.objects.filter(account=OuterRef('pk'), actor=self.request.user.profile).values('state')
+        return Profile.objects.filter(uid=self.kwargs['uid']).values(
+            'pk', 'user', 'user__username', 'user__first_name', 'user__last_name', 'user__date_joined', 'picture',
+            'picture_source__status', 'bio', 'website', 'private',
+        ).annotate(relation=Subquery(relation[:1]), num_posts=Count('posts')).first()
+
+    def get_version_instance(self, version):
+        return Profile(pk=version['pk'], user_id=version['user'])
+
+    def get_cache_objects(self, version):
+        return [('profile', version['pk'])]
+
+    def is_cacheable(self, version):
+        return not version['private'] and version['picture_source__status'] in (None, ImageSource.Status.DONE)
+
+    def get_viewer_data(self, version):
+        return {'relation': version['relation']}
+
     @action(methods=('post',), detail=True)
     def follow(self, request, uid=None):
         instance = request.user.profile
@@ -81,6 +145,31 @@ class ProfileViewSet(ObjectHitMixin, RetrieveModelMixin,
         message = relationship.unblock()
         return Response(data={'detail': message}, status=HTTP_200_OK)
 
+    @action(methods=('post',), detail=False, url_path='bulk-follow', serializer_class=BulkRelationSerializer)
+    def bulk_follow(self, request):
+        return self.bulk_relation_change(request, 'follow')
+
+    @action(methods=('post',), detail=False, url_path='bulk-unfollow', serializer_class=BulkRelationSerializer)
+    def bulk_unfollow(self, request):
+        return self.bulk_relation_change(request, 'unfollow')
+
+    @action(methods=('post',), detail=False, url_path='bulk-block', serializer_class=BulkRelationSerializer)
+    def bulk_block(self, request):
+        return self.bulk_relation_change(request, 'block')
+
+    @action(methods=('post',), detail=False, url_path='bulk-unblock', serializer_class=BulkRelationSerializer)
+    def bulk_unblock(self, request):
+        return self.bulk_relation_change(request, 'unblock')
+
+    def bulk_relation_change(self, request, operation):
+        """applies `operation` of `accounts.bulk` to the profiles of the `uids` list, with a result per uid"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = bulk.OPERATIONS[operation](request.user.profile, serializer.validated_data['uids'])
+        data = {'results': [{'uid': str(uid), 'result': result} for uid, result in results.items()]}
+        return Response(data=data, status=HTTP_200_OK)
+
     @action(methods=('post',), detail=True)
     def accept(self, request, uid=None):
         instance = self.get_object()
@@ -109,35 +198,61 @@ class ProfileViewSet(ObjectHitMixin, RetrieveModelMixin,
         profile.change_state()
 
         message = f'profile availability changed to {"Private" if profile.is_private else "Public"}'
-        return Response(data={'detail': message}, status=HTTP_200_OK)
+        if profile.is_private:
+            return Response(data={'detail': message}, status=HTTP_200_OK)
 
-    @action(methods=('get',), detail=True, serializer_class=RequestSerializer)
+        # the pending requests are accepted by a job, which may still be running in the background
+        job = profile.relation_jobs.order_by('-pk').first()
+        data = {'detail': message, 'job': RelationJobSerializer(job, context={'request': request}).data}
+        finished = job.status not in (RelationJob.Status.PENDING, RelationJob.Status.RUNNING)
+        return Response(data=data, status=HTTP_200_OK if finished else HTTP_202_ACCEPTED)
+
+    @action(methods=('get',), detail=False, url_path=r'jobs/(?P<job_id>[0-9]+)', serializer_class=RelationJobSerializer)
+    def job(self, request, job_id=None):
+        job = get_object_or_404(RelationJob, pk=job_id, profile=request.user.profile)
+        return Response(data=self.get_serializer(job).data, status=HTTP_200_OK)
+
+    @action(methods=('get',), detail=True, serializer_class=RelatedProfileSerializer)
     def requests(self, request, uid=None):
         instance = request.user.profile
         if not instance.is_private:
             message = "a Public profile Does Not have follow requests"
             return Response(data={'detail': message}, status=HTTP_403_FORBIDDEN)
 
-        serializer = RequestSerializer(instance=instance, context={'request': request})
-        return Response(data=serializer.data, status=HTTP_200_OK)
+        return self.relation_list(request, 'requests')
 
-    @action(methods=('get',), detail=True, serializer_class=FollowersSerializer)
+    @action(methods=('get',), detail=True, serializer_class=RelatedProfileSerializer)
     def followers(self, request, uid=None):
-        instance = request.user.profile
-        serializer = self.get_serializer(instance=instance, context={'request': request})
-        return Response(data=serializer.data, status=HTTP_200_OK)
+        return self.relation_list(request, 'followers')
 
-    @action(methods=('get',), detail=True, serializer_class=FollowingsSerializer)
+    @action(methods=('get',), detail=True, serializer_class=RelatedProfileSerializer)
     def followings(self, request, uid=None):
-        instance = request.user.profile
-        serializer = self.get_serializer(instance=instance, context={'request': request})
-        return Response(data=serializer.data, status=HTTP_200_OK)
+        return self.relation_list(request, 'followings')
 
-    @action(methods=('get',), detail=True, serializer_class=BlockListSerializer, url_path='block-list')
+    @action(methods=('get',), detail=True, serializer_class=RelatedProfileSerializer, url_path='block-list')
     def block_list(self, request, uid=None):
-        instance = request.user.profile
-        serializer = self.get_serializer(instance=instance, context={'request': request})
-        return Response(data=serializer.data, status=HTTP_200_OK)
+        return self.relation_list(request, 'block_list')
+
+    def relation_list(self, request, name):
+        """
+        the profiles of one of the `relation_lists` of the user, newest relations first: cursor paginated pages, or
+        all of them streamed as NDJSON (one json object per line) with `?stream=true`, for exports
+        """
+        owner, side, state = relation_lists[name]
+        queryset = Relation.objects.filter(**{owner: request.user.profile}, state=state).annotate(
+            uid=F(f'{side}__uid'), username=F(f'{side}__user__username'),
+        ).order_by('-created', '-id')
+
+        if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+            response = StreamingHttpResponse(stream_relation_list(request, queryset),
+                                             content_type='application/x-ndjson')
+            response['Content-Disposition'] = f'attachment; filename="{name}.ndjson"'
+            return response
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(methods=('get', 'put'), detail=False, serializer_class=UserOwnerSerializer, url_path='settings')
     def more_settings(self, request):
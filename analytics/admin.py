@@ -1,9 +1,31 @@
 from django.contrib import admin
 
-from .models import ObjectLog
+from .models import ObjectLog, VisitCounter, VisitRollup, VisitorSketch
 
 
 @admin.register(ObjectLog)
 class ObjectLogAdmin(admin.ModelAdmin):
     list_display = ('user', 'ip', 'content_type', 'timestamp',)
-    list_filter = ('user', 'ip', 'content_type', 'timestamp',)
+    # filtering by user or ip would list the distinct values of the whole table
+    list_filter = ('content_type', 'timestamp',)
+    list_select_related = ('user', 'content_type',)
+    show_full_result_count = False
+
+
+@admin.register(VisitCounter)
+class VisitCounterAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'logged', 'recent',)
+    list_filter = ('content_type',)
+
+
+@admin.register(VisitRollup)
+class VisitRollupAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'period', 'bucket', 'views', 'users', 'anonymous_ips',)
+    list_filter = ('content_type', 'period',)
+
+
+@admin.register(VisitorSketch)
+class VisitorSketchAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'day', 'estimate',)
+    list_filter = ('content_type',)
+    exclude = ('registers',)
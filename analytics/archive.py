@@ -0,0 +1,205 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from . import rollups, sketches, visits
+from .models import ObjectLog, Checkpoint
+
+# logs older than this many days are moved out of the table into archive files
+LOG_RETENTION_DAYS = getattr(settings, 'LOG_RETENTION_DAYS', 90)
+LOG_ARCHIVE_DIR = getattr(settings, 'LOG_ARCHIVE_DIR', os.path.join(getattr(settings, 'BASE_DIR', '.'), 'log_archive'))
+# rows per column block of an archive file, the most rows held in memory while archiving
+LOG_ARCHIVE_BLOCK_SIZE = getattr(settings, 'LOG_ARCHIVE_BLOCK_SIZE', 10000)
+
+ARCHIVE_VERSION = 1
+COLUMNS = ('id', 'user_id', 'ip', 'content_type_id', 'object_id', 'timestamp')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _delta_encode(values):
+    return [value - previous for previous, value in zip([0] + values, values)]
+
+
+def _delta_decode(deltas):
+    values, total = [], 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+class ArchiveWriter:
+    """
+    writes logs to a gzip file of column blocks: one json line per `block_size` rows holding a list per column,
+    which compresses far better than rows do (repeated ips, content types and objects end up next to each other).
+    ids and timestamps (microseconds) are delta encoded, content types are stored by natural key so that the files
+    stay readable in another database.
+    """
+
+    def __init__(self, path, block_size=None):
+        self.path = path
+        self.block_size = block_size or LOG_ARCHIVE_BLOCK_SIZE
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self.file.write(json.dumps({'version': ARCHIVE_VERSION, 'columns': COLUMNS}) + '\n')
+        self.block = []
+        self.rows = 0
+        self.first_id = self.last_id = None
+        self._content_types = {}
+
+    def write(self, row):
+        self.block.append(row)
+        if self.first_id is None:
+            self.first_id = row[0]
+        self.last_id = row[0]
+        if len(self.block) >= self.block_size:
+            self.flush()
+
+    def _content_type_key(self, content_type_id):
+        if content_type_id not in self._content_types:
+            content_type = ContentType.objects.get_for_id(content_type_id)
+            self._content_types[content_type_id] = f'{content_type.app_label}.{content_type.model}'
+        return self._content_types[content_type_id]
+
+    def flush(self):
+        if not self.block:
+            return
+
+        ids, users, ips, content_types, object_ids, timestamps = (list(column) for column in zip(*self.block))
+        block = {
+            'rows': len(self.block),
+            'id': _delta_encode(ids),
+            'user_id': users,
+            'ip': ips,
+            'content_type': [self._content_type_key(content_type) for content_type in content_types],
+            'object_id': object_ids,
+            'timestamp': _delta_encode([_microseconds(timestamp) for timestamp in timestamps]),
+        }
+        self.file.write(json.dumps(block, separators=(',', ':')) + '\n')
+        self.rows += len(self.block)
+        self.block = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_archive(path):
+    """the logs of an archive file as dicts of `COLUMNS` (content types as 'app_label.model'), block by block"""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        header = json.loads(file.readline())
+        if header.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f'{path}: unsupported archive version {header.get("version")}')
+
+        for line in file:
+            block = json.loads(line)
+            timestamps = (EPOCH + timedelta(microseconds=value) for value in _delta_decode(block['timestamp']))
+            columns = zip(_delta_decode(block['id']), block['user_id'], block['ip'], block['content_type'],
+                          block['object_id'], timestamps)
+            for log_id, user_id, ip, content_type, object_id, timestamp in columns:
+                yield {'id': log_id, 'user_id': user_id, 'ip': ip, 'content_type': content_type,
+                       'object_id': object_id, 'timestamp': timestamp}
+
+
+def safe_cutoff(days=None):
+    """
+    the start of the day `days` ago, moved back to the first log the visit counters, the rollups or the visitor
+    sketches have not taken in yet: archived logs are gone for them, and days are recounted whole so the cutoff
+    stays on a day boundary.
+    """
+    cutoff = timezone.now() - timedelta(days=LOG_RETENTION_DAYS if days is None else days)
+    rolled_up = min(Checkpoint.get_position(checkpoint) for checkpoint in (visits.CHECKPOINT, rollups.CHECKPOINT,
+                                                                           sketches.CHECKPOINT))
+    pending = ObjectLog.objects.filter(id__gt=rolled_up).aggregate(first=Min('timestamp'))['first']
+    if pending is not None:
+        cutoff = min(cutoff, pending)
+    return cutoff.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _months(start, end):
+    month = start.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month < end:
+        following = (month + timedelta(days=32)).replace(day=1)
+        yield month, min(following, end)
+        month = following
+
+
+def archive(cutoff, directory=None, block_size=None, batch_size=5000, delete=True):
+    """
+    moves the logs older than `cutoff` into one archive file per month, `objectlog-<month>-<first id>-<last id>`,
+    then deletes them `batch_size` ids at a time. rows are streamed with `iterator()`, so memory stays within a
+    block whatever the size of the table. returns `[(path, rows)]`.
+
+    a file is only renamed into place once complete, and rows only deleted after that. a run interrupted while
+    deleting leaves rows which the next run archives again, `load_log_archive` skips the duplicated ids.
+    """
+    directory = directory or LOG_ARCHIVE_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    first = ObjectLog.objects.filter(timestamp__lt=cutoff).aggregate(first=Min('timestamp'))['first']
+    if first is None:
+        return []
+
+    archived = []
+    for start, end in _months(first, cutoff):
+        logs = ObjectLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        partial = os.path.join(directory, f'objectlog-{start:%Y-%m}.partial')
+        writer = ArchiveWriter(partial, block_size)
+        try:
+            for row in logs.order_by('id').values_list(*COLUMNS).iterator(chunk_size=writer.block_size):
+                writer.write(row)
+        finally:
+            writer.close()
+
+        if not writer.rows:
+            os.remove(partial)
+            continue
+
+        path = os.path.join(directory, f'objectlog-{start:%Y-%m}-{writer.first_id}-{writer.last_id}.jsonl.gz')
+        os.replace(partial, path)
+        archived.append((path, writer.rows))
+
+        if delete:
+            for low in range(writer.first_id - 1, writer.last_id, batch_size):
+                logs.filter(id__gt=low, id__lte=low + batch_size).delete()
+
+    return archived
+
+
+def restore(path, batch_size=5000):
+    """
+    inserts the logs of an archive file back into `ObjectLog`, keeping their ids and timestamps (ids already in the
+    table are skipped). they sit below the checkpoints, so the counters and rollups don't count them again.
+    returns the number of rows inserted.
+    """
+    content_types, batch, rows = {}, [], 0
+    for row in read_archive(path):
+        key = row.pop('content_type')
+        if key not in content_types:
+            content_types[key] = ContentType.objects.get_by_natural_key(*key.split('.')).pk
+        batch.append(ObjectLog(content_type_id=content_types[key], **row))
+        if len(batch) >= batch_size:
+            rows += _insert(batch)
+            batch = []
+
+    return rows + _insert(batch)
+
+
+def _insert(logs):
+    # raw saves, like `loaddata` does, so that `auto_now` doesn't overwrite the archived timestamps
+    existing = set(ObjectLog.objects.filter(id__in=[log.id for log in logs]).values_list('id', flat=True))
+    missing = [log for log in logs if log.id not in existing]
+    with transaction.atomic():
+        for log in missing:
+            log.save_base(raw=True, force_insert=True)
+    return len(missing)
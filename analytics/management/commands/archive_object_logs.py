@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from analytics import archive
+
+
+class Command(BaseCommand):
+    help = 'moves the object logs older than the retention period into compressed monthly archive files, then ' \
+           'deletes them from the table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help=f'retention in days, defaults to LOG_RETENTION_DAYS ({archive.LOG_RETENTION_DAYS})')
+        parser.add_argument('--dir', dest='directory', default=None,
+                            help=f'defaults to LOG_ARCHIVE_DIR ({archive.LOG_ARCHIVE_DIR})')
+        parser.add_argument('--batch-size', type=int, default=5000, help='number of log ids deleted per statement')
+        parser.add_argument('--block-size', type=int, default=None, help='rows per column block of the files')
+        parser.add_argument('--keep', action='store_true', help='writes the archives but keeps the rows')
+
+    def handle(self, *args, days, directory, batch_size, block_size, keep, **options):
+        cutoff = archive.safe_cutoff(days)
+        archived = archive.archive(cutoff, directory, block_size, batch_size, delete=not keep)
+        for path, rows in archived:
+            self.stdout.write(f'{path}: {rows} log(s)')
+        total = sum(rows for _, rows in archived)
+        self.stdout.write(self.style.SUCCESS(f'{total} log(s) older than {cutoff:%Y-%m-%d} archived'))
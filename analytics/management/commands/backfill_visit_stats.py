@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from analytics import rollups
+
+
+class Command(BaseCommand):
+    help = 'rolls the object log history up into the hourly and daily visit rollups, a bounded number of chunks ' \
+           'per run. runs resume from where the previous one stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='number of log ids handled per transaction')
+        parser.add_argument('--max-chunks', type=int, default=None, help='stops after this many chunks')
+        parser.add_argument('--restart', action='store_true', help='starts over from the first log')
+
+    def handle(self, *args, chunk_size, max_chunks, restart, **options):
+        position = rollups.backfill(chunk_size, max_chunks, restart)
+        self.stdout.write(self.style.SUCCESS(f'visit rollups backfilled up to log #{position}'))
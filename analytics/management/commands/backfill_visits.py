@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics import visits
+
+
+class Command(BaseCommand):
+    help = 'recomputes the visit counters from the whole object log history, in chunks of log ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='number of log ids handled per transaction')
+
+    def handle(self, *args, chunk_size, **options):
+        position = visits.backfill(chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'visit counters backfilled up to log #{position}'))
@@ -0,0 +1,40 @@
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from analytics.models import ObjectLog
+from analytics.writers import DirectWriter, BufferedWriter
+
+
+class Command(BaseCommand):
+    help = 'measures how many object logs per second the request path can hand to each writer. ' \
+           'the benchmark rows are deleted afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logs', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, logs, batch_size, **options):
+        content_type = ContentType.objects.get_for_model(ObjectLog)
+        start_id = ObjectLog.objects.aggregate(last=Max('id'))['last'] or 0
+
+        writers = (
+            ('direct', DirectWriter(ObjectLog)),
+            ('buffered', BufferedWriter(ObjectLog, max_size=logs, batch_size=batch_size, overflow='block',
+                                        block_timeout=1)),
+        )
+        try:
+            for label, writer in writers:
+                start = time.perf_counter()
+                for i in range(logs):
+                    writer.write(ip='127.0.0.1', content_type=content_type, object_id=i)
+                enqueued = time.perf_counter() - start
+                writer.stop()
+                total = time.perf_counter() - start
+
+                self.stdout.write(f'{label:<10} request path {logs / enqueued:12.0f} logs/s | '
+                                  f'persisted {logs / total:10.0f} logs/s')
+        finally:
+            ObjectLog.objects.filter(id__gt=start_id).delete()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics.models import IPAddress
+
+
+class Command(BaseCommand):
+    help = 'deletes the duplicated ip addresses, keeping the oldest row of each'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of duplicated ips handled at a time')
+
+    def handle(self, *args, chunk_size, **options):
+        deleted = IPAddress.objects.remove_duplicates(chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'{deleted} duplicated ip address(es) deleted'))
@@ -0,0 +1,52 @@
+import csv
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from analytics import archive
+
+
+class Command(BaseCommand):
+    help = 'reads object log archive files for analysis: summarizes them, exports them as csv or restores them ' \
+           'into the table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--csv', dest='csv_path', default=None,
+                            help='writes the rows of all the files to this csv file')
+        parser.add_argument('--restore', action='store_true', help='inserts the rows back into ObjectLog')
+
+    def handle(self, *args, paths, csv_path, restore, **options):
+        for path in paths:
+            if restore:
+                self.stdout.write(f'{path}: {archive.restore(path)} log(s) restored')
+            else:
+                self.summarize(path)
+
+        if csv_path:
+            self.export(paths, csv_path)
+
+    def summarize(self, path):
+        rows, first, last, content_types, users, ips = 0, None, None, Counter(), set(), set()
+        for row in archive.read_archive(path):
+            rows += 1
+            first = row['timestamp'] if first is None else min(first, row['timestamp'])
+            last = row['timestamp'] if last is None else max(last, row['timestamp'])
+            content_types[row['content_type']] += 1
+            if row['user_id'] is None:
+                ips.add(row['ip'])
+            else:
+                users.add(row['user_id'])
+
+        self.stdout.write(f'{path}: {rows} log(s) from {first} to {last}, {len(users)} user(s), '
+                          f'{len(ips)} anonymous ip(s)')
+        for content_type, count in content_types.most_common():
+            self.stdout.write(f'  {content_type}: {count}')
+
+    def export(self, paths, destination):
+        with open(destination, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=('id', 'user_id', 'ip', 'content_type', 'object_id', 'timestamp'))
+            writer.writeheader()
+            for path in paths:
+                writer.writerows(archive.read_archive(path))
+        self.stdout.write(self.style.SUCCESS(f'written to {destination}'))
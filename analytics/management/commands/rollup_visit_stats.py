@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from analytics import rollups
+
+
+class Command(BaseCommand):
+    help = 'refreshes the hourly and daily visit rollups of the object logs written since the last run. ' \
+           'meant to run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='number of log ids handled per transaction')
+
+    def handle(self, *args, chunk_size, **options):
+        position = rollups.roll_up_new_logs(chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'visit rollups refreshed up to log #{position}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics import visits
+
+
+class Command(BaseCommand):
+    help = 'rolls the object logs written since the last run up into the visit counters. meant to run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='number of log ids handled per transaction')
+
+    def handle(self, *args, chunk_size, **options):
+        position = visits.roll_up_new_logs(chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'visit counters rolled up to log #{position}'))
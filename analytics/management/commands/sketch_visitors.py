@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from analytics import sketches
+
+
+class Command(BaseCommand):
+    help = 'adds the visitors of the object logs written since the last run to the unique visitor sketches. ' \
+           'meant to run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='number of log ids handled per transaction')
+
+    def handle(self, *args, chunk_size, **options):
+        position = sketches.sketch_new_logs(chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'visitor sketches updated up to log #{position}'))
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='name')),
+                ('position', models.BigIntegerField(default=0, verbose_name='position')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VisitCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Object id')),
+                ('logged', models.PositiveBigIntegerField(default=0, verbose_name='rolled up visits')),
+                ('recent', models.PositiveBigIntegerField(default=0, verbose_name='visits since the last roll up')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type')),
+            ],
+            options={
+                'verbose_name': 'Visit Counter',
+                'verbose_name_plural': 'Visit Counters',
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
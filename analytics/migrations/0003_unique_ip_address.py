@@ -0,0 +1,30 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:14
+
+import analytics.models
+from django.db import migrations, models
+
+
+def remove_duplicate_ips(apps, schema_editor):
+    apps.get_model('analytics', 'IPAddress').objects.remove_duplicates()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_visit_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='ipaddress',
+            managers=[
+                ('objects', analytics.models.IPAddressManager()),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_ips, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ipaddress',
+            name='ip',
+            field=models.GenericIPAddressField(blank=True, null=True, unique=True, verbose_name='ip address'),
+        ),
+    ]
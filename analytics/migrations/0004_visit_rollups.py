@@ -0,0 +1,44 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('analytics', '0003_unique_ip_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Object id')),
+                ('period', models.CharField(choices=[('hour', 'hour'), ('day', 'day')], max_length=4, verbose_name='period')),
+                ('bucket', models.DateTimeField(verbose_name='start of the period')),
+                ('views', models.PositiveBigIntegerField(default=0, verbose_name='views')),
+                ('users', models.PositiveBigIntegerField(default=0, verbose_name='unique users')),
+                ('anonymous_ips', models.PositiveBigIntegerField(default=0, verbose_name='unique anonymous ips')),
+            ],
+            options={
+                'verbose_name': 'Visit Rollup',
+                'verbose_name_plural': 'Visit Rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='objectlog',
+            index=models.Index(fields=['content_type', 'object_id', 'timestamp'], name='objectlog_object_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='visitrollup',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='visitrollup',
+            unique_together={('content_type', 'object_id', 'period', 'bucket')},
+        ),
+    ]
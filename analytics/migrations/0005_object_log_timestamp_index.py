@@ -0,0 +1,17 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_visit_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='objectlog',
+            index=models.Index(fields=['timestamp'], name='objectlog_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('analytics', '0005_object_log_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Object id')),
+                ('day', models.DateField(blank=True, null=True, verbose_name='day')),
+                ('registers', models.BinaryField(verbose_name='registers')),
+                ('estimate', models.PositiveBigIntegerField(default=0, verbose_name='estimated unique visitors')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type')),
+            ],
+            options={
+                'verbose_name': 'Visitor Sketch',
+                'verbose_name_plural': 'Visitor Sketches',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='visitorsketch',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'day'), name='visitorsketch_day_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='visitorsketch',
+            constraint=models.UniqueConstraint(condition=models.Q(('day', None)), fields=('content_type', 'object_id'), name='visitorsketch_total_unique'),
+        ),
+    ]
@@ -1,4 +1,24 @@
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+
+from .models import VisitRollup
+from .rollups import rollups_of
+from .serializers import VisitRollupSerializer
+from .sketches import merged
 from .signals import object_viewed
+from .visits import get_owner_id
+
+# the span of the stats when the request doesn't give `since`
+STATS_DEFAULT_SPAN = {
+    VisitRollup.Period.HOUR: timedelta(hours=48),
+    VisitRollup.Period.DAY: timedelta(days=30),
+}
 
 
 class ObjectHitMixin:
@@ -23,3 +43,40 @@ class ObjectHitMixin:
 
         if respond:
             return super().retrieve(self, request, *args, **kwargs)
+
+
+class ObjectStatsMixin:
+    """
+    adds a `stats` action to a viewset: the hourly or daily visit rollups of the object (`?period=hour|day`, between
+    the optional `since` and `until` datetimes), read from `VisitRollup` only and shown to the owner of the object
+    """
+
+    @action(methods=('get',), detail=True, serializer_class=VisitRollupSerializer)
+    def stats(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if get_owner_id(instance) != request.user.id:
+            raise PermissionDenied('only the owner can see the stats')
+
+        period = request.query_params.get('period', VisitRollup.Period.DAY)
+        if period not in VisitRollup.Period.values:
+            raise ValidationError({'period': f'must be one of {VisitRollup.Period.values}'})
+
+        until = self._stats_datetime(request, 'until')
+        since = self._stats_datetime(request, 'since') or (until or timezone.now()) - STATS_DEFAULT_SPAN[period]
+        serializer = self.get_serializer(rollups_of(instance, period, since, until), many=True)
+        # distinct visitors of the whole span, from the merged day sketches (the rollups can't be added up for that)
+        visitors = merged(ContentType.objects.get_for_model(instance), instance.pk, since.date(),
+                          (until or timezone.now()).date())
+        return Response({'period': period, 'since': since, 'until': until, 'unique_visitors': visitors.count(),
+                         'results': serializer.data})
+
+    @staticmethod
+    def _stats_datetime(request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValidationError({name: 'must be an ISO 8601 datetime'})
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
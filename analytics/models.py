@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
@@ -21,13 +22,166 @@ class ObjectLog(models.Model):
         ordering = ('-timestamp',)
         verbose_name = _('Object Logger')
         verbose_name_plural = _('Objects Logger')
+        indexes = (
+            # the logs of an object within a period, recounted by `analytics.rollups`
+            models.Index(fields=('content_type', 'object_id', 'timestamp'), name='objectlog_object_time_idx'),
+            # the default ordering and the time ranges moved out by `analytics.archive`
+            models.Index(fields=('timestamp',), name='objectlog_timestamp_idx'),
+        )
+
+
+class IPAddressManager(models.Manager):
+    use_in_migrations = True
+
+    def remove_duplicates(self, chunk_size=1000):
+        """keeps the oldest row of every duplicated ip and deletes the others, returns the number of deleted rows"""
+        duplicates = self.values('ip').annotate(keep=models.Min('id'), rows=models.Count('id')).filter(rows__gt=1)
+        deleted = 0
+        while True:
+            chunk = list(duplicates.order_by()[:chunk_size])
+            if not chunk:
+                return deleted
+            for row in chunk:
+                deleted += self.filter(ip=row['ip']).exclude(id=row['keep']).delete()[0]
+
+    def register(self, ips):
+        """inserts the ips which are not registered yet, with a single statement"""
+        self.bulk_create((self.model(ip=ip) for ip in ips), ignore_conflicts=True)
 
 
 class IPAddress(models.Model):
-    ip = models.GenericIPAddressField(blank=True, null=True, verbose_name=_('ip address'))
+    ip = models.GenericIPAddressField(blank=True, null=True, unique=True, verbose_name=_('ip address'))
+
+    objects = IPAddressManager()
 
     def __str__(self):
         return self.ip
 
 
-LOGGER_MODEL = getattr('settings', 'LOGGER_MODEL', ObjectLog)
+class Checkpoint(models.Model):
+    """high-water mark of incremental jobs over the raw logs, e.g. the last `ObjectLog.id` rolled up"""
+    name = models.CharField(max_length=64, unique=True, verbose_name=_('name'))
+    position = models.BigIntegerField(default=0, verbose_name=_('position'))
+    updated = models.DateTimeField(auto_now=True, verbose_name=_('updated'))
+
+    def __str__(self):
+        return f'{self.name} @ {self.position}'
+
+    @classmethod
+    def get_position(cls, name):
+        return cls.objects.get_or_create(name=name)[0].position
+
+    @classmethod
+    def set_position(cls, name, position):
+        cls.objects.update_or_create(name=name, defaults={'position': position})
+
+
+class VisitCounterManager(models.Manager):
+    def increment(self, content_type, object_id, amount=1):
+        """adds to the `recent` part of the counter, creating the counter on the first visit of the object"""
+        counter, created = self.get_or_create(content_type=content_type, object_id=object_id,
+                                              defaults={'recent': amount})
+        if not created:
+            self.filter(pk=counter.pk).update(recent=models.F('recent') + amount)
+
+    def visits_for(self, obj):
+        counter = self.filter(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk).first()
+        return counter.visits if counter else 0
+
+
+class VisitCounter(models.Model):
+    """
+    precomputed number of visits of an object.
+
+    `logged` is rolled up from `ObjectLog` up to the `visits` checkpoint (see `analytics.visits`), `recent` is
+    incremented by the `object_viewed` signal and gets drained as the same visits get rolled up.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name=_('Content Type'))
+    object_id = models.PositiveBigIntegerField(verbose_name=_('Object id'))
+    content_object = GenericForeignKey('content_type', 'object_id')
+    logged = models.PositiveBigIntegerField(default=0, verbose_name=_('rolled up visits'))
+    recent = models.PositiveBigIntegerField(default=0, verbose_name=_('visits since the last roll up'))
+
+    objects = VisitCounterManager()
+
+    def __str__(self):
+        return f'{self.content_type} {self.object_id} | {self.visits}'
+
+    @property
+    def visits(self):
+        return self.logged + self.recent
+
+    class Meta:
+        verbose_name = _('Visit Counter')
+        verbose_name_plural = _('Visit Counters')
+        unique_together = (('content_type', 'object_id'),)
+
+
+LOGGER_MODEL = getattr(settings, 'LOGGER_MODEL', ObjectLog)
+
+# how `LOGGER_MODEL` rows get saved, see `analytics.writers`
+LOGGER_WRITER = getattr(settings, 'LOGGER_WRITER', 'analytics.writers.DirectWriter')
+LOGGER_WRITER_OPTIONS = getattr(settings, 'LOGGER_WRITER_OPTIONS', {})
+
+
+class VisitRollup(models.Model):
+    """
+    visits of an object within an hour or a day, computed from `ObjectLog` by `analytics.rollups`. `users` counts
+    the distinct signed in visitors and `anonymous_ips` the distinct ips of the anonymous visits.
+    """
+
+    class Period(models.TextChoices):
+        HOUR = 'hour', 'hour'
+        DAY = 'day', 'day'
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name=_('Content Type'))
+    object_id = models.PositiveBigIntegerField(verbose_name=_('Object id'))
+    content_object = GenericForeignKey('content_type', 'object_id')
+    period = models.CharField(max_length=4, choices=Period.choices, verbose_name=_('period'))
+    bucket = models.DateTimeField(verbose_name=_('start of the period'))
+    views = models.PositiveBigIntegerField(default=0, verbose_name=_('views'))
+    users = models.PositiveBigIntegerField(default=0, verbose_name=_('unique users'))
+    anonymous_ips = models.PositiveBigIntegerField(default=0, verbose_name=_('unique anonymous ips'))
+
+    def __str__(self):
+        return f'{self.content_type} {self.object_id} | {self.period} {self.bucket}'
+
+    class Meta:
+        verbose_name = _('Visit Rollup')
+        verbose_name_plural = _('Visit Rollups')
+        unique_together = (('content_type', 'object_id', 'period', 'bucket'),)
+
+
+class VisitorSketchManager(models.Manager):
+    def unique_visitors(self, obj):
+        """the estimated number of distinct visitors of `obj` over all time"""
+        sketch = self.filter(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk, day=None) \
+            .values_list('estimate', flat=True).first()
+        return sketch or 0
+
+
+class VisitorSketch(models.Model):
+    """
+    HyperLogLog sketch (`analytics.hll`) of the distinct visitors of an object within a day, or over all time when
+    `day` is null. filled by `analytics.sketches`, `estimate` is the count of the sketch as of its last merge.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name=_('Content Type'))
+    object_id = models.PositiveBigIntegerField(verbose_name=_('Object id'))
+    content_object = GenericForeignKey('content_type', 'object_id')
+    day = models.DateField(null=True, blank=True, verbose_name=_('day'))
+    registers = models.BinaryField(verbose_name=_('registers'))
+    estimate = models.PositiveBigIntegerField(default=0, verbose_name=_('estimated unique visitors'))
+
+    objects = VisitorSketchManager()
+
+    def __str__(self):
+        return f'{self.content_type} {self.object_id} | {self.day or "total"} ~{self.estimate}'
+
+    class Meta:
+        verbose_name = _('Visitor Sketch')
+        verbose_name_plural = _('Visitor Sketches')
+        constraints = (
+            models.UniqueConstraint(fields=('content_type', 'object_id', 'day'), name='visitorsketch_day_unique'),
+            models.UniqueConstraint(fields=('content_type', 'object_id'), condition=models.Q(day=None),
+                                    name='visitorsketch_total_unique'),
+        )
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Trunc
+
+from .models import ObjectLog, VisitRollup, Checkpoint
+from .visits import _excluding_owners, last_log_id
+
+CHECKPOINT = 'rollups'
+
+# buckets are truncated in the current time zone, UTC here, so every day is 24 hours long
+PERIODS = {
+    VisitRollup.Period.HOUR: timedelta(hours=1),
+    VisitRollup.Period.DAY: timedelta(days=1),
+}
+
+
+def dirty_buckets(low, high, period):
+    """the buckets of `period` holding the logs with `low < id <= high`, as `{(start, content type id): object ids}`"""
+    logs = ObjectLog.objects.filter(id__gt=low, id__lte=high).annotate(bucket=Trunc('timestamp', period))
+    buckets = defaultdict(set)
+    for bucket, content_type_id, object_id in logs.values_list('bucket', 'content_type', 'object_id').distinct() \
+            .order_by():
+        buckets[bucket, content_type_id].add(object_id)
+    return buckets
+
+
+def recount(period, bucket, content_type_id, object_ids):
+    """
+    the rollups of `object_ids` for the `period` starting at `bucket`, counted from all of their logs in it (the
+    distinct counts of two chunks can't be added up). reads a range of the (content type, object, timestamp) index.
+    """
+    logs = _excluding_owners(ObjectLog.objects.filter(
+        content_type=content_type_id, object_id__in=object_ids,
+        timestamp__gte=bucket, timestamp__lt=bucket + PERIODS[period],
+    ))
+    rows = logs.values('object_id').annotate(
+        views=Count('id'), users=Count('user', distinct=True),
+        anonymous_ips=Count('ip', distinct=True, filter=Q(user=None)),
+    ).order_by()
+
+    return [VisitRollup(content_type_id=content_type_id, period=period, bucket=bucket, **row) for row in rows]
+
+
+def roll_up(start, end, chunk_size=10000):
+    """
+    refreshes the hourly and daily rollups of the buckets the logs with `start < id <= end` fall in, `chunk_size`
+    ids per transaction. refreshed rollups are recounted from the logs, so running over the same ids again is safe.
+    """
+    for low in range(start, end, chunk_size):
+        high = min(low + chunk_size, end)
+        with transaction.atomic():
+            for period in PERIODS:
+                for (bucket, content_type_id), object_ids in dirty_buckets(low, high, period).items():
+                    rollups = recount(period, bucket, content_type_id, object_ids)
+                    VisitRollup.objects.filter(content_type=content_type_id, object_id__in=object_ids, period=period,
+                                               bucket=bucket).delete()
+                    VisitRollup.objects.bulk_create(rollups)
+            Checkpoint.set_position(CHECKPOINT, high)
+
+
+def roll_up_new_logs(chunk_size=10000, max_chunks=None):
+    """
+    incremental roll up, from the `rollups` checkpoint to the newest log. with `max_chunks`, stops after that many
+    chunks so that a long history gets backfilled over several bounded runs.
+    """
+    start, end = Checkpoint.get_position(CHECKPOINT), last_log_id()
+    if max_chunks is not None:
+        end = min(end, start + chunk_size * max_chunks)
+    roll_up(start, end, chunk_size)
+    return end
+
+
+def backfill(chunk_size=10000, max_chunks=None, restart=False):
+    """rolls the history up in bounded runs, resuming from the checkpoint; `restart` goes back to the first log"""
+    if restart:
+        Checkpoint.set_position(CHECKPOINT, 0)
+    return roll_up_new_logs(chunk_size, max_chunks)
+
+
+def rollups_of(obj, period, since=None, until=None):
+    """the rollups of `obj` for `period`, oldest first"""
+    rollups = VisitRollup.objects.filter(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk,
+                                         period=period)
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=since)
+    if until is not None:
+        rollups = rollups.filter(bucket__lt=until)
+    return rollups.order_by('bucket')
@@ -0,0 +1,9 @@
+from rest_framework import serializers
+
+from .models import VisitRollup
+
+
+class VisitRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VisitRollup
+        fields = ('bucket', 'views', 'users', 'anonymous_ips',)
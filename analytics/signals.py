@@ -1,17 +1,30 @@
 from django.dispatch import receiver, Signal
+from django.utils.module_loading import import_string
 
-from .models import LOGGER_MODEL, ContentType
+from .models import LOGGER_MODEL, LOGGER_WRITER, LOGGER_WRITER_OPTIONS, ContentType, VisitCounter
+from .visits import get_owner_id
 
 object_viewed = Signal()
 
+log_writer = import_string(LOGGER_WRITER)(LOGGER_MODEL, **LOGGER_WRITER_OPTIONS)
+
 
 @receiver(object_viewed)
 def save_user_info_to_object_hit(sender, instance, request, *args, **kwargs):
     """saves the user information viewed the specific object"""
-    LOGGER_MODEL.objects.create(
-        user=request.user,
+    log_writer.write(
+        user=request.user if request.user.is_authenticated else None,
         ip=request.ip_address,
         content_type=ContentType.objects.get_for_model(sender),
         object_id=instance.id,
         content_object=instance
     )
+
+
+@receiver(object_viewed)
+def count_object_visit(sender, instance, request, *args, **kwargs):
+    """increments the precomputed visit counter of the object, unless its owner is the one viewing it"""
+    if request.user.is_authenticated and request.user.id == get_owner_id(instance):
+        return
+
+    VisitCounter.objects.increment(ContentType.objects.get_for_model(sender), instance.id)
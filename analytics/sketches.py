@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .hll import HyperLogLog
+from .models import ObjectLog, VisitorSketch, Checkpoint
+from .visits import _excluding_owners, last_log_id
+
+CHECKPOINT = 'sketches'
+
+VISITOR_SKETCH_PRECISION = getattr(settings, 'VISITOR_SKETCH_PRECISION', 12)
+
+
+def visitor_key(user_id, ip):
+    """what tells visitors apart: the user when signed in, the ip otherwise"""
+    return f'user:{user_id}' if user_id is not None else f'ip:{ip}'
+
+
+def merge_into(content_type_id, object_id, day, sketch):
+    """merges `sketch` into the stored one of the object and day (`None`: all time), creating it if needed"""
+    lookup = {'content_type_id': content_type_id, 'object_id': object_id, 'day': day}
+    with transaction.atomic():
+        stored = VisitorSketch.objects.select_for_update().filter(**lookup).first()
+        if stored is None:
+            try:
+                with transaction.atomic():
+                    VisitorSketch.objects.create(**lookup, registers=sketch.to_bytes(), estimate=sketch.count())
+                return
+            except IntegrityError:  # created by another process in the meantime
+                stored = VisitorSketch.objects.select_for_update().get(**lookup)
+
+        merged = HyperLogLog.from_bytes(stored.registers).merge(sketch)
+        stored.registers, stored.estimate = merged.to_bytes(), merged.count()
+        stored.save(update_fields=('registers', 'estimate'))
+
+
+def merged(content_type, object_id, since, until):
+    """the sketch of the distinct visitors of an object over the days from `since` to `until` (inclusive)"""
+    sketch = HyperLogLog(VISITOR_SKETCH_PRECISION)
+    days = VisitorSketch.objects.filter(content_type=content_type, object_id=object_id, day__gte=since,
+                                        day__lte=until)
+    for registers in days.values_list('registers', flat=True):
+        sketch.merge(HyperLogLog.from_bytes(registers))
+    return sketch
+
+
+def sketch_logs(start, end, chunk_size=10000):
+    """
+    adds the visitors of the logs with `start < id <= end` to the day and all time sketches of their objects,
+    `chunk_size` ids per transaction. merging is idempotent (register-wise max), so running over the same ids
+    again is safe.
+    """
+    for low in range(start, end, chunk_size):
+        high = min(low + chunk_size, end)
+        logs = _excluding_owners(ObjectLog.objects.filter(id__gt=low, id__lte=high))
+
+        sketches = defaultdict(lambda: HyperLogLog(VISITOR_SKETCH_PRECISION))  # (content type, object, day) -> sketch
+        for content_type_id, object_id, user_id, ip, timestamp in logs.values_list(
+                'content_type', 'object_id', 'user', 'ip', 'timestamp').order_by().iterator(chunk_size=2000):
+            visitor = visitor_key(user_id, ip)
+            sketches[content_type_id, object_id, timestamp.date()].add(visitor)
+            sketches[content_type_id, object_id, None].add(visitor)
+
+        with transaction.atomic():
+            for (content_type_id, object_id, day), visitors in sketches.items():
+                merge_into(content_type_id, object_id, day, visitors)
+            Checkpoint.set_position(CHECKPOINT, high)
+
+
+def sketch_new_logs(chunk_size=10000):
+    """incremental run, from the `sketches` checkpoint to the newest log"""
+    end = last_log_id()
+    sketch_logs(Checkpoint.get_position(CHECKPOINT), end, chunk_size)
+    return end
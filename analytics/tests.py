@@ -1,3 +1,212 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from blog.models import Post
+from . import archive, rollups, sketches, visits
+from .hll import HyperLogLog
+from .models import ObjectLog, VisitRollup, VisitorSketch
+from .signals import object_viewed
+from .writers import DirectWriter, BufferedWriter
+
+
+class TestVisitCounters(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='owner@test.local', username='owner', password='pass')
+        cls.visitor = User.objects.create_user(email='visitor@test.local', username='visitor', password='pass')
+        cls.post = Post.objects.create(author=cls.author.profile, title='visited', content='content')
+
+    def setUp(self):
+        patcher = mock.patch('analytics.signals.log_writer', DirectWriter(ObjectLog))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def view(self, user):
+        request = RequestFactory().get('/')
+        request.user, request.ip_address = user, '127.0.0.1'
+        object_viewed.send(sender=Post, instance=self.post, request=request)
+
+    def test_signal_counts_visits_except_the_owner(self):
+        self.view(self.visitor)
+        self.view(self.visitor)
+        self.view(self.author)
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).visits, 2)
+
+    def test_roll_up_drains_recent_visits(self):
+        self.view(self.visitor)
+        visits.roll_up_new_logs()
+
+        counter = self.post.visit_counter.get()
+        self.assertEqual((counter.logged, counter.recent), (1, 0))
+
+    def test_backfill_from_history(self):
+        content_type = ContentType.objects.get_for_model(Post)
+        for user in (self.visitor, None, self.author):
+            ObjectLog.objects.create(user=user, ip='127.0.0.1', content_type=content_type, object_id=self.post.id)
+
+        visits.backfill(chunk_size=1)
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).visits, 2)
+
+
+class TestBufferedWriter(TestCase):
+
+    def test_overflow_is_dropped_and_flushed_on_stop(self):
+        writer = BufferedWriter(ObjectLog, max_size=2, batch_size=10, overflow='drop')
+        content_type = ContentType.objects.get_for_model(ObjectLog)
+
+        with mock.patch.object(writer, '_ensure_started'):  # keeps the background thread from draining the queue
+            for object_id in range(3):
+                writer.write(ip='127.0.0.1', content_type=content_type, object_id=object_id)
+            writer.stop()
+
+        self.assertEqual((writer.written, writer.dropped), (2, 1))
+        self.assertEqual(ObjectLog.objects.count(), 2)
+
+
+class TestVisitRollups(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='owner@test.local', username='owner', password='pass')
+        cls.visitor = User.objects.create_user(email='visitor@test.local', username='visitor', password='pass')
+        cls.post = Post.objects.create(author=cls.author.profile, title='visited', content='content')
+        cls.day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+    def log(self, user, ip, hour):
+        log = ObjectLog.objects.create(user=user, ip=ip, content_type=ContentType.objects.get_for_model(Post),
+                                       object_id=self.post.id)
+        ObjectLog.objects.filter(pk=log.pk).update(timestamp=self.day + timedelta(hours=hour, minutes=5))
+
+    def test_unique_visitors_are_counted_across_chunks(self):
+        for user, ip, hour in ((self.visitor, '10.0.0.1', 10), (self.visitor, '10.0.0.2', 10), (None, '10.0.0.3', 10),
+                               (None, '10.0.0.3', 10), (None, '10.0.0.4', 10), (self.author, '10.0.0.5', 10),
+                               (self.visitor, '10.0.0.1', 11)):
+            self.log(user, ip, hour)
+
+        rollups.roll_up_new_logs(chunk_size=2)
+        rollups.roll_up_new_logs(chunk_size=2)  # nothing new
+
+        hourly = VisitRollup.objects.filter(period='hour').order_by('bucket')
+        self.assertEqual([(r.views, r.users, r.anonymous_ips) for r in hourly], [(5, 1, 2), (1, 1, 0)])
+        daily = VisitRollup.objects.get(period='day')
+        self.assertEqual((daily.bucket, daily.views, daily.users, daily.anonymous_ips), (self.day, 6, 1, 2))
+
+        self.log(None, '10.0.0.6', 11)
+        rollups.roll_up_new_logs(chunk_size=2)
+        self.assertEqual(VisitRollup.objects.get(period='day').anonymous_ips, 3)
+
+    def test_stats_are_shown_to_the_owner_only(self):
+        self.log(self.visitor, '10.0.0.1', 10)
+        rollups.backfill(chunk_size=1, max_chunks=5)
+        url = reverse('blog:post-stats', kwargs={'slug': self.post.slug})
+
+        self.client.force_authenticate(self.visitor)
+        self.assertEqual(self.client.get(url).status_code, 404)  # the posts of others are not even looked up
+        profile_url = reverse('accounts:profile-stats', kwargs={'uid': self.author.profile.uid})
+        self.assertEqual(self.client.get(profile_url).status_code, 403)
+
+        self.client.force_authenticate(self.author)
+        response = self.client.get(url, {'period': 'hour'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['views'] for row in response.data['results']], [1])
+        self.assertEqual(self.client.get(url, {'period': 'week'}).status_code, 400)
+
+
+class TestLogArchive(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.visitor = User.objects.create_user(email='visitor@test.local', username='visitor', password='pass')
+        cls.content_type = ContentType.objects.get_for_model(Post)
+        cls.old = timezone.now() - timedelta(days=120)
+        for days, user in ((0, cls.visitor), (0, None), (40, None), (119, cls.visitor)):
+            log = ObjectLog.objects.create(user=user, ip='10.0.0.1', content_type=cls.content_type, object_id=1)
+            ObjectLog.objects.filter(pk=log.pk).update(timestamp=cls.old + timedelta(days=days))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_cutoff_waits_for_the_rollups(self):
+        self.assertLessEqual(archive.safe_cutoff(90), self.old)
+
+        visits.roll_up_new_logs()
+        rollups.roll_up_new_logs()
+        sketches.sketch_new_logs()
+        cutoff = archive.safe_cutoff(90)
+        self.assertEqual(cutoff.date(), (timezone.now() - timedelta(days=90)).date())
+        self.assertEqual((cutoff.hour, cutoff.minute), (0, 0))
+
+    def test_archive_round_trip(self):
+        logs = {log.id: log for log in ObjectLog.objects.all()}
+        archived = archive.archive(self.old + timedelta(days=90), self.directory, block_size=1, batch_size=1)
+
+        self.assertEqual(sum(rows for _, rows in archived), 3)
+        self.assertEqual(list(ObjectLog.objects.values_list('timestamp', flat=True)), [self.old + timedelta(days=119)])
+
+        read = [row for path, _ in archived for row in archive.read_archive(path)]
+        self.assertEqual({row['id']: (row['user_id'], row['timestamp']) for row in read},
+                         {pk: (logs[pk].user_id, logs[pk].timestamp) for pk in (row['id'] for row in read)})
+
+        for path, rows in archived:
+            self.assertEqual(archive.restore(path), rows)
+            self.assertEqual(archive.restore(path), 0)  # ids already there are skipped
+        self.assertEqual(sorted(ObjectLog.objects.values_list('id', 'timestamp')),
+                         sorted((pk, log.timestamp) for pk, log in logs.items()))
+
+
+class TestVisitorSketches(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='owner@test.local', username='owner', password='pass')
+        cls.visitor = User.objects.create_user(email='visitor@test.local', username='visitor', password='pass')
+        cls.post = Post.objects.create(author=cls.author.profile, title='visited', content='content')
+
+    def setUp(self):
+        patcher = mock.patch('analytics.signals.log_writer', DirectWriter(ObjectLog))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def view(self, user, ip='127.0.0.1'):
+        request = RequestFactory().get('/')
+        request.user, request.ip_address = user, ip
+        object_viewed.send(sender=Post, instance=self.post, request=request)
+
+    def test_estimate_and_merge(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for value in range(10000):
+            (first if value % 2 else second).add(value)
+            first.add(value + 5000)
+
+        merged = first.merge(HyperLogLog.from_bytes(second.to_bytes()))
+        self.assertAlmostEqual(merged.count(), 15000, delta=15000 * 0.05)
+        self.assertLess(len(HyperLogLog().to_bytes()), 64)
+
+    def test_sketches_are_built_from_the_logs(self):
+        self.view(self.visitor)
+        self.view(self.visitor)
+        self.view(AnonymousUser(), ip='10.0.0.1')
+        self.view(self.author)  # owners are not counted
+        sketches.sketch_new_logs(chunk_size=2)
+
+        self.view(AnonymousUser(), ip='10.0.0.2')
+        self.view(self.visitor)
+        sketches.sketch_new_logs()
+        sketches.sketch_logs(0, visits.last_log_id())  # merging again changes nothing
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).unique_visitors, 3)
+        self.assertEqual(VisitorSketch.objects.filter(day=timezone.now().date()).get().estimate, 3)
@@ -0,0 +1,85 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest
+
+from .models import ObjectLog, VisitCounter, Checkpoint
+
+CHECKPOINT = 'visits'
+
+
+def get_owner_id(instance):
+    """
+    id of the user whose visits of `instance` are not counted, following the `visit_owner_field` lookup of its model
+    (e.g. `'author__user'` for posts). `None` when the model does not declare an owner.
+    """
+    path = getattr(instance.__class__, 'visit_owner_field', None)
+    if path is None:
+        return None
+
+    *relations, field = path.split('__')
+    for relation in relations:
+        instance = getattr(instance, relation)
+    return getattr(instance, f'{field}_id')
+
+
+def _excluding_owners(logs):
+    """drops the logs of the owners of the visited objects, for every model declaring `visit_owner_field`"""
+    for content_type in ContentType.objects.filter(pk__in=logs.values('content_type').distinct()):
+        model = content_type.model_class()
+        path = getattr(model, 'visit_owner_field', None)
+        if model is None or path is None:
+            continue
+
+        owner = model.objects.filter(pk=OuterRef('object_id')).values(path)[:1]
+        logs = logs.exclude(Q(content_type=content_type) & Q(user=Subquery(owner)))
+
+    return logs
+
+
+def roll_up(start, end, chunk_size=10000, drain=True):
+    """
+    adds the logs with `start < id <= end` to the `logged` part of the counters, `chunk_size` ids at a time.
+    with `drain`, the same amount is taken off `recent` since the signal path has already counted those visits.
+    """
+    for low in range(start, end, chunk_size):
+        high = min(low + chunk_size, end)
+        logs = _excluding_owners(ObjectLog.objects.filter(id__gt=low, id__lte=high))
+        rows = logs.values('content_type', 'object_id').annotate(hits=Count('id')).order_by()
+
+        with transaction.atomic():
+            for row in rows:
+                _add(row['content_type'], row['object_id'], row['hits'], drain)
+            Checkpoint.set_position(CHECKPOINT, high)
+
+
+def _add(content_type_id, object_id, hits, drain):
+    changes = {'logged': F('logged') + hits}
+    if drain:
+        changes['recent'] = Greatest(F('recent') - hits, 0)
+
+    updated = VisitCounter.objects.filter(content_type_id=content_type_id, object_id=object_id).update(**changes)
+    if not updated:
+        VisitCounter.objects.create(content_type_id=content_type_id, object_id=object_id, logged=hits)
+
+
+def last_log_id():
+    return ObjectLog.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def roll_up_new_logs(chunk_size=10000):
+    """incremental roll up, from the `visits` checkpoint to the newest log"""
+    end = last_log_id()
+    roll_up(Checkpoint.get_position(CHECKPOINT), end, chunk_size)
+    return end
+
+
+def backfill(chunk_size=10000):
+    """recomputes every counter from the whole `ObjectLog` history"""
+    end = last_log_id()
+    with transaction.atomic():
+        VisitCounter.objects.update(logged=0, recent=0)
+        Checkpoint.set_position(CHECKPOINT, 0)
+
+    roll_up(0, end, chunk_size, drain=False)
+    return end
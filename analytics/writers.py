@@ -0,0 +1,147 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class DirectWriter:
+    """saves every log within the request, one INSERT each"""
+
+    def __init__(self, model, **options):
+        self.model = model
+
+    def write(self, **fields):
+        self.model.objects.create(**fields)
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class BufferedWriter(DirectWriter):
+    """
+    queues the logs in memory and saves them from a background thread with `bulk_create`.
+
+    a batch is flushed once `batch_size` logs are waiting or `flush_interval` seconds have passed since its first
+    log, whichever comes first. the queue holds up to `max_size` logs; when it's full the `overflow` policy decides:
+    `'drop'` discards the new log (counted in `dropped`), `'block'` waits up to `block_timeout` seconds for room
+    before dropping it and `'direct'` saves it within the request like `DirectWriter` does.
+
+    `timestamp` is an `auto_now` field, so logs are stamped at flush time, at most `flush_interval` late.
+    whatever is left in the queue is flushed when the worker process exits.
+    """
+    overflow_policies = ('drop', 'block', 'direct')
+
+    def __init__(self, model, max_size=10000, batch_size=500, flush_interval=1.0, overflow='drop',
+                 block_timeout=0.05):
+        super(BufferedWriter, self).__init__(model)
+        if overflow not in self.overflow_policies:
+            raise ValueError(f'overflow must be one of {self.overflow_policies}')
+
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.written = self.dropped = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        atexit.register(self.stop)
+
+    def write(self, **fields):
+        self._ensure_started()
+        log = self.model(**fields)
+        try:
+            if self.overflow == 'block':
+                self.queue.put(log, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(log)
+        except queue.Full:
+            if self.overflow == 'direct':
+                log.save()
+                self._count(written=1)
+            else:
+                self._count(dropped=1)
+
+    def _count(self, written=0, dropped=0):
+        # requests and the background thread update them concurrently
+        with self._lock:
+            self.written += written
+            self.dropped += dropped
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='analytics-log-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """blocks for the first log, then collects more until the batch is full or the interval is over"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _save(self, batch):
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            self._count(written=len(batch))
+        except Exception:
+            self._count(dropped=len(batch))
+            logger.exception('could not save %d object logs', len(batch))
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._next_batch()
+                if batch:
+                    self._save(batch)
+        finally:
+            connection.close()
+
+    def flush(self):
+        """saves everything queued so far, from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) == self.batch_size:
+                self._save(batch)
+                batch = []
+
+        if batch:
+            self._save(batch)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+            self._thread = None
+        self.flush()
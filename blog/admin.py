@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import (Post, Vote, Comment, )
+from .models import (Post, Vote, Comment, TimelineEntry, TagStats, )
 
 
 @admin.register(Post)
@@ -16,3 +16,15 @@ class VoteAdmin(admin.ModelAdmin):
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(TimelineEntry)
+class TimelineEntryAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'post', 'author', 'date_created',)
+    raw_id_fields = ('owner', 'post', 'author',)
+
+
+@admin.register(TagStats)
+class TagStatsAdmin(admin.ModelAdmin):
+    list_display = ('tag', 'post_count', 'last_posted',)
+    raw_id_fields = ('tag',)
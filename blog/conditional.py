@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+from analytics.signals import object_viewed
+
+
+class ConditionalRetrieveMixin:
+    """
+    answers conditional GETs (`If-None-Match`) of a detail view with a 304 out of a single version query, without
+    loading the object, serializing it or running the other queries the serializer needs.
+
+    views define `get_version()`: the values the representation depends on for the viewer of the request, read with
+    one query and returned as a dict (`None` when the object doesn't exist or the viewer may not see it, which sends
+    the request through the normal path and its permission checks). the ETag is a digest of them.
+
+    views counting hits with `ObjectHitMixin` also define `get_version_instance(version)`, an unsaved instance built
+    from the version, so that 304s still count as visits.
+    """
+
+    def get_version(self):
+        raise NotImplementedError('`get_version()` must be implemented')
+
+    def get_version_instance(self, version):
+        return None
+
+    def get_etag(self):
+        if not hasattr(self, 'version'):
+            self.version = self.get_version()
+        if self.version is None:
+            return None
+
+        # the renderer takes part, the same version renders differently as json and in the browsable api
+        payload = json.dumps([self.version, self.request.accepted_renderer.format], default=str, sort_keys=True)
+        return quote_etag(hashlib.sha1(payload.encode()).hexdigest())
+
+    def not_modified(self, request):
+        etag = self.get_etag()
+        if etag is None:
+            return None
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            return None
+
+        if response.status_code == 304:
+            instance = self.get_version_instance(self.version)
+            if instance is not None:
+                object_viewed.send(sender=instance.__class__, instance=instance, request=request)
+        return self.add_validators(response)
+
+    def add_validators(self, response):
+        etag = self.get_etag()
+        if etag is not None and response is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.not_modified(request)
+        if response is None:
+            response = self.add_validators(super().retrieve(request, *args, **kwargs))
+        return response
+
+    def get(self, request, *args, **kwargs):
+        response = self.not_modified(request)
+        if response is None:
+            response = self.add_validators(super().get(request, *args, **kwargs))
+        return response
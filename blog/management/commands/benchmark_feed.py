@@ -0,0 +1,74 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User, Profile, Relation
+from blog import timeline
+from blog.models import Post
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'compares the materialized timeline with the old followings subquery on synthetic data (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=500, help='number of followed authors')
+        parser.add_argument('--posts', type=int, default=40, help='posts per author')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                viewer = self.populate(options['authors'], options['posts'])
+                self.run(viewer, options['page_size'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, authors, posts):
+        tag = uuid.uuid4().hex[:8]
+        # bulk_create skips the `create_profile` signal, so profiles are created explicitly
+        User.objects.bulk_create(
+            User(email=f'bench-{tag}-{i}@bench.local', username=f'bench-{tag}-{i}') for i in range(authors + 1)
+        )
+        users = User.objects.filter(email__startswith=f'bench-{tag}-')
+        Profile.objects.bulk_create(Profile(user=user) for user in users)
+        viewer, *followed = Profile.objects.filter(user__email__startswith=f'bench-{tag}-').order_by('id')
+
+        Relation.objects.bulk_create(
+            Relation(actor=viewer, account=author, state=Relation.RelationState.FOLLOWED) for author in followed
+        )
+        Post.objects.bulk_create(
+            (Post(author=author, title=f'{tag} {i}', slug=f'{tag}-{author.id}-{i}', content='benchmark')
+             for author in followed for i in range(posts)),
+            batch_size=1000,
+        )
+        timeline.rebuild(viewer)
+        self.stdout.write(f'{len(followed)} authors, {len(followed) * posts} posts')
+        return viewer
+
+    def measure(self, label, func, repeat):
+        func()  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        self.stdout.write(f'{label:<12} {elapsed:8.3f} ms/page')
+        return elapsed
+
+    def run(self, viewer, page_size, repeat):
+        def subquery():
+            return list(Post.objects.filter(author__in=viewer.profile_followings())[:page_size])
+
+        def materialized():
+            return list(timeline.get_timeline(viewer)[:page_size])
+
+        old = self.measure('subquery', subquery, repeat)
+        new = self.measure('timeline', materialized, repeat)
+        self.stdout.write(self.style.SUCCESS(f'speedup x{old / new:.2f}'))
@@ -0,0 +1,38 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from blog.utils import is_url
+
+# is_url() checks run by the views and permissions for a single post detail request
+CHECKS = ('profile-posts', 'post-detail', 'profile-posts', 'profile-posts', 'vote-list')
+
+
+class Command(BaseCommand):
+    help = 'compares re-resolving the path on every is_url() call with reading the per request resolver match'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+
+    def handle(self, *args, requests, **options):
+        path = reverse('blog:post-detail', kwargs={'slug': 'benchmark'})
+        factory = RequestFactory()
+
+        def resolving():
+            request = factory.get(path)
+            for name in CHECKS:
+                resolve(request.path_info).url_name == name
+
+        def resolved_once():
+            request = factory.get(path)
+            request.resolver_match = resolve(request.path_info)  # what django's handler does, once
+            for name in CHECKS:
+                is_url(request, url_name=name)
+
+        old = timeit.timeit(resolving, number=requests) / requests * 1e6
+        new = timeit.timeit(resolved_once, number=requests) / requests * 1e6
+        self.stdout.write(f'resolve per call {old:8.2f} us/request')
+        self.stdout.write(f'resolve once     {new:8.2f} us/request')
+        self.stdout.write(self.style.SUCCESS(f'saved {old - new:.2f} us/request'))
@@ -0,0 +1,99 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User, Profile
+from blog import search
+from blog.models import Post, SearchTerm
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'times ranked searches over the inverted index against a LIKE scan, on a synthetic corpus (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--vocabulary', type=int, default=50000, help='number of distinct words in the corpus')
+        parser.add_argument('--words', type=int, default=60, help='words per post')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self.populate(options['posts'], options['vocabulary'], options['words'], options['chunk_size'])
+                self.run(options['vocabulary'], options['queries'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def word(self, vocabulary):
+        # zipf-like: a few words are very common, most are rare
+        return f'w{min(int(self.random.paretovariate(1.1)), vocabulary)}'
+
+    def populate(self, posts, vocabulary, words, chunk_size):
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create(email=f'bench-{tag}@bench.local', username=f'bench-{tag}')
+        author = Profile.objects.get(user=user)
+
+        start = time.perf_counter()
+        for offset in range(0, posts, chunk_size):
+            chunk = [
+                Post(author=author, slug=f'{tag}-{i}', title=' '.join(self.word(vocabulary) for _ in range(6)),
+                     content=' '.join(self.word(vocabulary) for _ in range(words)))
+                for i in range(offset, min(offset + chunk_size, posts))
+            ]
+            Post.objects.bulk_create(chunk, batch_size=chunk_size)
+            if chunk[0].pk is None:  # backends which don't return the ids of bulk inserts
+                ids = dict(Post.objects.filter(slug__in=[post.slug for post in chunk]).values_list('slug', 'pk'))
+                for post in chunk:
+                    post.pk = ids[post.slug]
+            SearchTerm.objects.bulk_create(
+                (term for post in chunk for term in search._terms_of(post, ())), batch_size=chunk_size
+            )
+            self.stdout.write(f'\r{offset + len(chunk)} posts indexed', ending='')
+
+        self.stdout.write(f'\ncorpus built in {time.perf_counter() - start:.1f} s, '
+                          f'{SearchTerm.objects.count()} index rows')
+        self.author = author
+
+    def measure(self, label, func, queries):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        elapsed = (time.perf_counter() - start) / len(queries) * 1000
+        self.stdout.write(f'{label:<14} {elapsed:10.3f} ms/query')
+        return elapsed
+
+    def run(self, vocabulary, count):
+        posts = Post.objects.filter(author=self.author)
+
+        def indexed(query):
+            return list(search.search(query, posts).order_by('-rank', 'id').values_list('id', flat=True)[:20])
+
+        def scan(query):
+            condition = Q()
+            for word in query.split():
+                condition |= Q(title__icontains=word) | Q(content__icontains=word)
+            return list(posts.filter(condition).values_list('id', flat=True)[:20])
+
+        # rare words are what users look for; common ones match most of the corpus, which the index has to rank
+        # while the (unranked) scan stops at the first 20 rows
+        workloads = (
+            ('rare', [f'w{self.random.randint(100, vocabulary)} w{self.random.randint(100, vocabulary)}'
+                      for _ in range(count)]),
+            ('common', [f'{self.word(vocabulary)} {self.word(vocabulary)}' for _ in range(count)]),
+        )
+        for name, queries in workloads:
+            new = self.measure(f'{name} index', indexed, queries)
+            old = self.measure(f'{name} scan', scan, queries)
+            self.stdout.write(self.style.SUCCESS(f'{name} words: index speedup x{old / new:.2f} over the scan'))
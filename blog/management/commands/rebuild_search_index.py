@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from blog import search
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'rebuilds the search index of the posts in chunks, e.g. after bulk inserts which skip the signals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size, **options):
+        indexed = last_pk = 0
+        posts = Post.objects.order_by('pk').only('pk', 'title', 'content').prefetch_related('post_tags')
+
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            search.index_posts(chunk)
+            indexed += len(chunk)
+            last_pk = chunk[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'{indexed} post(s) indexed'))
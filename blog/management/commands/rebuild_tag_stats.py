@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog import tags
+
+
+class Command(BaseCommand):
+    help = 'rebuilds the per tag recency index and post counts from the tags of the posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=tags.BATCH_SIZE)
+
+    def handle(self, *args, chunk_size, **options):
+        entries = tags.rebuild(batch_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'{entries} tag entries indexed'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from blog import timeline
+
+
+class Command(BaseCommand):
+    help = 'rebuilds the materialized home timelines from the current relations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('uids', nargs='*', help='uid of the profiles to rebuild. rebuilds all of them by default')
+
+    def handle(self, *args, uids=(), **options):
+        profiles = Profile.objects.all()
+        if uids:
+            profiles = profiles.filter(uid__in=uids)
+
+        count = 0
+        for profile in profiles.iterator():
+            timeline.rebuild(profile)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{count} timeline(s) rebuilt'))
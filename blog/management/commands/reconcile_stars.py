@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post, Vote
+
+FIELDS = ('star_sum', 'star_count', *(f'star_{star}' for star in Vote.StarChoices.values))
+
+
+class Command(BaseCommand):
+    help = 'recomputes the stored star aggregates of posts from the votes table and fixes the drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='only report the drifted posts')
+
+    def handle(self, *args, chunk_size, dry_run, **options):
+        checked = drifted = 0
+        last_pk = 0
+
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *FIELDS)[:chunk_size])
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+
+            aggregates = {
+                row.pop('post'): row for row in Vote.objects.star_aggregates().filter(post__in=[p.pk for p in posts])
+            }
+            empty = dict.fromkeys(FIELDS, 0)
+
+            changed = []
+            for post in posts:
+                expected = aggregates.get(post.pk, empty)
+                if any(getattr(post, field) != expected[field] for field in FIELDS):
+                    for field in FIELDS:
+                        setattr(post, field, expected[field])
+                    changed.append(post)
+
+            if changed and not dry_run:
+                with transaction.atomic():
+                    Post.objects.bulk_update(changed, FIELDS)
+
+            checked += len(posts)
+            drifted += len(changed)
+
+        action = 'found' if dry_run else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{checked} post(s) checked, {action} {drifted} drifted'))
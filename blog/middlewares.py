@@ -1,5 +1,88 @@
+import atexit
+import ipaddress
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
 from analytics.models import IPAddress
 
+logger = logging.getLogger(__name__)
+
+
+class IPRegistry:
+    """
+    in-process LRU of the ip addresses already saved in `IPAddress`.
+
+    ips missing from it are buffered and inserted together (`bulk_create(ignore_conflicts=True)` against the unique
+    index) once `batch_size` of them are waiting or `flush_interval` seconds have passed, so an already seen ip
+    costs a dictionary lookup.
+    """
+
+    def __init__(self, size=10000, batch_size=100, flush_interval=5.0):
+        self.size = size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._known = OrderedDict()
+        self._pending = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def register(self, ip):
+        with self._lock:
+            if ip in self._known:
+                self._known.move_to_end(ip)
+                return
+
+            self._pending.add(ip)
+            due = len(self._pending) >= self.batch_size or \
+                time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return
+
+        try:
+            IPAddress.objects.register(pending)
+        except Exception:
+            # kept for the next flush rather than lost, and not failing the request that happened to flush
+            with self._lock:
+                self._pending |= pending
+            logger.exception('could not register %d ip addresses', len(pending))
+            return
+
+        with self._lock:
+            for ip in pending:
+                self._known[ip] = None
+            while len(self._known) > self.size:
+                self._known.popitem(last=False)
+
+
+ip_registry = IPRegistry(
+    size=getattr(settings, 'IP_REGISTRY_SIZE', 10000),
+    batch_size=getattr(settings, 'IP_REGISTRY_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'IP_REGISTRY_FLUSH_INTERVAL', 5.0),
+)
+atexit.register(ip_registry.flush)
+
+
+def _valid_ip(value):
+    """`value` normalized if it's an ip address, `None` otherwise"""
+    try:
+        return str(ipaddress.ip_address((value or '').strip()))
+    except ValueError:
+        return None
+
 
 class IPAddressMiddleware:
     def __init__(self, get_response):
@@ -8,13 +91,14 @@ class IPAddressMiddleware:
     def __call__(self, request, *args, **kwargs):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
 
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
+        # the header is set by the client unless a proxy overwrites it, malformed values fall back to the peer
+        ip = _valid_ip(x_forwarded_for.split(',')[0]) if x_forwarded_for else None
+        if ip is None:
+            ip = _valid_ip(request.META.get('REMOTE_ADDR'))
 
-        ip_address, _ = IPAddress.objects.get_or_create(ip=ip)
-        request.ip_address = ip_address.ip
+        if ip is not None:
+            ip_registry.register(ip)
+        request.ip_address = ip
 
         response = self.get_response(request)
         return response
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+def compute_star_aggregates(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Vote = apps.get_model('blog', 'Vote')
+
+    histogram = {f'star_{star}': models.Count('id', filter=models.Q(value=star)) for star in range(1, 6)}
+    aggregates = Vote.objects.filter(value__isnull=False).values('post').annotate(
+        star_sum=models.Sum('value'), star_count=models.Count('id'), **histogram
+    ).order_by()
+
+    for row in aggregates.iterator():
+        Post.objects.filter(pk=row.pop('post')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='star_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='star_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='star_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='star_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='star_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='star_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of stars'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='star_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='sum of stars'),
+        ),
+        migrations.RunPython(compute_star_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:16
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def path_segment(pk):
+    digits = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+    return f'{digits:0>8}/'
+
+
+def compute_comment_paths(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+
+    for comment in Comment.objects.filter(parent__isnull=True).only('pk').iterator():
+        Comment.objects.filter(pk=comment.pk).update(path=path_segment(comment.pk), depth=0)
+
+    # then one level of the threads at a time, the replies whose parent already has its path
+    while True:
+        level = Comment.objects.filter(path='').exclude(parent__path='').select_related('parent')
+        updated = 0
+        for comment in level.only('pk', 'parent__path', 'parent__depth').iterator():
+            Comment.objects.filter(pk=comment.pk).update(
+                path=comment.parent.path + path_segment(comment.pk), depth=comment.parent.depth + 1
+            )
+            updated += 1
+        if not updated:
+            break
+
+    replies = Comment.objects.filter(parent=models.OuterRef('pk')).order_by().values('parent')
+    Comment.objects.update(reply_count=Coalesce(models.Subquery(
+        replies.annotate(count=models.Count('id')).values('count'), output_field=models.IntegerField()
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_star_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='depth'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=1000, verbose_name='path'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of replies'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_prefix_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+        migrations.RunPython(compute_comment_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+def rename_duplicate_slugs(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+
+    duplicates = Post.objects.exclude(slug=None).values('slug').annotate(
+        keep=models.Min('id'), rows=models.Count('id')
+    ).filter(rows__gt=1).order_by()
+    for row in duplicates:
+        for post in Post.objects.filter(slug=row['slug']).exclude(pk=row['keep']).only('pk', 'slug'):
+            Post.objects.filter(pk=post.pk).update(slug=f"{row['slug'][:89]}-{post.pk}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_comment_paths'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, max_length=100, null=True, unique=True, verbose_name='slug'),
+        ),
+    ]
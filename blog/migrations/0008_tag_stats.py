@@ -0,0 +1,97 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_post_tags(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    TagEntry = apps.get_model('blog', 'TagEntry')
+    TagStats = apps.get_model('blog', 'TagStats')
+    Tag = apps.get_model('taggit', 'Tag')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if content_type is None:
+        return
+
+    items = TaggedItem.objects.filter(content_type=content_type).order_by('pk').values_list('pk', 'tag', 'object_id')
+    last_pk = 0
+    while True:
+        chunk = list(items.filter(pk__gt=last_pk)[:1000])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+
+        dates = dict(Post.objects.filter(pk__in={post_id for _, _, post_id in chunk}).values_list('pk', 'date_created'))
+        TagEntry.objects.bulk_create(
+            (TagEntry(tag_id=tag_id, post_id=post_id, date_created=dates[post_id])
+             for _, tag_id, post_id in chunk if post_id in dates),
+            ignore_conflicts=True,
+        )
+
+    stats = Tag.objects.annotate(
+        count=models.Count('entries'), latest=models.Max('entries__date_created')
+    ).filter(count__gt=0)
+    TagStats.objects.bulk_create(
+        (TagStats(tag_id=tag.pk, post_count=tag.count, last_posted=tag.latest) for tag in stats.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0003_taggeditem_add_unique_index'),
+        ('blog', '0007_search_terms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='number of posts')),
+                ('last_posted', models.DateTimeField(blank=True, null=True, verbose_name='date of the latest post')),
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='taggit.tag', verbose_name='tag')),
+            ],
+            options={
+                'verbose_name': 'Tag Stats',
+                'verbose_name_plural': 'Tag Stats',
+                'ordering': ('-post_count',),
+            },
+        ),
+        migrations.CreateModel(
+            name='TagEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(verbose_name='date created')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_entries', to='blog.post', verbose_name='post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='taggit.tag', verbose_name='tag')),
+            ],
+            options={
+                'verbose_name': 'Tag Entry',
+                'verbose_name_plural': 'Tag Entries',
+                'ordering': ('-date_created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tagstats',
+            index=models.Index(fields=['-post_count', 'id'], name='tagstats_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagstats',
+            index=models.Index(fields=['-last_posted', 'id'], name='tagstats_recency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagentry',
+            index=models.Index(fields=['tag', '-date_created', 'post'], name='tagentry_tag_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagentry',
+            unique_together={('tag', 'post')},
+        ),
+        migrations.RunPython(index_post_tags, migrations.RunPython.noop),
+    ]
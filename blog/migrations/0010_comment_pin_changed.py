@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_image_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='pin_changed',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='pin changed'),
+        ),
+    ]
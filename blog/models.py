@@ -1,12 +1,39 @@
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q, F
 
 from django.utils.translation import gettext_lazy as _
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 from django.utils import timezone
+from django.contrib.contenttypes.fields import GenericRelation
 
-from accounts.models import Profile
-from analytics.models import ObjectLog, ContentType
+from accounts.models import Profile, Relation
+from analytics.models import VisitCounter, VisitorSketch
+from images.models import ImageSource
+
+
+class PostQuerySet(models.QuerySet):
+    def visible_to(self, profile):
+        """
+        the posts `profile` may see, the queryset counterpart of `Profile.can_view`: not from authors who blocked it
+        and, for private authors, only if it follows them
+        """
+        relations = Relation.objects.filter(actor=profile)
+        return self.filter(
+            Q(author__private=False) | Q(author=profile) |
+            Q(author__in=relations.filter(state=Relation.RelationState.FOLLOWED).values('account'))
+        ).exclude(
+            author__in=Relation.objects.filter(account=profile, state=Relation.RelationState.BLOCKED).values('actor')
+        )
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    def bulk_create(self, objs, *args, **kwargs):
+        """`pre_save` doesn't run for bulk inserts, so the missing slugs get allocated here, all in one query"""
+        from .utils import allocate_slugs
+        objs = list(objs)
+        allocate_slugs(self.model, [obj for obj in objs if not obj.slug])
+        return super(PostManager, self).bulk_create(objs, *args, **kwargs)
 
 
 class Post(models.Model):
@@ -14,17 +41,40 @@ class Post(models.Model):
                                verbose_name=_('author'))
     title = models.CharField(max_length=256, verbose_name=_('title'))
     image = models.ImageField(blank=True, null=True, upload_to='post_images/', verbose_name=_('image'))
+    image_source = models.ForeignKey(ImageSource, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                     related_name='+', verbose_name=_('image source'))
     file = models.FileField(blank=True, null=True, verbose_name=_('File'))
-    slug = models.SlugField(max_length=100, null=True, blank=True, allow_unicode=True, verbose_name=_('slug'))
+    slug = models.SlugField(max_length=100, null=True, blank=True, unique=True, allow_unicode=True,
+                            verbose_name=_('slug'))
     content = models.TextField(verbose_name=_('content'))
     date_created = models.DateTimeField(auto_now_add=True, editable=False, verbose_name=_('date created'))
     date_edited = models.DateTimeField(auto_now=True, editable=False, verbose_name=_('date edited'))
     post_tags = TaggableManager(blank=True, verbose_name=_('post tags'))
+    visit_counter = GenericRelation(VisitCounter)
+    visitor_sketches = GenericRelation(VisitorSketch)  # deleted along with the post
+    fanned_out = models.BooleanField(default=False, editable=False, verbose_name=_('fanned out'))
+
+    # star aggregates, maintained by the `Vote` save/delete signals and reconciled by `reconcile_stars`
+    star_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('sum of stars'))
+    star_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('number of stars'))
+    star_1 = models.PositiveIntegerField(default=0, editable=False)
+    star_2 = models.PositiveIntegerField(default=0, editable=False)
+    star_3 = models.PositiveIntegerField(default=0, editable=False)
+    star_4 = models.PositiveIntegerField(default=0, editable=False)
+    star_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostManager()
+
+    # how many times a save is retried with a freshly allocated slug when a concurrent save took the same one
+    SLUG_RETRIES = 3
 
     class Meta:
         verbose_name = _('Post')
         verbose_name_plural = _('Posts')
         ordering = ('-date_created',)
+        indexes = (
+            models.Index(fields=('author', '-date_created', 'id'), name='post_author_date_idx'),
+        )
 
     def __init__(self, *args, **kwargs):
         super(Post, self).__init__(*args, **kwargs)
@@ -33,28 +83,80 @@ class Post(models.Model):
     def __str__(self):
         return f'{self.title}'
 
+    def save(self, *args, **kwargs):
+        for attempt in range(self.SLUG_RETRIES):
+            try:
+                with transaction.atomic():
+                    return super(Post, self).save(*args, **kwargs)
+            except IntegrityError:
+                taken = self.__class__.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not taken or attempt == self.SLUG_RETRIES - 1:
+                    raise
+                self.slug = None  # makes `slug_logic` allocate another one
+
+    # visits of the author are not counted
+    visit_owner_field = 'author__user'
+
     @property
     def visits(self):
-        c_type = ContentType.objects.get_for_model(self.__class__)
-        return ObjectLog.objects.filter(~Q(user=self.author.user), content_type=c_type.id, object_id=self.id).count()
+        # `all()` so that a prefetched `visit_counter` is used as is
+        counter = next(iter(self.visit_counter.all()), None)
+        return counter.visits if counter else 0
+
+    @property
+    def unique_visitors(self):
+        """estimated distinct visitors, from the all time sketch (annotated as `unique_visitor_estimate` in lists)"""
+        if hasattr(self, 'unique_visitor_estimate'):
+            return self.unique_visitor_estimate or 0
+        return VisitorSketch.objects.unique_visitors(self)
+
+    @property
+    def star_average(self):
+        return self.star_sum / self.star_count if self.star_count else 0
+
+    @property
+    def star_histogram(self):
+        return {star: getattr(self, f'star_{star}') for star in Vote.StarChoices.values}
 
     def get_tags(self):
         return self.post_tags.names()
 
     def pinned_comments(self):
+        # set by the `PostSerializer` plan
+        if hasattr(self, 'prefetched_pinned_comments'):
+            return self.prefetched_pinned_comments
         return self.comments.filter(pinned=True)
 
 
 class VoteManager(models.Manager):
     def total_stars_related_to_post(self, post):
-        from functools import reduce
-        from operator import add
-        stars_list = self.filter(post=post).values_list('value', flat=True)
-        if stars_list:
-            total = reduce(add, stars_list)
-            return total / len(stars_list)
-        else:
-            return 0
+        """computes the average from the votes table. `Post.star_average` reads the same from the stored counters"""
+        return self.filter(post=post).aggregate(average=models.Avg('value'))['average'] or 0
+
+    def star_aggregates(self):
+        """per post `star_sum`, `star_count` and histogram values, as they should be stored on `Post`"""
+        histogram = {
+            f'star_{star}': models.Count('id', filter=Q(value=star)) for star in Vote.StarChoices.values
+        }
+        return self.filter(value__isnull=False).values('post').annotate(
+            star_sum=models.Sum('value'), star_count=models.Count('id'), **histogram
+        ).order_by()
+
+    def update_post_stars(self, post_id, old_value, new_value):
+        """atomically moves one vote of `post_id` from `old_value` to `new_value` (`None` for no vote)"""
+        if old_value == new_value:
+            return
+
+        changes = {}
+        if old_value is not None:
+            changes.update(star_sum=F('star_sum') - old_value, star_count=F('star_count') - 1)
+            changes[f'star_{old_value}'] = F(f'star_{old_value}') - 1
+        if new_value is not None:
+            changes['star_sum'] = changes.get('star_sum', F('star_sum')) + new_value
+            changes['star_count'] = changes.get('star_count', F('star_count')) + 1
+            changes[f'star_{new_value}'] = F(f'star_{new_value}') + 1
+
+        Post.objects.filter(pk=post_id).update(**changes)
 
 
 class Vote(models.Model):
@@ -76,29 +178,43 @@ class Vote(models.Model):
     value = models.SmallIntegerField(choices=StarChoices.choices, null=True, blank=True, verbose_name=_('star'))
     objects = VoteManager()
 
+    def __init__(self, *args, **kwargs):
+        super(Vote, self).__init__(*args, **kwargs)
+        self.current_value = self.value
+
     class Meta:
         verbose_name = _('Vote')
         verbose_name_plural = _('Votes')
         unique_together = (('post', 'profile'),)
         ordering = ('created',)
+        indexes = (
+            models.Index(fields=('post', 'created', 'id'), name='vote_post_created_idx'),
+        )
 
     def __str__(self):
         return f"{self.profile} --> {self.post} | {self.value}"
 
     @classmethod
+    @transaction.atomic
     def toggle(cls, post, profile, star=None):
+        """
+        sets, changes or (without `star`) removes the vote of `profile`. the row is locked while it's read, so that
+        concurrent toggles move the star aggregates of the post from the value the other one left
+        """
         try:
-            vote = cls.objects.get(post=post, profile=profile)
-            if star:
-                vote.value = star
-                vote.save()
-            else:
-                vote.delete()
+            vote = cls.objects.select_for_update().get(post=post, profile=profile)
         except cls.DoesNotExist:
-            obj = cls.objects.create(
-                post=post, profile=profile, value=star
-            )
-            return obj
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(post=post, profile=profile, value=star)
+            except IntegrityError:  # created by a concurrent toggle in the meantime
+                vote = cls.objects.select_for_update().get(post=post, profile=profile)
+
+        if star:
+            vote.value = star
+            vote.save()
+        else:
+            vote.delete()
 
         return vote
 
@@ -112,12 +228,40 @@ class Comment(models.Model):
                                verbose_name=_('replied to'))
     pinned = models.BooleanField(verbose_name=_('pinned'), default=False)
 
+    # materialized path of the thread: the fixed width base36 ids of the ancestors and the comment itself, each
+    # followed by a '/'. ordering by it gives the threads depth first. set by the `post_save` signal
+    path = models.CharField(max_length=1000, default='', editable=False, verbose_name=_('path'))
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name=_('depth'))
+    # last time the comment got pinned or unpinned, part of the version of its post (see `PostViewSet.get_version`)
+    pin_changed = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('pin changed'))
+    reply_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('number of replies'))
+
+    PATH_SEGMENT_WIDTH = 8
+    # deepest reply whose path still fits in the field, one segment and its '/' per level
+    MAX_DEPTH = path.max_length // (PATH_SEGMENT_WIDTH + 1) - 1
+
+    @classmethod
+    def path_segment(cls, pk):
+        digits = ''
+        while pk:
+            pk, digit = divmod(pk, 36)
+            digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        return f'{digits:0>{cls.PATH_SEGMENT_WIDTH}}/'
+
+    def thread(self, depth=None):
+        """the comment and its replies at any level, or down to `depth` levels below it, depth first"""
+        comments = self.__class__.objects.filter(post_id=self.post_id, path__startswith=self.path)
+        if depth is not None:
+            comments = comments.filter(depth__lte=self.depth + depth)
+        return comments.order_by('path')
+
     @property
     def is_pinned(self):
         return self.pinned
 
     def toggle_pin_Comment(self):
         self.pinned = not self.pinned
+        self.pin_changed = timezone.now()
         self.save()
 
     def __str__(self):
@@ -130,3 +274,83 @@ class Comment(models.Model):
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
         ordering = ('created',)
+        indexes = (
+            models.Index(fields=('post', 'created', 'id'), name='comment_post_created_idx'),
+            models.Index(fields=('post', 'path'), name='comment_post_path_idx'),
+            models.Index(fields=('path',), name='comment_path_prefix_idx', opclasses=('varchar_pattern_ops',)),
+        )
+
+
+class TimelineEntry(models.Model):
+    """materialized home timeline; one row per (follower, post) pushed on write. see `blog.timeline`"""
+    owner = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='timeline', verbose_name=_('owner'))
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='timeline_entries',
+                             verbose_name=_('post'))
+    author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='+', verbose_name=_('author'))
+    date_created = models.DateTimeField(verbose_name=_('date created'))
+
+    def __str__(self):
+        return f'{self.owner} <-- {self.post}'
+
+    class Meta:
+        verbose_name = _('Timeline Entry')
+        verbose_name_plural = _('Timeline Entries')
+        unique_together = (('owner', 'post'),)
+        ordering = ('-date_created',)
+        indexes = (
+            models.Index(fields=('owner', '-date_created', 'post'), name='timeline_owner_date_idx'),
+            models.Index(fields=('owner', 'author'), name='timeline_owner_author_idx'),
+        )
+
+
+class SearchTerm(models.Model):
+    """inverted index of the posts, one row per (term, post) with the weight of the term in it. see `blog.search`"""
+    term = models.CharField(max_length=64, verbose_name=_('term'))
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='search_terms', verbose_name=_('post'))
+    weight = models.PositiveIntegerField(verbose_name=_('weight'))
+
+    def __str__(self):
+        return f'{self.term} --> {self.post_id} | {self.weight}'
+
+    class Meta:
+        verbose_name = _('Search Term')
+        verbose_name_plural = _('Search Terms')
+        unique_together = (('term', 'post'),)
+
+
+class TagEntry(models.Model):
+    """per tag recency index of the posts, one row per (tag, post) kept in sync with `post_tags`. see `blog.tags`"""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='entries', verbose_name=_('tag'))
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='tag_entries', verbose_name=_('post'))
+    date_created = models.DateTimeField(verbose_name=_('date created'))
+
+    def __str__(self):
+        return f'{self.tag} --> {self.post}'
+
+    class Meta:
+        verbose_name = _('Tag Entry')
+        verbose_name_plural = _('Tag Entries')
+        unique_together = (('tag', 'post'),)
+        ordering = ('-date_created',)
+        indexes = (
+            models.Index(fields=('tag', '-date_created', 'post'), name='tagentry_tag_date_idx'),
+        )
+
+
+class TagStats(models.Model):
+    """number of posts and date of the latest post of a tag, maintained along with `TagEntry`"""
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, related_name='stats', verbose_name=_('tag'))
+    post_count = models.PositiveIntegerField(default=0, verbose_name=_('number of posts'))
+    last_posted = models.DateTimeField(null=True, blank=True, verbose_name=_('date of the latest post'))
+
+    def __str__(self):
+        return f'{self.tag} | {self.post_count}'
+
+    class Meta:
+        verbose_name = _('Tag Stats')
+        verbose_name_plural = _('Tag Stats')
+        ordering = ('-post_count',)
+        indexes = (
+            models.Index(fields=('-post_count', 'id'), name='tagstats_count_idx'),
+            models.Index(fields=('-last_posted', 'id'), name='tagstats_recency_idx'),
+        )
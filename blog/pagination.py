@@ -0,0 +1,154 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    opaque cursor (keyset) pagination.
+
+    pages are fetched with `WHERE (ordering fields) after (last row of the previous page) LIMIT n` instead of an
+    OFFSET, so the n-th page costs the same as the first one. the ordering is taken from `view.cursor_ordering`,
+    the queryset or the model's `Meta.ordering` (in that order) and `id` is appended as a tie-breaker.
+
+    the total `count` is included unless the client asks for `?count=false`, which makes the response count-free.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    tie_breaker = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        self.fields = {name: self._get_field(queryset, name) for name, _ in self.ordering}
+
+        self.count = queryset.count() if self.include_count(request) else None
+
+        values, reverse = self.decode_cursor(request)
+        ordering = tuple((name, not desc) for name, desc in self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*(f'-{name}' if desc else name for name, desc in ordering))
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        fields = [('next', self.get_next_link()), ('previous', self.get_previous_link()), ('results', data)]
+        if self.count is not None:
+            fields.insert(0, ('count', self.count))
+
+        return Response(OrderedDict(fields))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() not in ('0', 'false', 'no')
+
+    def get_ordering(self, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or queryset.query.order_by or \
+            queryset.model._meta.ordering
+        ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering if isinstance(name, str)]
+
+        if not any(name in (self.tie_breaker, 'pk') for name, _ in ordering):
+            ordering.append((self.tie_breaker, False))
+
+        return tuple(ordering)
+
+    @staticmethod
+    def _get_field(queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+
+        return queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """`(a, b) > (x, y)` spelled as `a > x OR (a = x AND b > y)` so that mixed directions work too"""
+        conditions = []
+        for index, (name, desc) in enumerate(ordering):
+            equals = {prior: value for (prior, _), value in zip(ordering[:index], values)}
+            conditions.append(Q(**equals, **{f'{name}__{"lt" if desc else "gt"}': values[index]}))
+
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if len(payload['v']) != len(self.ordering):
+                raise ValueError
+            values = [self.fields[name].to_python(value) for (name, _), value in zip(self.ordering, payload['v'])]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        values = [getattr(instance, name) for name, _ in self.ordering]
+        # datetimes keep their microseconds (unlike `DjangoJSONEncoder`), the keyset comparison relies on it
+        payload = json.dumps({'v': values, 'r': int(reverse)}, default=self._encode_value, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _encode_value(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
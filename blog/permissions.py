@@ -1,7 +1,7 @@
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import BasePermission, SAFE_METHODS, IsAdminUser
 
-from accounts.models import Profile
+from accounts.models import Profile, Relation
 from blog.models import Post
 from blog.utils import is_url
 
@@ -40,44 +40,34 @@ class IsVoter(BasePermission):
         return True
 
 
+def get_posts_author(view):
+    """the profile whose posts are listed on the 'profile-posts' route, fetched once per view"""
+    if not hasattr(view, 'posts_author'):
+        view.posts_author = get_object_or_404(Profile, uid=view.kwargs.get('uid'))
+    return view.posts_author
+
+
 class IsPublicOrFollowing(BasePermission):
 
     def has_permission(self, request, view):
         if is_url(request, url_name='profile-posts'):
-            author = get_object_or_404(Profile, uid=view.kwargs.get('uid'))
-
-            if not author.is_private:
-                return True
-
-            followings = author.profile_followings()
-
-            return request.user.profile in (author, *followings)
+            return get_posts_author(view).can_view(request.user.profile)
 
         return True
 
     def has_object_permission(self, request, view, obj):
-        if not obj.author.is_private:
-            return True
-
-        followings = obj.author.profile_followers()
-
-        return request.user.profile in (obj.author, *followings)
+        return obj.author.can_view(request.user.profile)
 
 
 class IsNotBlocked(BasePermission):
     def has_permission(self, request, view):
         if is_url(request, url_name='profile-posts'):
-            author = get_object_or_404(Profile, uid=view.kwargs.get('uid'))
-
-            blocked = author.block_list()
-            return request.user.profile.id not in tuple(blocked)
+            return not Relation.objects.is_blocked(get_posts_author(view), request.user.profile)
 
         return True
 
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Post):
-            blocked = obj.author.block_list().values_list('actor', flat=True)
-
-            return request.user.profile not in tuple(blocked)
+            return not Relation.objects.is_blocked(obj.author_id, request.user.profile)
 
         return True
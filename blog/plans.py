@@ -0,0 +1,41 @@
+class SerializationPlan:
+    """
+    what a serializer needs loaded up front so that serializing any number of rows costs a constant number of
+    queries: `select_related` for the single-valued relations it follows, `prefetch_related` (names or `Prefetch`
+    objects) for the multi-valued ones and `annotations` for the computed values it reads.
+
+    serializers declare it as a `plan` attribute and `PlannedQuerysetMixin` applies it to the view's queryset.
+    """
+
+    def __init__(self, select_related=(), prefetch_related=(), annotations=None):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.annotations = annotations or {}
+
+    def apply(self, queryset, **context):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+
+        annotations = self.get_annotations(**context)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        return queryset
+
+    def get_annotations(self, **context):
+        """annotations may be callables taking the view's context, e.g. for values depending on the viewer"""
+        return {name: value(**context) if callable(value) else value for name, value in self.annotations.items()}
+
+
+class PlannedQuerysetMixin:
+    """applies the `plan` of the view's serializer to the queryset used for both lists and single objects"""
+
+    def get_plan_context(self):
+        return {'request': self.request, 'view': self}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        plan = getattr(self.get_serializer_class(), 'plan', None)
+        return plan.apply(queryset, **self.get_plan_context()) if plan is not None else queryset
@@ -0,0 +1,177 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from analytics.signals import object_viewed
+
+RESPONSE_CACHE = getattr(settings, 'RESPONSE_CACHE', True)
+RESPONSE_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+class ResponseCache:
+    """
+    the viewer independent part of detail responses, kept in one of django's caches (any backend, e.g. local memory
+    or files).
+
+    entries are validated against the generations of the objects they were built from: random tokens kept in the
+    cache, which the signals delete whenever an object changes (`invalidate`). a missing generation gets a new token,
+    so an entry is never served once one of its generations got invalidated or evicted.
+
+    hits and misses are counted in the cache too. generations and counters are only shared between processes with a
+    shared backend (memcached, redis, database or files); with the default local memory cache every process has its
+    own, and an invalidation only reaches the process that made the write. the views check the permissions of a hit
+    against the database for that reason.
+    """
+
+    def __init__(self, enabled=True, alias='default', timeout=300, prefix='response'):
+        self.enabled = enabled
+        self.alias = alias
+        self.timeout = timeout
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self, kind, pk):
+        return f'{self.prefix}:generation:{kind}:{pk}'
+
+    def _entry_key(self, kind, lookup, variant):
+        # slugs may be unicode, and some backends only take short ascii keys
+        return f'{self.prefix}:{kind}:' + hashlib.sha1(f'{lookup}|{variant}'.encode()).hexdigest()
+
+    def generations(self, objects):
+        """the current generation tokens of `objects` (`(kind, pk)` pairs), created for the ones having none"""
+        keys = [self._generation_key(kind, pk) for kind, pk in objects]
+        found = self.cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                token = uuid.uuid4().hex
+                self.cache.add(key, token, timeout=None)
+                found[key] = self.cache.get(key, token)  # another process may have added its own first
+
+        return [found[key] for key in keys]
+
+    def get(self, kind, lookup, variant, validate=None):
+        """the entry, unless one of its generations changed or `validate(entry)` is false"""
+        entry = self.cache.get(self._entry_key(kind, lookup, variant))
+        if entry is not None and entry['generations'] != self.generations(entry['objects']):
+            entry = None
+        if entry is not None and validate is not None and not validate(entry):
+            entry = None
+
+        self._count(kind, 'misses' if entry is None else 'hits')
+        return entry
+
+    def set(self, kind, lookup, variant, objects, generations, **entry):
+        """stores `entry`, `generations` must have been read before the data of the entry was"""
+        entry.update(objects=list(objects), generations=list(generations))
+        self.cache.set(self._entry_key(kind, lookup, variant), entry, self.timeout)
+
+    def invalidate(self, kind, *pks):
+        """drops the generations of the objects now, and again once the transaction commits (`pre_save` comes
+        before the write, so a response filled in between would be built from the old row)"""
+        keys = [self._generation_key(kind, pk) for pk in pks if pk is not None]
+        if keys:
+            self.cache.delete_many(keys)
+            transaction.on_commit(lambda: self.cache.delete_many(keys))
+
+    def _count(self, kind, counter):
+        key = f'{self.prefix}:metrics:{kind}:{counter}'
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, 1, timeout=None):
+                self.cache.incr(key)
+
+    def metrics(self, kinds=('post', 'profile')):
+        keys = {kind: [f'{self.prefix}:metrics:{kind}:{counter}' for counter in ('hits', 'misses')] for kind in kinds}
+        values = self.cache.get_many([key for pair in keys.values() for key in pair])
+
+        metrics = {}
+        for kind, (hits_key, misses_key) in keys.items():
+            hits, misses = values.get(hits_key, 0), values.get(misses_key, 0)
+            metrics[kind] = {'hits': hits, 'misses': misses,
+                             'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None}
+        return metrics
+
+
+response_cache = ResponseCache(
+    enabled=RESPONSE_CACHE, alias=RESPONSE_CACHE_ALIAS, timeout=RESPONSE_CACHE_TIMEOUT,
+)
+
+
+class CachedRetrieveMixin:
+    """
+    serves `retrieve` out of the `response_cache`, on top of `ConditionalRetrieveMixin` whose version it stores
+    along with the serialized data.
+
+    the version is read from the database on every request, hits included: an entry is only served while its
+    version is still the current one, so an entry another process made stale (with a cache which is not shared,
+    its invalidations don't reach this one) is a miss.
+
+    views set `cache_kind` and define `get_cache_objects(version)` (the `(kind, pk)` objects the response is built
+    from), `is_cacheable(version)` and `can_view_cached(version)` (the object permissions of a hit, which aren't
+    already part of `get_version`). the parts depending on the viewer are never shared: `viewer_version_fields` are
+    the keys of the version left out when comparing it with the entry's, `get_viewer_data(version)` gives the
+    values of the serialized fields computed for every hit.
+    """
+    cache_kind = None
+    viewer_version_fields = ()
+
+    def get_cache_objects(self, version):
+        raise NotImplementedError('`get_cache_objects()` must be implemented')
+
+    def is_cacheable(self, version):
+        return True
+
+    def can_view_cached(self, version):
+        return True
+
+    def _shared_version(self, version):
+        return {key: value for key, value in version.items() if key not in self.viewer_version_fields}
+
+    def get_viewer_data(self, version):
+        return {}
+
+    def retrieve(self, request, *args, **kwargs):
+        if not response_cache.enabled:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        # hyperlinks are absolute and the renderer changes the etag, both vary the entry
+        variant = f'{request.build_absolute_uri("/")}|{request.accepted_renderer.format}'
+
+        self.get_etag()  # reads `self.version`
+        if self.version is None or not self.is_cacheable(self.version):
+            return super().retrieve(request, *args, **kwargs)
+
+        current = self._shared_version(self.version)
+        entry = response_cache.get(self.cache_kind, lookup, variant,
+                                   validate=lambda entry: self._shared_version(entry['version']) == current)
+        if entry is not None and self.can_view_cached(self.version):
+            return self.cached_response(request, entry)
+
+        objects = self.get_cache_objects(self.version)
+        generations = response_cache.generations(objects)
+        # what gets stored must be read after the generations, see `ResponseCache.set`
+        self.version = self.get_version()
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200 and self.version is not None and self.is_cacheable(self.version):
+            response_cache.set(self.cache_kind, lookup, variant, objects, generations,
+                               version=self.version, data=dict(response.data))
+        return response
+
+    def cached_response(self, request, entry):
+        response = self.not_modified(request)
+        if response is None:
+            instance = self.get_version_instance(self.version)
+            if instance is not None:
+                object_viewed.send(sender=instance.__class__, instance=instance, request=request)
+            response = self.add_validators(Response({**entry['data'], **self.get_viewer_data(self.version)}))
+        return response
@@ -0,0 +1,71 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import Post, SearchTerm
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the this to was were will with'.split()
+)
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+# how much an occurrence of a term weighs in each part of a post
+TITLE_WEIGHT, TAGS_WEIGHT, CONTENT_WEIGHT = 5, 3, 1
+# occurrences counted per term and part, so that repeating a word doesn't push a post to the top
+MAX_OCCURRENCES = 5
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def document_terms(title, content, tags):
+    """`{term: weight}` of a post"""
+    weights = Counter()
+    for text, weight in ((title, TITLE_WEIGHT), (' '.join(tags), TAGS_WEIGHT), (content, CONTENT_WEIGHT)):
+        for term, occurrences in Counter(tokenize(text)).items():
+            weights[term] += weight * min(occurrences, MAX_OCCURRENCES)
+    return weights
+
+
+def _terms_of(post, tags):
+    return [
+        SearchTerm(term=term, post_id=post.pk, weight=weight)
+        for term, weight in document_terms(post.title, post.content, tags).items()
+    ]
+
+
+def index_post(post):
+    with transaction.atomic():
+        SearchTerm.objects.filter(post=post).delete()
+        SearchTerm.objects.bulk_create(_terms_of(post, post.post_tags.names()))
+
+
+def index_posts(posts, batch_size=1000):
+    """(re)indexes many posts at once, `posts` should have their `post_tags` prefetched"""
+    posts = list(posts)
+    with transaction.atomic():
+        SearchTerm.objects.filter(post__in=[post.pk for post in posts]).delete()
+        SearchTerm.objects.bulk_create(
+            (term for post in posts for term in _terms_of(post, [tag.name for tag in post.post_tags.all()])),
+            batch_size=batch_size,
+        )
+
+
+def search(query, queryset=None):
+    """
+    the posts matching any term of `query`, annotated with their `rank`: the summed weights of the matched terms.
+    order them by `('-rank', 'id')`.
+    """
+    queryset = Post.objects.all() if queryset is None else queryset
+    terms = set(tokenize(query))
+    if not terms:
+        return queryset.none()
+
+    return queryset.filter(search_terms__term__in=terms).annotate(rank=Sum('search_terms__weight'))
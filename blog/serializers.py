@@ -1,15 +1,29 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import OuterRef, Prefetch, Subquery
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from taggit_serializer.serializers import (TagListSerializerField,
                                            TaggitSerializer)
 
 from accounts.models import Profile
-from .models import Post, Vote, Comment
+from analytics.models import VisitorSketch
+from images.serializers import RenditionsField
+from .models import Post, Vote, Comment, TagStats
 from .apps import BlogConfig as app
+from .plans import SerializationPlan
 from accounts.apps import AccountsConfig as accounts_app
 
 
+def _unique_visitor_estimate(**context):
+    """the estimate of the all time visitor sketch of the outer post, as a subquery"""
+    sketches = VisitorSketch.objects.filter(content_type=ContentType.objects.get_for_model(Post),
+                                            object_id=OuterRef('pk'), day=None)
+    return Subquery(sketches.values('estimate')[:1])
+
+
 class PostSerializer(TaggitSerializer, serializers.HyperlinkedModelSerializer):
-    stars = serializers.SerializerMethodField(method_name='votes')
+    stars = serializers.FloatField(source='star_average', read_only=True)
+    star_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     post_tags = TagListSerializerField(help_text="the format must be a \"list\" of tags")
 
@@ -19,6 +33,19 @@ class PostSerializer(TaggitSerializer, serializers.HyperlinkedModelSerializer):
         view_name='blog:comment-detail'
     )
     author_name = serializers.CharField(source='author.user.username', read_only=True)
+    unique_visitors = serializers.IntegerField(read_only=True)
+    image_renditions = RenditionsField(source='image_source')
+
+    plan = SerializationPlan(
+        select_related=('author__user', 'image_source'),
+        prefetch_related=(
+            'post_tags',
+            'visit_counter',
+            'image_source__renditions',
+            Prefetch('comments', queryset=Comment.objects.filter(pinned=True), to_attr='prefetched_pinned_comments'),
+        ),
+        annotations={'unique_visitor_estimate': _unique_visitor_estimate},
+    )
 
     class Meta:
         model = Post
@@ -29,25 +56,26 @@ class PostSerializer(TaggitSerializer, serializers.HyperlinkedModelSerializer):
             'title',
             'content',
             'image',
+            'image_renditions',
             'file',
             # 'slug',
             'visits',
+            'unique_visitors',
             'stars',
+            'star_count',
+            'star_histogram',
             'post_tags',
             'date_created',
             'date_edited',
             'pinned_comments',
         )
-        read_only_fields = ('slug', 'visits', 'likes', 'author',)
+        read_only_fields = ('slug', 'visits', 'likes', 'author', 'star_count',)
         optional_fields = ('image', 'file', 'post_tags',)
         extra_kwargs = {
             'url': {'view_name': f'{app.name}:post-detail', 'lookup_field': 'slug'},
             'author': {'view_name': f'{accounts_app.name}:profile-detail', 'lookup_field': 'uid'}
         }
 
-    def votes(self, obj):
-        return Vote.objects.total_stars_related_to_post(obj)
-
 
 class VoteProfileSerializer(serializers.HyperlinkedModelSerializer):
     username = serializers.CharField(source='user.username')
@@ -111,7 +139,7 @@ class CommentListSerializer(serializers.HyperlinkedModelSerializer):
         read_only_fields = ('parent', 'post', 'parent_id')
 
     def get_has_replies(self, obj):
-        return obj.replies.all().exists()
+        return obj.reply_count > 0
 
 
 class CommentRetrieveSerializer(serializers.HyperlinkedModelSerializer):
@@ -141,4 +169,44 @@ class CommentRetrieveSerializer(serializers.HyperlinkedModelSerializer):
         )
 
     def get_has_replies(self, obj):
-        return obj.replies.all().exists()
+        return obj.reply_count > 0
+
+
+class CommentTreeSerializer(serializers.HyperlinkedModelSerializer):
+    """a comment with its replies nested, from the `tree_replies` lists built by `CommentTree`"""
+    user = serializers.CharField(source='user.user.username', read_only=True)
+    replies = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Comment
+        fields = (
+            "url",
+            "user",
+            "text",
+            "created",
+            "is_pinned",
+            "depth",
+            "reply_count",
+            "replies",
+        )
+        extra_kwargs = {
+            'url': {'view_name': f'{app.name}:comment-detail', 'lookup_field': 'pk'},
+        }
+
+    def get_replies(self, obj):
+        return self.__class__(getattr(obj, 'tree_replies', ()), many=True, context=self.context).data
+
+
+class TagStatsSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='tag.name')
+    slug = serializers.CharField(source='tag.slug')
+    posts = serializers.SerializerMethodField()
+
+    plan = SerializationPlan(select_related=('tag',))
+
+    class Meta:
+        model = TagStats
+        fields = ('name', 'slug', 'post_count', 'last_posted', 'posts',)
+
+    def get_posts(self, obj):
+        return reverse(f'{app.name}:tag-posts', kwargs={'slug': obj.tag.slug}, request=self.context.get('request'))
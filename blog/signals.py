@@ -1,19 +1,141 @@
 from django.dispatch import receiver, Signal
-from django.db.models.signals import pre_save
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 
-from .models import Post
-from blog import utils
-import uuid
+from accounts.models import Relation
+from accounts.signals import relations_changed
+from .models import Post, Vote, Comment
+from blog import utils, timeline, search, tags
+from images import pipeline
+from .response_cache import response_cache
 
 
 @receiver(pre_save, sender=Post)
 def slug_logic(sender, instance, *args, **kwargs):
     if (not instance.slug) or (instance.current_title != instance.title):
-        # gets the field we want to slugify based on that
-        indicator = instance.title or (uuid.uuid4(), instance.author)
-
-        exists, to_slug = utils.get_slug(instance, indicator)
-        while exists:
-            exists, to_slug = utils.get_slug(instance, uuid.uuid4(), indicator)
-        instance.slug = to_slug
+        utils.allocate_slugs(sender, [instance])
         instance.current_title = instance.title
+
+
+@receiver(pre_save, sender=Post)
+def link_image_source(sender, instance, *args, **kwargs):
+    pipeline.link(instance, 'image', 'image_source')
+
+
+@receiver(post_save, sender=Post)
+def queue_image_renditions(sender, instance, *args, **kwargs):
+    pipeline.queue_renditions(instance)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, *args, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, *args, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.post_tags.through)
+def update_search_index_on_tags_change(sender, instance, action, *args, **kwargs):
+    if isinstance(instance, Post) and action in ('post_add', 'post_remove', 'post_clear'):
+        search.index_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.post_tags.through)
+def update_tag_stats(sender, instance, action, pk_set, *args, **kwargs):
+    if not isinstance(instance, Post):
+        return
+
+    if action == 'post_add':
+        tags.tags_added(instance, pk_set)
+    elif action == 'post_remove':
+        tags.tags_removed(instance, pk_set)
+    elif action == 'post_clear':
+        tags.tags_removed(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def update_tag_stats_on_delete(sender, instance, *args, **kwargs):
+    tags.tags_removed(instance)
+
+
+@receiver(post_save, sender=Relation)
+def update_timeline_on_relation_change(sender, instance, *args, **kwargs):
+    if instance.state == Relation.RelationState.FOLLOWED:
+        timeline.add_author(instance.actor, instance.account)
+    else:
+        timeline.remove_author(instance.actor, instance.account)
+
+
+@receiver(post_delete, sender=Relation)
+def update_timeline_on_relation_delete(sender, instance, *args, **kwargs):
+    timeline.remove_author(instance.actor_id, instance.account_id)
+
+
+@receiver(relations_changed, sender=Relation)
+def update_timelines_on_bulk_relation_change(sender, pairs, state, *args, **kwargs):
+    if state == Relation.RelationState.FOLLOWED:
+        timeline.add_authors(pairs)
+    elif state != Relation.RelationState.REQUESTED:  # new requests had nothing in the timelines
+        timeline.remove_authors(pairs)
+
+
+@receiver(post_save, sender=Vote)
+def update_post_stars_on_save(sender, instance, created, *args, **kwargs):
+    sender.objects.update_post_stars(instance.post_id, None if created else instance.current_value, instance.value)
+    instance.current_value = instance.value
+
+
+@receiver(post_delete, sender=Vote)
+def update_post_stars_on_delete(sender, instance, *args, **kwargs):
+    sender.objects.update_post_stars(instance.post_id, instance.current_value, None)
+
+
+@receiver(post_save, sender=Comment)
+def set_comment_path(sender, instance, created, *args, **kwargs):
+    if not created:
+        return
+
+    parent = sender.objects.filter(pk=instance.parent_id).values('path', 'depth').first()
+    instance.path = (parent['path'] if parent else '') + sender.path_segment(instance.pk)
+    instance.depth = parent['depth'] + 1 if parent else 0
+    sender.objects.filter(pk=instance.pk).update(path=instance.path, depth=instance.depth)
+
+    if parent:
+        sender.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_reply_count(sender, instance, *args, **kwargs):
+    if instance.parent_id:
+        sender.objects.filter(pk=instance.parent_id, reply_count__gt=0).update(reply_count=F('reply_count') - 1)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(m2m_changed, sender=Post.post_tags.through)
+def invalidate_cached_post(sender, instance, *args, **kwargs):
+    if isinstance(instance, Post):
+        response_cache.invalidate('post', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_cached_author_on_new_post(sender, instance, created, *args, **kwargs):
+    if created:  # the number of posts of the author changed
+        response_cache.invalidate('profile', instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_cached_post_on_delete(sender, instance, *args, **kwargs):
+    response_cache.invalidate('post', instance.pk)
+    response_cache.invalidate('profile', instance.author_id)
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_cached_post_on_votes_and_comments(sender, instance, *args, **kwargs):
+    response_cache.invalidate('post', instance.post_id)
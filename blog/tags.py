@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Count, Max, OuterRef, Subquery
+from taggit.models import Tag, TaggedItem
+
+from .models import Post, TagEntry, TagStats
+
+BATCH_SIZE = getattr(settings, 'TAG_STATS_BATCH_SIZE', 1000)
+
+
+def _refresh_last_posted(tag_ids):
+    latest = TagEntry.objects.filter(tag=OuterRef('tag')).order_by('-date_created').values('date_created')[:1]
+    TagStats.objects.filter(tag__in=tag_ids).update(last_posted=Subquery(latest))
+
+
+@transaction.atomic
+def tags_added(post, tag_ids):
+    """indexes `post` under the newly assigned `tag_ids` and bumps their counts"""
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return
+
+    TagEntry.objects.bulk_create(
+        (TagEntry(tag_id=tag_id, post_id=post.pk, date_created=post.date_created) for tag_id in tag_ids),
+        ignore_conflicts=True,
+    )
+    TagStats.objects.bulk_create((TagStats(tag_id=tag_id) for tag_id in tag_ids), ignore_conflicts=True)
+    TagStats.objects.filter(tag__in=tag_ids).update(post_count=F('post_count') + 1)
+    _refresh_last_posted(tag_ids)
+
+
+@transaction.atomic
+def tags_removed(post, tag_ids=None):
+    """drops `post` from the index of `tag_ids` (all of its tags when `None`) and decrements their counts"""
+    entries = TagEntry.objects.filter(post_id=post.pk)
+    if tag_ids is not None:
+        entries = entries.filter(tag__in=tag_ids)
+
+    tag_ids = list(entries.values_list('tag', flat=True))
+    if not tag_ids:
+        return
+
+    entries.delete()
+    TagStats.objects.filter(tag__in=tag_ids, post_count__gt=0).update(post_count=F('post_count') - 1)
+    _refresh_last_posted(tag_ids)
+
+
+def tagged_posts(tag, queryset=None):
+    """the posts tagged `tag`, latest first, read from the recency index and annotated with `tag_date`"""
+    queryset = Post.objects.all() if queryset is None else queryset
+    return queryset.filter(tag_entries__tag=tag).annotate(tag_date=F('tag_entries__date_created')).order_by(
+        '-tag_date', 'id'
+    )
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """recomputes the index and the stats from taggit's `TaggedItem` rows of the posts"""
+    items = TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post)).order_by('pk')
+
+    with transaction.atomic():
+        TagEntry.objects.all().delete()
+        TagStats.objects.all().delete()
+
+        last_pk = 0
+        while True:
+            chunk = list(items.filter(pk__gt=last_pk).values_list('pk', 'tag', 'object_id')[:batch_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+
+            post_ids = {post_id for _, _, post_id in chunk}
+            dates = dict(Post.objects.filter(pk__in=post_ids).values_list('pk', 'date_created'))
+            TagEntry.objects.bulk_create(
+                (TagEntry(tag_id=tag_id, post_id=post_id, date_created=dates[post_id])
+                 for _, tag_id, post_id in chunk if post_id in dates),
+                ignore_conflicts=True,
+            )
+
+        stats = Tag.objects.annotate(count=Count('entries'), latest=Max('entries__date_created')).filter(count__gt=0)
+        TagStats.objects.bulk_create(
+            (TagStats(tag_id=tag.pk, post_count=tag.count, last_posted=tag.latest) for tag in stats.iterator()),
+            batch_size=batch_size,
+        )
+
+    return TagEntry.objects.count()
@@ -1,7 +1,27 @@
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DataError, connection
+from django.db.models.query import QuerySet
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
-from .models import Post
+from accounts.models import User, Relation, Profile
+from analytics.models import IPAddress, VisitCounter
+from .middlewares import IPRegistry
+from .models import Post, Vote, Comment, TagEntry, TagStats
+from .utils import is_url
+from .response_cache import response_cache
+from . import timeline
 
 
 class TestPost(APITestCase):
@@ -19,3 +39,537 @@ class TestPost(APITestCase):
     def test_create_post(self):
         response = self.client.post(path=url, data=data, format='json')
 
+
+
+class TestTimeline(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(email='reader@test.local', username='reader', password='pass').profile
+        cls.author = User.objects.create_user(email='author@test.local', username='author', password='pass').profile
+        cls.relation = Relation.objects.create(actor=cls.reader, account=cls.author,
+                                               state=Relation.RelationState.FOLLOWED)
+
+    def test_post_is_pushed_to_followers(self):
+        post = Post.objects.create(author=self.author, title='pushed', content='content')
+
+        self.assertTrue(post.fanned_out)
+        self.assertEqual(list(timeline.get_timeline(self.reader)), [post])
+
+    def test_unfollow_removes_author_posts(self):
+        Post.objects.create(author=self.author, title='removed', content='content')
+        self.relation.unfollow()
+
+        self.assertFalse(timeline.get_timeline(self.reader).exists())
+
+    def test_posts_over_fanout_limit_are_merged_on_read(self):
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 0):
+            post = Post.objects.create(author=self.author, title='pulled', content='content')
+
+        self.assertFalse(post.fanned_out)
+        self.assertEqual(list(timeline.get_timeline(self.reader)), [post])
+
+    def test_merge_on_read_takes_constant_queries(self):
+        # bulk inserts are not fanned out
+        Post.objects.bulk_create(Post(author=self.author, title=f'pulled {i}', content='c') for i in range(20))
+
+        # the pulled posts, then their entries; nothing is written once they are merged
+        with self.assertNumQueries(2):
+            timeline.merge_pulled_posts(self.reader)
+        with self.assertNumQueries(1):
+            timeline.merge_pulled_posts(self.reader)
+        self.assertEqual(timeline.get_timeline(self.reader).count(), 20)
+
+
+class TestKeysetPagination(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='paged@test.local', username='paged', password='pass')
+        cls.posts = [Post.objects.create(author=cls.user.profile, title=f'post {i}', content='content')
+                     for i in range(5)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_walks_pages_forward_and_back(self):
+        url = reverse('accounts:profile-posts', kwargs={'uid': self.user.profile.uid})
+        first = self.client.get(url, {'page_size': 2}).data
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+        back = self.client.get(second['previous']).data
+
+        slugs = [post['url'] for page in (first, second, third) for post in page['results']]
+        self.assertEqual(len(set(slugs)), 5)
+        self.assertEqual(first['count'], 5)
+        self.assertIsNone(third['next'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_count_free_response(self):
+        response = self.client.get(reverse('blog:post-list'), {'count': 'false'})
+
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('blog:post-list'), {'cursor': 'garbage'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class TestStarAggregates(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='starred@test.local', username='starred', password='pass').profile
+        cls.voter = User.objects.create_user(email='voter@test.local', username='voter', password='pass').profile
+        cls.post = Post.objects.create(author=cls.author, title='starred', content='content')
+
+    def test_toggle_maintains_counters(self):
+        Vote.toggle(self.post, self.voter, 4)
+        Vote.toggle(self.post, self.author, 2)
+        Vote.toggle(self.post, self.voter, 5)
+        self.post.refresh_from_db()
+
+        self.assertEqual((self.post.star_sum, self.post.star_count), (7, 2))
+        self.assertEqual(self.post.star_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+        self.assertEqual(self.post.star_average, Vote.objects.total_stars_related_to_post(self.post))
+
+        Vote.toggle(self.post, self.voter)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.star_sum, self.post.star_count, self.post.star_5), (2, 1, 0))
+
+    def test_toggle_after_a_concurrent_first_vote(self):
+        Vote.toggle(self.post, self.voter, 4)
+        get, missed = QuerySet.get, []
+
+        def get_missing_once(queryset, *args, **kwargs):
+            # the row the other toggle inserted once this one found none
+            if queryset.model is Vote and not missed:
+                missed.append(True)
+                raise Vote.DoesNotExist
+            return get(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'get', get_missing_once):
+            Vote.toggle(self.post, self.voter, 2)
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.star_sum, self.post.star_count, self.post.star_4, self.post.star_2), (2, 1, 0, 1))
+
+    def test_reconcile_fixes_drift(self):
+        Vote.toggle(self.post, self.voter, 3)
+        Post.objects.filter(pk=self.post.pk).update(star_sum=42, star_count=0)
+
+        call_command('reconcile_stars', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.star_sum, self.post.star_count, self.post.star_3), (3, 1, 1))
+
+
+class TestIPRegistry(APITestCase):
+
+    def test_new_ips_are_inserted_in_batches(self):
+        registry = IPRegistry(size=2, batch_size=2, flush_interval=60)
+        IPAddress.objects.create(ip='10.0.0.1')
+
+        with self.assertNumQueries(0):
+            registry.register('10.0.0.1')
+        with self.assertNumQueries(1):
+            registry.register('10.0.0.2')
+        with self.assertNumQueries(0):
+            registry.register('10.0.0.1')
+            registry.register('10.0.0.2')
+
+        self.assertEqual(IPAddress.objects.filter(ip__in=('10.0.0.1', '10.0.0.2')).count(), 2)
+
+    def test_failed_flushes_keep_the_batch(self):
+        registry = IPRegistry(batch_size=1, flush_interval=60)
+        with mock.patch.object(IPAddress.objects, 'register', side_effect=DataError), self.assertLogs('blog'):
+            registry.register('10.0.0.3')
+
+        registry.flush()
+        self.assertTrue(IPAddress.objects.filter(ip='10.0.0.3').exists())
+
+    def test_malformed_forwarded_ips_fall_back_to_the_peer(self):
+        self.client.force_authenticate(User.objects.create_user(email='ip@test.local', username='ip', password='p'))
+        with mock.patch('blog.middlewares.ip_registry') as registry:
+            self.client.get(reverse('blog:feed'), HTTP_X_FORWARDED_FOR='not-an-ip, 10.0.0.9')
+
+        registry.register.assert_called_once_with('127.0.0.1')
+
+
+class TestPostListQueries(APITestCase):
+    """every post list renders any page size with the same number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(email='lister@test.local', username='lister', password='pass')
+        cls.author = User.objects.create_user(email='listed@test.local', username='listed', password='pass')
+        Relation.objects.create(actor=cls.reader.profile, account=cls.author.profile,
+                                state=Relation.RelationState.FOLLOWED)
+
+        for i in range(6):
+            post = Post.objects.create(author=cls.author.profile, title=f'listed {i}', content='content')
+            post.post_tags.add('django', f'tag{i}')
+            Comment.objects.create(user=cls.reader.profile, post=post, text='pinned', pinned=True)
+            Vote.toggle(post, cls.reader.profile, 4)
+            VisitCounter.objects.increment(ContentType.objects.get_for_model(Post), post.id)
+
+    def assertConstantQueries(self, url, expected, user=None):
+        self.client.force_authenticate(user or self.reader)
+        for page_size in (1, 6):
+            cache.clear()
+            with self.assertNumQueries(expected):
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_feed(self):
+        self.assertConstantQueries(reverse('blog:feed'), 6)
+
+    def test_own_posts(self):
+        self.assertConstantQueries(reverse('blog:post-list'), 5, user=self.author)
+
+    def test_profile_posts(self):
+        self.assertConstantQueries(reverse('accounts:profile-posts', kwargs={'uid': self.author.profile.uid}), 7)
+
+
+class TestCommentTree(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='threads@test.local', username='threads', password='pass')
+        cls.post = Post.objects.create(author=cls.user.profile, title='threads', content='content')
+        comment = lambda parent=None: Comment.objects.create(user=cls.user.profile, post=cls.post, text='text',
+                                                             parent=parent)
+        cls.root = comment()
+        cls.reply = comment(cls.root)
+        cls.nested = comment(cls.reply)
+        cls.other = comment()
+
+    def test_paths_and_reply_counts(self):
+        self.root.refresh_from_db()
+        self.nested.refresh_from_db()
+
+        self.assertEqual(self.root.reply_count, 1)
+        self.assertEqual(self.nested.depth, 2)
+        self.assertTrue(self.nested.path.startswith(self.root.path))
+        self.assertEqual(list(self.root.thread()), [self.root, self.reply, self.nested])
+
+    def test_tree_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('blog:comment-tree', kwargs={'slug': self.post.slug}))
+
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['replies'][0]['replies'][0]['depth'], 2)
+
+    def test_replies_stop_at_the_deepest_path(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('blog:comment-detail', kwargs={'pk': self.nested.pk})
+        with mock.patch('analytics.signals.log_writer'):
+            self.assertEqual(self.client.post(url, {'text': 'reply'}).status_code, 201)
+
+            Comment.objects.filter(pk=self.nested.pk).update(depth=Comment.MAX_DEPTH)
+            self.assertEqual(self.client.post(url, {'text': 'too deep'}).status_code, 400)
+
+        self.assertLessEqual((Comment.MAX_DEPTH + 1) * (Comment.PATH_SEGMENT_WIDTH + 1),
+                             Comment._meta.get_field('path').max_length)
+
+    def test_depth_limited_subtree(self):
+        response = self.client.get(reverse('blog:comment-subtree', kwargs={'pk': self.root.pk}), {'depth': 1})
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['replies'][0]['replies'], [])
+
+
+class TestRouteResolution(APITestCase):
+
+    def test_path_is_resolved_once(self):
+        request = RequestFactory().get(reverse('blog:feed'))
+
+        with mock.patch('blog.utils.resolve', wraps=resolve) as resolver:
+            self.assertTrue(is_url(request, url_name='feed'))
+            self.assertFalse(is_url(request, url_name='post-detail'))
+
+        resolver.assert_called_once()
+
+
+class TestSlugs(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(email='slugs@test.local', username='slugs', password='pass').profile
+
+    def test_repeated_titles_get_suffixes(self):
+        slugs = [Post.objects.create(author=self.author, title='Same Title', content='c').slug for _ in range(3)]
+
+        self.assertEqual(slugs, ['same-title', 'same-title-2', 'same-title-3'])
+
+    def test_bulk_create_allocates_slugs_in_one_query(self):
+        Post.objects.create(author=self.author, title='bulk', content='c')
+
+        with self.assertNumQueries(2):  # the slugs lookup and the insert
+            posts = Post.objects.bulk_create(Post(author=self.author, title='bulk', content='c') for _ in range(2))
+
+        self.assertEqual([post.slug for post in posts], ['bulk-2', 'bulk-3'])
+
+    def test_only_suffixes_of_the_base_count(self):
+        for title in ('hello world', 'hello world', 'hello there', 'hello'):
+            Post.objects.create(author=self.author, title=title, content='c')
+
+        self.assertEqual(Post.objects.create(author=self.author, title='Hello', content='c').slug, 'hello-2')
+        self.assertEqual(Post.objects.create(author=self.author, title='hello world', content='c').slug,
+                         'hello-world-3')
+
+    def test_title_edit_keeps_own_slug(self):
+        post = Post.objects.create(author=self.author, title='edited', content='c')
+        post.title = 'Edited!'
+        post.save()
+
+        self.assertEqual(post.slug, 'edited')
+
+
+class TestSearch(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='searcher@test.local', username='searcher', password='pass')
+        cls.author = User.objects.create_user(email='writer@test.local', username='writer', password='pass').profile
+        cls.in_title = Post.objects.create(author=cls.author, title='Django tips', content='some notes')
+        cls.in_content = Post.objects.create(author=cls.author, title='notes', content='written with django')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        return self.client.get(reverse('blog:search'), {'q': query, **params}).data
+
+    def test_title_matches_rank_first(self):
+        results = self.search('django')['results']
+
+        self.assertEqual([post['title'] for post in results], ['Django tips', 'notes'])
+
+    def test_tags_are_indexed(self):
+        self.in_content.post_tags.add('python')
+
+        self.assertEqual([post['title'] for post in self.search('python')['results']], ['notes'])
+
+    def test_private_and_blocking_authors_are_hidden(self):
+        self.author.private = True
+        self.author.save()
+        self.assertEqual(self.search('django')['results'], [])
+
+        self.author.private = False
+        self.author.save()
+        Relation.objects.create(actor=self.author, account=self.user.profile, state=Relation.RelationState.BLOCKED)
+        self.assertEqual(self.search('django')['results'], [])
+
+    def test_pages_with_cursor(self):
+        first = self.search('django', page_size=1)
+        second = self.client.get(first['next']).data
+
+        self.assertEqual([first['results'][0]['title'], second['results'][0]['title']], ['Django tips', 'notes'])
+        self.assertIsNone(second['next'])
+
+
+class TestTagStats(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='tagger@test.local', username='tagger', password='pass')
+        cls.first = Post.objects.create(author=cls.user.profile, title='first', content='c')
+        cls.second = Post.objects.create(author=cls.user.profile, title='second', content='c')
+        cls.first.post_tags.add('django', 'python')
+        cls.second.post_tags.add('django')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def counts(self):
+        return dict(TagStats.objects.values_list('tag__name', 'post_count'))
+
+    def test_counts_follow_tag_changes(self):
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1})
+
+        self.first.post_tags.set('python', 'rust')
+        self.assertEqual(self.counts(), {'django': 1, 'python': 1, 'rust': 1})
+
+        self.second.delete()
+        self.first.post_tags.clear()
+        self.assertEqual(self.counts(), {'django': 0, 'python': 0, 'rust': 0})
+
+    def test_tag_list_is_ordered_by_count(self):
+        response = self.client.get(reverse('blog:tag-list'))
+
+        self.assertEqual([(tag['name'], tag['post_count']) for tag in response.data['results']],
+                         [('django', 2), ('python', 1)])
+
+    def test_tag_posts_are_latest_first(self):
+        response = self.client.get(reverse('blog:tag-posts', kwargs={'slug': 'django'}))
+
+        self.assertEqual([post['title'] for post in response.data['results']], ['second', 'first'])
+
+    def test_rebuild_matches_incremental_stats(self):
+        expected = self.counts()
+        call_command('rebuild_tag_stats', stdout=StringIO())
+
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(TagEntry.objects.count(), 3)
+
+
+class TestConditionalGet(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='poller@test.local', username='poller', password='pass')
+        cls.author = User.objects.create_user(email='polled@test.local', username='polled', password='pass').profile
+        cls.post = Post.objects.create(author=cls.author, title='polled', content='c')
+        cls.comment = Comment.objects.create(user=cls.author, post=cls.post, text='comment')
+
+    def setUp(self):
+        cache.clear()  # relation states cached by earlier tests, whose rows were rolled back
+        self.client.force_authenticate(self.user)
+        patchers = (mock.patch('analytics.signals.log_writer'), mock.patch.object(response_cache, 'enabled', False))
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_votes_and_pins_change_the_etag(self):
+        url = reverse('blog:post-detail', kwargs={'slug': self.post.slug})
+        self.assertRevalidates(url, lambda: Vote.toggle(self.post, self.user.profile, 4))
+        self.assertRevalidates(url, self.comment.toggle_pin_Comment)
+
+    def test_changes_keeping_counts_and_sums_change_the_etag(self):
+        url = reverse('blog:post-detail', kwargs={'slug': self.post.slug})
+        Vote.toggle(self.post, self.user.profile, 2)
+        Vote.toggle(self.post, self.author, 4)
+        self.assertRevalidates(url, lambda: (Vote.toggle(self.post, self.user.profile, 3),
+                                             Vote.toggle(self.post, self.author, 3)))
+
+        other = Comment.objects.create(user=self.author, post=self.post, text='other')
+        self.comment.toggle_pin_Comment()
+        self.assertRevalidates(url, lambda: (self.comment.toggle_pin_Comment(), other.toggle_pin_Comment()))
+
+        self.post.post_tags.add('first', 'fourth')
+        self.assertRevalidates(url, lambda: self.post.post_tags.set('second', 'third'))
+
+    def test_not_modified_costs_one_query_and_counts_the_visit(self):
+        url = reverse('blog:post-detail', kwargs={'slug': self.post.slug})
+        etag = self.client.get(url)['ETag']
+
+        with mock.patch('blog.views.PostSerializer.to_representation') as serialize:
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        serialize.assert_not_called()
+        self.assertEqual(VisitCounter.objects.visits_for(self.post), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(sum('"blog_post"' in query['sql'] for query in queries.captured_queries), 1)
+
+    def test_blocked_viewer_gets_no_304(self):
+        url = reverse('blog:post-detail', kwargs={'slug': self.post.slug})
+        etag = self.client.get(url)['ETag']
+        Relation.objects.create(actor=self.author, account=self.user.profile, state=Relation.RelationState.BLOCKED)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+    def test_comment_and_profile_detail(self):
+        self.assertRevalidates(reverse('blog:comment-detail', kwargs={'pk': self.comment.pk}),
+                               self.comment.toggle_pin_Comment)
+        self.assertRevalidates(
+            reverse('accounts:profile-detail', kwargs={'uid': self.author.uid}),
+            lambda: Relation.objects.create(actor=self.user.profile, account=self.author,
+                                            state=Relation.RelationState.FOLLOWED),
+        )
+
+
+class TestResponseCache(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='cached@test.local', username='cached', password='pass')
+        cls.author = User.objects.create_user(email='caching@test.local', username='caching', password='pass').profile
+        cls.post = Post.objects.create(author=cls.author, title='cached', content='c')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch('analytics.signals.log_writer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_url(self):
+        return reverse('blog:post-detail', kwargs={'slug': self.post.slug})
+
+    def test_hits_skip_serialization_and_keep_viewer_fields_live(self):
+        first = self.client.get(self.post_url()).data
+        with mock.patch('blog.views.PostSerializer.to_representation') as serialize:
+            second = self.client.get(self.post_url()).data
+
+        serialize.assert_not_called()
+        self.assertEqual((first['visits'], second['visits']), (1, 2))
+        self.assertEqual(response_cache.metrics()['post'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_signals_invalidate(self):
+        self.client.get(self.post_url())
+        Vote.toggle(self.post, self.user.profile, 5)
+        self.assertEqual(self.client.get(self.post_url()).data['star_count'], 1)
+
+        self.author.change_state()  # private authors are not cached, nor served from the cache
+        self.assertEqual(self.client.get(self.post_url()).status_code, 403)
+
+    def test_blocked_viewer_is_not_served(self):
+        self.client.get(self.post_url())
+        Relation.objects.create(actor=self.author, account=self.user.profile, state=Relation.RelationState.BLOCKED)
+
+        self.assertEqual(self.client.get(self.post_url()).status_code, 403)
+
+    def test_hits_check_permissions_against_the_database(self):
+        # writes of another process: no invalidation reaches this one's cache
+        self.client.get(self.post_url())
+        Profile.objects.filter(pk=self.author.pk).update(private=True)
+        self.assertEqual(self.client.get(self.post_url()).status_code, 403)
+
+        Profile.objects.filter(pk=self.author.pk).update(private=False)
+        self.client.get(self.post_url())
+        Relation.objects.bulk_create([
+            Relation(actor=self.author, account=self.user.profile, state=Relation.RelationState.BLOCKED),
+        ])
+        Relation.objects.invalidate_pairs([(self.author.pk, self.user.profile.pk)])
+        self.assertEqual(self.client.get(self.post_url()).status_code, 403)
+
+    def test_entries_made_stale_elsewhere_are_misses(self):
+        self.client.get(self.post_url())
+        # an edit in another process, whose invalidation doesn't reach this one's cache
+        Post.objects.filter(pk=self.post.pk).update(title='edited elsewhere', date_edited=timezone.now())
+
+        self.assertEqual(self.client.get(self.post_url()).data['title'], 'edited elsewhere')
+        self.assertEqual(response_cache.metrics()['post']['hits'], 0)
+
+    def test_profile_relation_is_per_viewer(self):
+        url = reverse('accounts:profile-detail', kwargs={'uid': self.author.uid})
+        self.assertIsNone(self.client.get(url).data['relation'])
+
+        Relation.objects.create(actor=self.user.profile, account=self.author, state=Relation.RelationState.FOLLOWED)
+        self.assertEqual(self.client.get(url).data['relation'], Relation.RelationState.FOLLOWED)
+        self.assertEqual(response_cache.metrics()['profile']['hits'], 1)
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            self.client.get(self.post_url())
+            self.post.title = 'renamed'
+            self.post.save()
+            self.assertEqual(self.client.get(self.post_url()).data['title'], 'renamed')
+            self.client.get(self.post_url())
+
+            self.assertEqual(response_cache.metrics()['post'], {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333})
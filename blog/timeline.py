@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Relation
+from .models import Post, TimelineEntry
+
+# authors with more followers than this are not fanned out on write, their posts get merged at read time instead
+FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 10000)
+
+# how many of an author's latest posts get copied into a timeline when the author gets followed
+BACKFILL_SIZE = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+
+BATCH_SIZE = getattr(settings, 'TIMELINE_BATCH_SIZE', 1000)
+
+
+def _entry(owner_id, post):
+    return TimelineEntry(owner_id=owner_id, post_id=post.id, author_id=post.author_id, date_created=post.date_created)
+
+
+def _followers_of(author):
+    return Relation.objects.filter(account=author, state=Relation.RelationState.FOLLOWED).values_list('actor',
+                                                                                                        flat=True)
+
+
+def fan_out(post):
+    """
+    pushes a newly created post to the timeline of every follower of its author.
+
+    posts of authors having more than `FANOUT_LIMIT` followers are left un-pushed (`fanned_out=False`) and get pulled
+    into the followers' timelines lazily when they read their feed.
+    """
+    followers = list(_followers_of(post.author_id)[:FANOUT_LIMIT + 1])
+    if len(followers) > FANOUT_LIMIT:
+        return False
+
+    TimelineEntry.objects.bulk_create(
+        (_entry(owner_id, post) for owner_id in followers), batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    Post.objects.filter(pk=post.pk).update(fanned_out=True)
+    post.fanned_out = True
+    return True
+
+
+def add_author(owner, author):
+    """copies the latest posts of `author` into the timeline of `owner`, used when `owner` starts following `author`"""
+    add_authors([(owner.pk, author.pk)])
+
+
+def remove_author(owner, author):
+    TimelineEntry.objects.filter(owner=owner, author=author).delete()
+
+
+def _group(pairs, key, value):
+    groups = defaultdict(list)
+    for pair in pairs:
+        groups[pair[key]].append(pair[value])
+    return groups
+
+
+def add_authors(pairs):
+    """
+    `add_author` for many `(owner id, author id)` pairs at once, e.g. the followers accepted in bulk: the latest
+    posts of every author are read once and copied into all of its new followers' timelines
+    """
+    for author_id, owner_ids in _group(pairs, 1, 0).items():
+        # plain values: `Post.__init__` reads `title`, which `only()` instances would each load with a query
+        posts = list(Post.objects.filter(author=author_id).values_list('id', 'date_created')[:BACKFILL_SIZE])
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(owner_id=owner_id, post_id=post_id, author_id=author_id, date_created=date_created)
+             for owner_id in owner_ids for post_id, date_created in posts),
+            batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+def remove_authors(pairs):
+    """`remove_author` for many `(owner id, author id)` pairs, one DELETE per owner or per author (fewer wins)"""
+    by_owner, by_author = _group(pairs, 0, 1), _group(pairs, 1, 0)
+    if len(by_author) < len(by_owner):
+        for author_id, owner_ids in by_author.items():
+            TimelineEntry.objects.filter(author=author_id, owner__in=owner_ids).delete()
+    else:
+        for owner_id, author_ids in by_owner.items():
+            TimelineEntry.objects.filter(owner=owner_id, author__in=author_ids).delete()
+
+
+def _watermark_key(owner):
+    return f'timeline:merged:{owner.pk}'
+
+
+def merge_pulled_posts(owner):
+    """
+    read-time half of the hybrid timeline: copies the posts that were not fanned out (authors with too many
+    followers) and were published since the last merge into the timeline of `owner`.
+    """
+    now = timezone.now()
+    watermark = cache.get(_watermark_key(owner))
+
+    posts = Post.objects.filter(
+        fanned_out=False, author__in=owner.followings.filter(state=Relation.RelationState.FOLLOWED).values('account')
+    )
+    if watermark is not None:
+        posts = posts.filter(date_created__gt=watermark)
+
+    # plain values, as in `add_authors`
+    posts = list(posts.values_list('id', 'author', 'date_created')[:BACKFILL_SIZE])
+    if not posts:  # nothing pulled, the read doesn't write
+        return
+
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(owner_id=owner.pk, post_id=post_id, author_id=author_id, date_created=date_created)
+         for post_id, author_id, date_created in posts),
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    cache.set(_watermark_key(owner), now, timeout=None)
+
+
+def get_timeline(owner):
+    """posts of the timeline of `owner`, newest first. reads a single range of the (owner, date_created) index"""
+    merge_pulled_posts(owner)
+
+    return Post.objects.filter(timeline_entries__owner=owner).annotate(
+        timeline_date=F('timeline_entries__date_created')
+    ).order_by('-timeline_date', 'id')
+
+
+def rebuild(owner):
+    """rebuilds the timeline of `owner` from scratch based on its current followings"""
+    TimelineEntry.objects.filter(owner=owner).delete()
+    cache.delete(_watermark_key(owner))
+    for author in owner.profile_followings():
+        add_author(owner, author)
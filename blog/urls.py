@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework import routers
 
 from .views import PostViewSet, FeedAPIView, CommentList, CommentDetailDestroy, CompleteCommentList, VoteViewSet, \
-    ReplyList, PinCommentAPIView
+    ReplyList, PinCommentAPIView, CommentTree, SearchAPIView, TagList, TagPostList, \
+    ResponseCacheStats
 
 app_name = 'blog'
 
@@ -17,10 +18,16 @@ urlpatterns = [
          name='vote-detail'),
 
     path('posts/<slug:slug>/comments/', CommentList.as_view(), name='comment-list'),
+    path('posts/<slug:slug>/comments/tree/', CommentTree.as_view(), name='comment-tree'),
     path('comments/', CompleteCommentList.as_view(), name='comments-full-list'),
     path('comments/<int:pk>/', CommentDetailDestroy.as_view(), name='comment-detail'),
     path('comments/<int:pk>/togglepin/', PinCommentAPIView.as_view(), name='comment-toggle_pin'),
     path('comments/<int:pk>/replies/', ReplyList.as_view(), name='comment-replies'),
+    path('comments/<int:pk>/tree/', CommentTree.as_view(), name='comment-subtree'),
 
     path('feed/', FeedAPIView.as_view(), name='feed'),
+    path('search/', SearchAPIView.as_view(), name='search'),
+    path('tags/', TagList.as_view(), name='tag-list'),
+    path('tags/<str:slug>/posts/', TagPostList.as_view(), name='tag-posts'),
+    path('cache-stats/', ResponseCacheStats.as_view(), name='cache-stats'),
 ]
@@ -1,16 +1,70 @@
+import re
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.db.models import BigIntegerField, Case, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr
 from django.urls import resolve
 from django.utils.text import slugify
 
+SLUG_MAX_LENGTH = 100
+# room left at the end of the slugs for the '-<n>' suffixes of the repeated ones
+SLUG_BASE_LENGTH = SLUG_MAX_LENGTH - 10
 
-def get_slug(obj, *args):
-    items = ''.join(
-        map(lambda item: str(item) + ' ', args)
-    )
-    slug = slugify(items)[:100]
-    return obj.__class__.objects.filter(slug=slug).exists(), slug
 
+def slug_base(title):
+    return slugify(str(title))[:SLUG_BASE_LENGTH].strip('-') or uuid.uuid4().hex[:12]
 
-def is_url(request, *, url_name):
-    actual_url_name = resolve(request.path_info).url_name
 
-    return bool(actual_url_name == url_name)
+def allocate_slugs(model, instances, source='title'):
+    """
+    gives the instances the first free '<base>' or '<base>-<n>' slug, based on their `source` field.
+
+    the highest taken suffix of every base is computed by the database, in a single query over the slug index which
+    only matches '<base>' and '<base>-<digits>'. repeated bases within `instances` get consecutive suffixes, so it
+    also serves `bulk_create` which skips the `pre_save` signal.
+    """
+    bases = [(instance, slug_base(getattr(instance, source))) for instance in instances]
+    if not bases:
+        return
+
+    # '<base>' counts as suffix 1, so that the next one is 2
+    patterns = {base: rf'^{re.escape(base)}-[0-9]{{1,18}}$' for _, base in bases}
+    matches = {base: Q(slug=base) | Q(slug__startswith=f'{base}-', slug__regex=pattern)
+               for base, pattern in patterns.items()}
+    suffixes = {
+        f'base_{i}': Max(Case(
+            When(slug=base, then=Value(1)),
+            When(slug__regex=pattern, then=Cast(Substr('slug', len(base) + 2), BigIntegerField())),
+            output_field=BigIntegerField(),
+        ))
+        for i, (base, pattern) in enumerate(patterns.items())
+    }
+    taken = model.objects.filter(reduce(or_, matches.values())).exclude(
+        pk__in=[instance.pk for instance in instances if instance.pk is not None]
+    ).aggregate(**suffixes)
+
+    # the next suffix of every base, 0 meaning the bare base is still free
+    next_suffix = {base: (taken[f'base_{i}'] or -1) + 1 for i, base in enumerate(patterns)}
+
+    for instance, base in bases:
+        suffix = next_suffix[base]
+        instance.slug = f'{base}-{suffix}' if suffix else base
+        next_suffix[base] = max(suffix, 1) + 1
+
+
+def get_url_name(request):
+    """
+    name of the route of the request. django resolves it once while handling the request (`request.resolver_match`),
+    requests which did not go through the url resolver get resolved here and the match is kept on the request.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        match = request.resolver_match = resolve(request.path_info)
+
+    return match.url_name
+
+
+def is_url(request, *, url_name):
+    return bool(get_url_name(request) == url_name)
@@ -1,56 +1,154 @@
+from django.db.models import Count, Max, OuterRef, Subquery
 from rest_framework.generics import (
     RetrieveDestroyAPIView, ListCreateAPIView, CreateAPIView, ListAPIView, get_object_or_404
 )
 
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
+from taggit.models import Tag
 
 from accounts.models import Profile
+from analytics.models import VisitCounter
+from images.models import ImageSource
 from .serializers import (
-    PostSerializer, VoteSerializer, CommentListSerializer, CommentRetrieveSerializer  # , ReplyRetrieveSerializer
+    PostSerializer, VoteSerializer, CommentListSerializer, CommentRetrieveSerializer, CommentTreeSerializer,
+    TagStatsSerializer
+    # , ReplyRetrieveSerializer
 )
 from .permissions import (
-    IsVoter, IsPublicOrFollowing, IsNotBlocked, IsPostAuthor, IsCommentAuthorDeletionOrIsAdmin,
+    get_posts_author, IsVoter, IsPublicOrFollowing, IsNotBlocked, IsPostAuthor, IsCommentAuthorDeletionOrIsAdmin,
     CommentIsPostAuthor
 )
-from .models import Post, Vote, Comment
-from .utils import is_url
-from analytics.mixins import ObjectHitMixin
+from .models import Post, Vote, Comment, TagEntry, TagStats
+from .pagination import KeysetPagination
+from .plans import PlannedQuerysetMixin
+from .conditional import ConditionalRetrieveMixin
+from .response_cache import CachedRetrieveMixin, response_cache
+from .utils import is_url, get_url_name
+from . import timeline, search, tags
+from analytics.mixins import ObjectHitMixin, ObjectStatsMixin
 
 
-class PostViewSet(ObjectHitMixin, ModelViewSet):
+def _per_post(queryset, aggregate):
+    """`aggregate` over the rows of `queryset` belonging to the outer post, as a subquery"""
+    return Subquery(queryset.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        value=aggregate).values('value'))
+
+
+class PostViewSet(CachedRetrieveMixin, ConditionalRetrieveMixin, ObjectHitMixin, ObjectStatsMixin, PlannedQuerysetMixin,
+                  ModelViewSet):
     serializer_class = PostSerializer
+    pagination_class = KeysetPagination
     lookup_field = 'slug'
     permission_classes = (IsAuthenticated, IsNotBlocked, IsPublicOrFollowing, IsPostAuthor,)
+    cache_kind = 'post'
 
     def get_queryset(self):
-        user_profile = self.request.user.profile
+        url_name = get_url_name(self.request)
 
-        if not is_url(self.request, url_name='profile-posts') and not is_url(self.request, url_name='post-detail'):
-            return user_profile.posts.all()
+        if url_name == 'profile-posts':
+            return get_posts_author(self).posts.all()
 
-        if is_url(self.request, url_name='profile-posts'):
-            return get_object_or_404(Profile, uid=self.kwargs.get('uid')).posts.all()
+        if url_name == 'post-detail':
+            return Post.objects.all()
 
-        return Post.objects.all()
+        return self.request.user.profile.posts.all()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user.profile)
 
+    def get_version(self):
+        """
+        what the representation depends on but the visit count, which would change the version on every view. the
+        tag set is fingerprinted by the number and the newest id of its entries (ids only grow, so any change moves
+        one of them), the pinned comments by their number and the last time a comment of the post got (un)pinned
+        """
+        comments, tags = Comment.objects.all(), TagEntry.objects.all()
+        return Post.objects.visible_to(self.request.user.profile).filter(slug=self.kwargs['slug']).values(
+            'pk', 'author', 'author__user', 'author__user__username', 'author__private', 'date_edited', 'star_sum',
+            'star_count', 'star_1', 'star_2', 'star_3', 'star_4', 'star_5', 'image_source__status',
+        ).annotate(
+            pinned_count=_per_post(comments.filter(pinned=True), Count('id')),
+            pin_changed=_per_post(comments, Max('pin_changed')),
+            tags_count=_per_post(tags, Count('id')), tags_last=_per_post(tags, Max('id')),
+        ).first()
+
+    def get_version_instance(self, version):
+        return Post(pk=version['pk'], author=Profile(pk=version['author'], user_id=version['author__user']))
+
+    def get_cache_objects(self, version):
+        return [('post', version['pk']), ('profile', version['author'])]
+
+    def is_cacheable(self, version):
+        # posts of private authors are not shared, nor the ones whose renditions are not ready yet
+        return not version['author__private'] and version['image_source__status'] in (None, ImageSource.Status.DONE)
+
+    def get_viewer_data(self, version):
+        return {'visits': VisitCounter.objects.visits_for(Post(pk=version['pk']))}
+
+
+class FeedAPIView(PlannedQuerysetMixin, ListAPIView):
+    serializer_class = PostSerializer
+    pagination_class = KeysetPagination
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return timeline.get_timeline(self.request.user.profile)
+
+
+class SearchAPIView(PlannedQuerysetMixin, ListAPIView):
+    """ranked full text search over the titles, contents and tags of the posts the user may see. `?q=terms`"""
+    serializer_class = PostSerializer
+    pagination_class = KeysetPagination
+    permission_classes = (IsAuthenticated,)
+    cursor_ordering = ('-rank', 'id')
+
+    def get_queryset(self):
+        visible = Post.objects.visible_to(self.request.user.profile)
+        return search.search(self.request.query_params.get('q', ''), visible).order_by(*self.cursor_ordering)
+
+
+class TagList(PlannedQuerysetMixin, ListAPIView):
+    """the tags in use with their number of posts, most used first or, with `?ordering=recent`, latest used first"""
+    serializer_class = TagStatsSerializer
+    pagination_class = KeysetPagination
+    permission_classes = (IsAuthenticated,)
+
+    @property
+    def cursor_ordering(self):
+        if self.request.query_params.get('ordering') == 'recent':
+            return ('-last_posted', 'id')
+        return ('-post_count', 'id')
+
+    def get_queryset(self):
+        return TagStats.objects.filter(post_count__gt=0)
+
+
+class ResponseCacheStats(APIView):
+    """hits and misses of the detail response cache, see `blog.response_cache`"""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(response_cache.metrics())
+
 
-class FeedAPIView(ListAPIView):
+class TagPostList(PlannedQuerysetMixin, ListAPIView):
+    """the latest posts tagged with a tag, which the user may see"""
     serializer_class = PostSerializer
+    pagination_class = KeysetPagination
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        user_followings = self.request.user.profile.profile_followings()
-        return Post.objects.filter(author__in=user_followings)
+        tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
+        return tags.tagged_posts(tag, Post.objects.visible_to(self.request.user.profile))
 
 
 class CommentList(ListCreateAPIView):
     serializer_class = CommentListSerializer
+    pagination_class = KeysetPagination
     lookup_url_kwarg = 'slug'
 
     def get_queryset(self):
@@ -70,7 +168,7 @@ class CompleteCommentList(ListAPIView):  # list of all Comments for administrati
     permission_classes = IsAdminUser,
 
 
-class CommentDetailDestroy(ObjectHitMixin, RetrieveDestroyAPIView, CreateAPIView):
+class CommentDetailDestroy(ConditionalRetrieveMixin, ObjectHitMixin, RetrieveDestroyAPIView, CreateAPIView):
     queryset = Comment.objects.all()
     serializer_class = CommentRetrieveSerializer
     lookup_field = "pk"
@@ -82,8 +180,20 @@ class CommentDetailDestroy(ObjectHitMixin, RetrieveDestroyAPIView, CreateAPIView
 
         return super(CommentDetailDestroy, self).get_permissions()
 
+    def get_version(self):
+        return Comment.objects.filter(pk=self.kwargs['pk']).values(
+            'pk', 'user__user__username', 'post__slug', 'text', 'created', 'parent', 'pinned', 'reply_count',
+        ).first()
+
+    def get_version_instance(self, version):
+        return Comment(pk=version['pk'])
+
     def perform_create(self, serializer):
         comment = self.get_object()
+        if comment.depth >= Comment.MAX_DEPTH:
+            # the path of the reply would not fit, see `Comment.path`
+            raise ValidationError({'detail': f'threads can not go deeper than {Comment.MAX_DEPTH} replies'})
+
         other_fields = {
             'user': self.request.user.profile,
             'post': comment.post,
@@ -100,6 +210,46 @@ class ReplyList(ListAPIView):
         return get_object_or_404(Comment, pk=self.kwargs.get(self.lookup_url_kwarg)).replies.all()
 
 
+class CommentTree(ListAPIView):
+    """
+    the whole comment tree of a post, or the subtree of a comment, loaded with a single query over the materialized
+    paths. `?depth=n` limits it to n levels (below the comment for subtrees).
+    """
+    serializer_class = CommentTreeSerializer
+    pagination_class = None
+
+    def get_depth(self):
+        try:
+            return max(int(self.request.query_params['depth']), 0)
+        except (KeyError, ValueError):
+            return None
+
+    def get_queryset(self):
+        depth = self.get_depth()
+
+        if 'pk' in self.kwargs:
+            comments = get_object_or_404(Comment, pk=self.kwargs['pk']).thread(depth)
+        else:
+            comments = Comment.objects.filter(post__slug=self.kwargs.get('slug')).order_by('path')
+            if depth is not None:
+                comments = comments.filter(depth__lte=depth)
+
+        return comments.select_related('user__user')
+
+    def list(self, request, *args, **kwargs):
+        nodes, roots = {}, []
+        for comment in self.get_queryset():  # depth first, so parents always come before their replies
+            comment.tree_replies = []
+            nodes[comment.pk] = comment
+            if comment.parent_id in nodes:
+                nodes[comment.parent_id].tree_replies.append(comment)
+            else:
+                roots.append(comment)
+
+        serializer = self.get_serializer(roots, many=True)
+        return Response(serializer.data)
+
+
 class PinCommentAPIView(APIView):
     permission_classes = (CommentIsPostAuthor,)
     lookup_url_kwarg = 'pk'
@@ -113,6 +263,7 @@ class PinCommentAPIView(APIView):
 
 class VoteViewSet(ObjectHitMixin, ModelViewSet):
     serializer_class = VoteSerializer
+    pagination_class = KeysetPagination
     lookup_field = "pk"
     lookup_url_kwarg = "pk"
     permission_classes = (IsVoter,)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'blog.apps.BlogConfig',
     'accounts.apps.AccountsConfig',
     'analytics.apps.AnalyticsConfig',
+    'images.apps.ImagesConfig',
     # third-party apps
     'taggit',
     'taggit_serializer',
@@ -139,10 +140,13 @@ STATICFILES_DIRS = [
 ]
 
 # **********
-# MEDIA_URL = '/assets/images/'
+# both are required: the media route of `config.urls` serves MEDIA_ROOT under MEDIA_URL. the uploads used to be
+# stored at the root of the project, existing deployments move their `profile_pictures/` and `post_images/`
+# directories into MEDIA_ROOT (the names stored in the database are relative to it and stay the same)
+MEDIA_URL = '/assets/images/'
 
 # STATIC_ROOT = BASE_DIR / 'static'
-# MEDIA_ROOT = BASE_DIR / 'assets/images'
+MEDIA_ROOT = BASE_DIR / 'assets/images'
 
 
 AUTHENTICATION_BACKENDS = [
@@ -168,3 +172,66 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
+
+# analytics: object logs are saved within the request. 'analytics.writers.BufferedWriter' queues them and saves them
+# in batches from a background thread instead (with the options below), see `analytics.writers`
+LOGGER_WRITER = 'analytics.writers.DirectWriter'
+LOGGER_WRITER_OPTIONS = {
+    'max_size': 10000,
+    'batch_size': 500,
+    'flush_interval': 1.0,
+    'overflow': 'drop',
+}
+
+# per process cache of the follow graph behind the follow and block checks of `Relation.objects`, see `accounts.graph`
+SOCIAL_GRAPH_CACHE = False
+SOCIAL_GRAPH_CACHE_MAX_ENTRIES = 10000
+SOCIAL_GRAPH_CACHE_TTL = 60
+
+# renditions of the uploaded images, see `images.pipeline`. they are rendered within the request that saves the
+# image; for a pool of background processes instead set IMAGE_PIPELINE to 'images.pipeline.BackgroundPipeline'
+# with e.g. IMAGE_PIPELINE_OPTIONS = {'max_workers': 2, 'max_size': 1000}, and run `render_images` periodically
+# for the sources it leaves pending
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'feed': (720, 720),
+    'full': (1600, 1600),
+}
+IMAGE_RENDITION_FORMAT = 'WEBP'
+IMAGE_PIPELINE = 'images.pipeline.SyncPipeline'
+IMAGE_PIPELINE_OPTIONS = {}
+
+# media files are served by `images.views.serve`; set MEDIA_SENDFILE to 'x-accel-redirect' (nginx, with an internal
+# location at MEDIA_SENDFILE_PREFIX aliasing MEDIA_ROOT) or 'x-sendfile' to let the web server send the bytes
+MEDIA_SENDFILE = None
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# shared part of the post and profile detail responses, see `blog.response_cache`. works with any cache backend
+RESPONSE_CACHE = True
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# rows read per round trip by the NDJSON exports of the follower/following/request/block lists (`?stream=true`)
+RELATION_STREAM_CHUNK_SIZE = 2000
+
+# set based relation changes (accepting the pending requests of a profile going public), see `accounts.jobs`.
+# jobs over more than RELATION_JOB_INLINE_LIMIT relations run in the background; `run_relation_jobs` is meant to
+# run periodically, it runs the jobs left pending and the ones without progress for RELATION_JOB_STALE_AFTER seconds
+RELATION_JOB_RUNNER = 'accounts.jobs.ThreadRunner'
+RELATION_JOB_RUNNER_OPTIONS = {}
+RELATION_JOB_BATCH_SIZE = 1000
+RELATION_JOB_INLINE_LIMIT = 1000
+RELATION_JOB_STALE_AFTER = 300
+
+# most uids a single bulk follow/unfollow/block/unblock request may name, see `accounts.bulk`
+RELATION_BULK_MAX_TARGETS = 200
+
+# object logs older than LOG_RETENTION_DAYS are moved to compressed monthly files in LOG_ARCHIVE_DIR by the
+# `archive_object_logs` command, see `analytics.archive`
+LOG_RETENTION_DAYS = 90
+LOG_ARCHIVE_DIR = BASE_DIR / 'log_archive'
+
+# HyperLogLog sketches of the distinct visitors of every object, per day and over all time, built from the object
+# logs by the periodic `sketch_visitors` command, see `analytics.sketches`
+VISITOR_SKETCH_PRECISION = 12
@@ -14,14 +14,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+import re
+
 from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from django.core.exceptions import ImproperlyConfigured
 
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from images.views import serve as serve_media
+
 api_paths = [
     path('blog/', include('blog.urls')),
     path('accounts/', include('accounts.urls')),
@@ -33,7 +38,14 @@ urlpatterns = [
 ]
 
 staticfiles = static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-media = static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+# an empty MEDIA_URL or '/' would route every path to the media view, an empty MEDIA_ROOT serve the working directory
+if not settings.MEDIA_ROOT or not settings.MEDIA_URL.strip('/'):
+    raise ImproperlyConfigured("MEDIA_ROOT and MEDIA_URL (other than '/') must be set to serve the media files")
+
+media = [
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve_media, name='media'),
+]
 
 schema_view = get_schema_view(
     openapi.Info(
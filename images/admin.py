@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import ImageSource, Rendition
+
+
+class RenditionInline(admin.TabularInline):
+    model = Rendition
+    extra = 0
+    readonly_fields = ('name', 'file', 'width', 'height', 'size',)
+
+
+@admin.register(ImageSource)
+class ImageSourceAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'status', 'width', 'height', 'created', 'rendered', 'render_time',)
+    list_filter = ('status',)
+    inlines = (RenditionInline,)
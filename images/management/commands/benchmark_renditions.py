@@ -0,0 +1,59 @@
+import io
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+
+from images.pipeline import RENDITIONS
+from images.processing import render
+
+
+class Command(BaseCommand):
+    help = 'measures the rendition throughput on synthetic photos, in the calling process and in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=40)
+        parser.add_argument('--size', type=int, nargs=2, default=(3000, 2000), metavar=('WIDTH', 'HEIGHT'))
+        parser.add_argument('--workers', type=int, nargs='+', default=(1, 2, 4))
+        parser.add_argument('--format', dest='image_format', default='WEBP')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, images, size, workers, image_format, seed, **options):
+        generator = random.Random(seed)
+        originals = [self.photo(size, generator) for _ in range(images)]
+        megabytes = sum(len(data) for data in originals) / 2 ** 20
+        self.stdout.write(f'{images} jpeg originals of {size[0]}x{size[1]}, {megabytes:.1f} MB')
+
+        start = time.perf_counter()
+        results = [render(data, RENDITIONS, image_format) for data in originals]
+        self.report('in process', images, megabytes, time.perf_counter() - start)
+
+        output = sum(len(data) for *_, renditions, _ in results for data, _, _ in renditions.values()) / 2 ** 20
+        self.stdout.write(f'renditions: {output:.1f} MB for {len(RENDITIONS)} sizes ({image_format})')
+
+        for count in workers:
+            with ProcessPoolExecutor(count, mp_context=multiprocessing.get_context('spawn')) as pool:
+                list(pool.map(render, originals[:count], [RENDITIONS] * count, [image_format] * count))  # warm up
+                start = time.perf_counter()
+                list(pool.map(render, originals, [RENDITIONS] * images, [image_format] * images))
+                self.report(f'{count} worker(s)', images, megabytes, time.perf_counter() - start)
+
+    def report(self, label, images, megabytes, elapsed):
+        self.stdout.write(f'{label:<12} {images / elapsed:8.2f} images/s {megabytes / elapsed:8.2f} MB/s')
+
+    @staticmethod
+    def photo(size, generator):
+        """a noisy picture with shapes, which compresses about like a photo (unlike a flat color)"""
+        image = Image.effect_noise(size, generator.randint(20, 80)).convert('RGB')
+        draw = ImageDraw.Draw(image)
+        for _ in range(30):
+            x, y = generator.randrange(size[0]), generator.randrange(size[1])
+            color = tuple(generator.randrange(256) for _ in range(3))
+            draw.ellipse((x, y, x + generator.randrange(50, 800), y + generator.randrange(50, 800)), fill=color)
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        return output.getvalue()
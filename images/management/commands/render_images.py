@@ -0,0 +1,73 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from blog.models import Post
+from images.models import ImageSource
+from images.pipeline import BackgroundPipeline, file_digest
+
+# models, file field and source field of the images that get renditions
+TARGETS = ((Post, 'image', 'image_source'), (Profile, 'picture', 'picture_source'))
+
+
+class Command(BaseCommand):
+    help = 'links stored images which have no image source yet (e.g. uploaded before the pipeline) and renders ' \
+           'the pending sources in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--retry-failed', action='store_true', help='renders the failed sources again')
+
+    def handle(self, *args, workers, chunk_size, retry_failed, **options):
+        for model, field, source_field in TARGETS:
+            linked, missing = self.link(model, field, source_field, chunk_size)
+            self.stdout.write(f'{model.__name__}: {linked} image(s) linked, {missing} missing file(s)')
+
+        if retry_failed:
+            ImageSource.objects.filter(status=ImageSource.Status.FAILED).update(status=ImageSource.Status.PENDING)
+
+        pending = ImageSource.objects.filter(status=ImageSource.Status.PENDING).exclude(original='')
+        pipeline = BackgroundPipeline(max_workers=workers)
+        last_pk = 0
+        try:
+            while True:
+                ids = list(pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                last_pk = ids[-1]
+                pipeline.render_all(ids)
+                self.stdout.write(f'{pipeline.stats()}')
+        finally:
+            pipeline.stop()
+
+        self.stdout.write(self.style.SUCCESS(f'done: {pipeline.stats()}'))
+
+    def link(self, model, field, source_field, chunk_size):
+        objects = model.objects.filter(**{f'{source_field}__isnull': True}).exclude(**{field: ''}).exclude(
+            **{f'{field}__isnull': True}
+        ).order_by('pk').only('pk', field)
+
+        linked = missing = last_pk = 0
+        while True:
+            chunk = list(objects.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            for instance in chunk:
+                file = getattr(instance, field)
+                try:
+                    with file.open('rb'):
+                        digest = file_digest(file)
+                except OSError:
+                    missing += 1
+                    continue
+
+                source, _ = ImageSource.objects.get_or_create(digest=digest)
+                ImageSource.objects.filter(pk=source.pk, original='').update(original=file.name)
+                model.objects.filter(pk=instance.pk).update(**{source_field: source})
+                linked += 1
+
+        return linked, missing
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='sha256 digest')),
+                ('original', models.CharField(blank=True, default='', max_length=255, verbose_name='original file')),
+                ('status', models.CharField(choices=[('pending', 'PENDING'), ('done', 'DONE'), ('failed', 'FAILED')], default='pending', max_length=7, verbose_name='status')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='width')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='height')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='date created')),
+                ('rendered', models.DateTimeField(blank=True, null=True, verbose_name='date rendered')),
+                ('render_time', models.FloatField(blank=True, null=True, verbose_name='seconds spent rendering')),
+            ],
+            options={
+                'verbose_name': 'Image Source',
+                'verbose_name_plural': 'Image Sources',
+            },
+        ),
+        migrations.CreateModel(
+            name='Rendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, verbose_name='name')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='file')),
+                ('width', models.PositiveIntegerField(verbose_name='width')),
+                ('height', models.PositiveIntegerField(verbose_name='height')),
+                ('size', models.PositiveIntegerField(verbose_name='size in bytes')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='images.imagesource', verbose_name='source')),
+            ],
+            options={
+                'verbose_name': 'Rendition',
+                'verbose_name_plural': 'Renditions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='imagesource',
+            index=models.Index(fields=['status', 'id'], name='imagesource_status_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rendition',
+            unique_together={('source', 'name')},
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ImageSource(models.Model):
+    """an uploaded image, identified by the sha256 of its content so that every distinct image is rendered once"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'PENDING'
+        DONE = 'done', 'DONE'
+        FAILED = 'failed', 'FAILED'
+
+    digest = models.CharField(max_length=64, unique=True, verbose_name=_('sha256 digest'))
+    original = models.CharField(max_length=255, blank=True, default='', verbose_name=_('original file'))
+    status = models.CharField(max_length=7, choices=Status.choices, default=Status.PENDING, verbose_name=_('status'))
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('width'))
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('height'))
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_('date created'))
+    rendered = models.DateTimeField(null=True, blank=True, verbose_name=_('date rendered'))
+    render_time = models.FloatField(null=True, blank=True, verbose_name=_('seconds spent rendering'))
+
+    def __str__(self):
+        return f'{self.digest[:12]} | {self.status}'
+
+    class Meta:
+        verbose_name = _('Image Source')
+        verbose_name_plural = _('Image Sources')
+        indexes = (
+            models.Index(fields=('status', 'id'), name='imagesource_status_idx'),
+        )
+
+
+class Rendition(models.Model):
+    source = models.ForeignKey(ImageSource, on_delete=models.CASCADE, related_name='renditions',
+                               verbose_name=_('source'))
+    name = models.CharField(max_length=32, verbose_name=_('name'))
+    file = models.FileField(max_length=255, verbose_name=_('file'))
+    width = models.PositiveIntegerField(verbose_name=_('width'))
+    height = models.PositiveIntegerField(verbose_name=_('height'))
+    size = models.PositiveIntegerField(verbose_name=_('size in bytes'))
+
+    def __str__(self):
+        return f'{self.source} --> {self.name}'
+
+    class Meta:
+        verbose_name = _('Rendition')
+        verbose_name_plural = _('Renditions')
+        unique_together = (('source', 'name'),)
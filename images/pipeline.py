@@ -0,0 +1,279 @@
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImageSource, Rendition
+from .processing import render, EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# name -> (max width, max height) of the renditions generated for every uploaded image
+RENDITIONS = getattr(settings, 'IMAGE_RENDITIONS', {
+    'thumbnail': (160, 160),
+    'feed': (720, 720),
+    'full': (1600, 1600),
+})
+RENDITION_FORMAT = getattr(settings, 'IMAGE_RENDITION_FORMAT', 'WEBP')
+
+# how the renditions get rendered, see `SyncPipeline` and `BackgroundPipeline`
+IMAGE_PIPELINE = getattr(settings, 'IMAGE_PIPELINE', 'images.pipeline.SyncPipeline')
+IMAGE_PIPELINE_OPTIONS = getattr(settings, 'IMAGE_PIPELINE_OPTIONS', {})
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def link(instance, field, source_field):
+    """
+    `pre_save` half: points `source_field` of `instance` at the `ImageSource` of a newly uploaded `field` file.
+    files with an already known content share its source (and renditions), only unseen contents get rendered.
+    """
+    file = getattr(instance, field)
+    if not file:
+        setattr(instance, source_field, None)
+        return
+    if file._committed:  # not a new upload
+        return
+
+    source, _ = ImageSource.objects.get_or_create(digest=file_digest(file))
+    setattr(instance, source_field, source)
+    if not source.original:
+        instance.unrendered_sources = getattr(instance, 'unrendered_sources', []) + [(field, source.pk)]
+
+
+def queue_renditions(instance):
+    """
+    `post_save` half: claims the sources linked by `link` which nobody claimed yet, recording the stored file they
+    get rendered from, and hands them to the pipeline once the transaction commits.
+    """
+    for field, source_id in getattr(instance, 'unrendered_sources', ()):
+        name = getattr(instance, field).name
+        if ImageSource.objects.filter(pk=source_id, original='').update(original=name):
+            transaction.on_commit(lambda source_id=source_id: image_pipeline.submit(source_id))
+
+    instance.unrendered_sources = []
+
+
+class SyncPipeline:
+    """renders within the calling process, right away. meant for development and tests"""
+
+    def __init__(self, sizes=None, image_format=None):
+        self.sizes = sizes or RENDITIONS
+        self.image_format = image_format or RENDITION_FORMAT
+        self.storage = Rendition._meta.get_field('file').storage
+
+        self.rendered = self.failed = self.bytes_in = self.bytes_out = 0
+        self.render_time = 0.0
+        self._stats_lock = threading.Lock()
+
+    def submit(self, source_id):
+        source, data = self.read(source_id)
+        if source is None:
+            return
+
+        try:
+            result = render(data, self.sizes, self.image_format)
+        except Exception as error:
+            self.fail(source, error)
+        else:
+            self.store(source, len(data), result)
+
+    def read(self, source_id):
+        """the pending source and the bytes of its original, `(None, None)` if there is nothing to render"""
+        source = ImageSource.objects.filter(pk=source_id, status=ImageSource.Status.PENDING).first()
+        if source is None or not source.original:
+            return None, None
+
+        try:
+            with self.storage.open(source.original, 'rb') as original:
+                return source, original.read()
+        except OSError as error:
+            self.fail(source, error)
+            return None, None
+
+    def store(self, source, size, result):
+        width, height, renditions, elapsed = result
+        extension = EXTENSIONS.get(self.image_format, self.image_format.lower())
+
+        stored = []
+        for name, (data, rendition_width, rendition_height) in renditions.items():
+            path = self.storage.save(f'renditions/{source.digest[:2]}/{source.digest}-{name}.{extension}',
+                                     ContentFile(data))
+            stored.append(Rendition(source=source, name=name, file=path, width=rendition_width,
+                                    height=rendition_height, size=len(data)))
+
+        with transaction.atomic():
+            Rendition.objects.filter(source=source).delete()
+            Rendition.objects.bulk_create(stored)
+            ImageSource.objects.filter(pk=source.pk).update(
+                status=ImageSource.Status.DONE, width=width, height=height, rendered=timezone.now(),
+                render_time=elapsed,
+            )
+
+        with self._stats_lock:
+            self.rendered += 1
+            self.bytes_in += size
+            self.bytes_out += sum(rendition.size for rendition in stored)
+            self.render_time += elapsed
+
+    def render_all(self, source_ids):
+        """renders the sources from the calling thread, e.g. from a management command"""
+        for source_id in source_ids:
+            self.submit(source_id)
+
+    def fail(self, source, error):
+        logger.warning('could not render image %s: %s', source.digest, error)
+        ImageSource.objects.filter(pk=source.pk).update(status=ImageSource.Status.FAILED)
+        with self._stats_lock:
+            self.failed += 1
+
+    def stats(self):
+        """throughput so far. `images_per_second` is per second of rendering, summed over the workers"""
+        with self._stats_lock:
+            return {
+                'rendered': self.rendered,
+                'failed': self.failed,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'render_seconds': round(self.render_time, 3),
+                'images_per_second': round(self.rendered / self.render_time, 2) if self.render_time else 0,
+            }
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class BackgroundPipeline(SyncPipeline):
+    """
+    queues the sources and renders them in a pool of `max_workers` processes, so that uploads don't wait for the
+    resizing. a background thread reads the originals, hands up to `max_workers * 2` of them to the pool at a time
+    and stores the renditions as they come back.
+
+    sources which don't fit in the queue (`max_size`), or are still queued when the process exits, stay pending
+    and get rendered by the `render_images` command. throughput is logged every `report_every` images.
+    """
+
+    def __init__(self, sizes=None, image_format=None, max_workers=2, max_size=1000, report_every=100):
+        super(BackgroundPipeline, self).__init__(sizes, image_format)
+        self.max_workers = max_workers
+        self.queue = queue.Queue(maxsize=max_size)
+        self.report_every = report_every
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+        atexit.register(self.stop)
+
+    def submit(self, source_id):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(source_id)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='image-pipeline', daemon=True)
+                self._thread.start()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawned workers only import `images.processing`, nothing of the forked django state
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _next_batch(self, timeout=1.0):
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.max_workers * 2:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _render(self, batch):
+        pool = self._get_pool()
+        futures = {}
+        for source_id in batch:
+            source, data = self.read(source_id)
+            if source is not None:
+                futures[pool.submit(render, data, self.sizes, self.image_format)] = (source, len(data))
+
+        for future in as_completed(futures):
+            source, size = futures[future]
+            try:
+                self.store(source, size, future.result())
+            except Exception as error:
+                self.fail(source, error)
+
+            if self.rendered and self.rendered % self.report_every == 0:
+                logger.info('image pipeline: %s', self.stats())
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._next_batch()
+                if batch:
+                    self._render(batch)
+        finally:
+            connection.close()
+
+    def render_all(self, source_ids):
+        source_ids = list(source_ids)
+        size = self.max_workers * 2
+        for start in range(0, len(source_ids), size):
+            self._render(source_ids[start:start + size])
+
+    def flush(self):
+        """renders everything queued so far, from the calling thread"""
+        while True:
+            batch = self._next_batch(timeout=0)
+            if not batch:
+                break
+            self._render(batch)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+image_pipeline = import_string(IMAGE_PIPELINE)(**IMAGE_PIPELINE_OPTIONS)
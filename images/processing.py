@@ -0,0 +1,53 @@
+"""
+the image work itself. kept free of django imports so that it can run in the worker processes of the pipeline,
+which only get the bytes of the original and return the bytes of the renditions.
+"""
+import io
+import time
+
+from PIL import Image, ImageOps
+
+# formats and the options they are saved with. saving without `exif`/`icc_profile` drops the metadata
+SAVE_OPTIONS = {
+    'WEBP': {'quality': 80, 'method': 4},
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+}
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def _prepare(image, image_format):
+    image = ImageOps.exif_transpose(image)  # applies the orientation before the exif data is dropped
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+    if image_format == 'JPEG' or not has_alpha:
+        if has_alpha:
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+    return image.convert('RGBA')
+
+
+def render(data, sizes, image_format='WEBP'):
+    """
+    renders `sizes` (`{name: (max width, max height)}`) of the image in `data`, keeping its aspect ratio and never
+    upscaling it. returns the width and height of the original, the renditions as
+    `{name: (bytes, width, height)}` and the seconds it took.
+    """
+    start = time.perf_counter()
+    with Image.open(io.BytesIO(data)) as original:
+        original.load()
+        image = _prepare(original, image_format)
+
+    renditions = {}
+    for name, size in sizes.items():
+        rendition = image.copy()
+        rendition.thumbnail(size, Image.LANCZOS)
+
+        output = io.BytesIO()
+        rendition.save(output, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+        renditions[name] = (output.getvalue(), rendition.width, rendition.height)
+
+    return image.width, image.height, renditions, time.perf_counter() - start
@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+from .models import ImageSource
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """
+    `{name: url}` of the renditions of an `ImageSource`, `None` until they are rendered (clients fall back to the
+    original). the renditions should be prefetched, e.g. `prefetch_related('image_source__renditions')`.
+    """
+
+    def to_representation(self, source):
+        if source is None or source.status != ImageSource.Status.DONE:
+            return None
+
+        request = self.context.get('request')
+        urls = {rendition.name: rendition.file.url for rendition in source.renditions.all()}
+        if request is not None:
+            urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+        return urls
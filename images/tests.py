@@ -0,0 +1,172 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from blog.models import Post
+from .models import ImageSource, Rendition
+from .pipeline import SyncPipeline, BackgroundPipeline
+
+MEDIA_ROOT = tempfile.mkdtemp()
+SIZES = {'thumbnail': (50, 50), 'feed': (200, 200)}
+
+
+def upload(color='red', size=(400, 300), name='photo.jpg'):
+    image = Image.new('RGB', size, color)
+    exif = Image.Exif()
+    exif[0x010f] = 'camera maker'
+    output = io.BytesIO()
+    image.save(output, format='JPEG', exif=exif)
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestRenditions(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='pictures@test.local', username='pictures', password='pass')
+
+    @classmethod
+    def tearDownClass(cls):
+        super(TestRenditions, cls).tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.pipeline = SyncPipeline(sizes=SIZES)
+        patcher = mock.patch('images.pipeline.image_pipeline', self.pipeline)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=self.user.profile, title='picture', content='c', **kwargs)
+
+    def test_renditions_are_resized_and_stripped(self):
+        post = self.create_post(image=upload())
+        source = ImageSource.objects.get(pk=post.image_source_id)
+
+        self.assertEqual((source.status, source.width, source.height), (ImageSource.Status.DONE, 400, 300))
+        for rendition in source.renditions.all():
+            with Image.open(rendition.file.path) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertLessEqual(image.size, SIZES[rendition.name])
+                self.assertNotIn('exif', image.info)
+
+    def test_same_content_is_rendered_once(self):
+        first = self.create_post(image=upload(name='one.jpg'))
+        second = self.create_post(image=upload(name='two.jpg'))
+        self.create_post(image=upload(color='blue'))
+
+        self.assertEqual(first.image_source_id, second.image_source_id)
+        self.assertEqual(self.pipeline.stats()['rendered'], 2)
+        self.assertEqual(Rendition.objects.count(), 2 * len(SIZES))
+
+    def test_serializers_expose_rendition_urls(self):
+        post = self.create_post(image=upload())
+        self.client.force_authenticate(self.user)
+
+        renditions = self.client.get(reverse('blog:post-detail', kwargs={'slug': post.slug})).data['image_renditions']
+        self.assertEqual(set(renditions), set(SIZES))
+        self.assertTrue(renditions['feed'].startswith('http://testserver/'))
+
+        self.user.profile.picture = upload(color='green')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.save()
+        response = self.client.get(reverse('accounts:profile-detail', kwargs={'uid': self.user.profile.uid}))
+        self.assertEqual(set(response.data['picture_renditions']), set(SIZES))
+
+    def test_background_pipeline_renders_out_of_the_request(self):
+        pipeline = BackgroundPipeline(sizes=SIZES, max_workers=1)
+        self.addCleanup(pipeline.stop)
+
+        with mock.patch('images.pipeline.image_pipeline', pipeline), \
+                mock.patch.object(pipeline, '_ensure_started'):
+            post = self.create_post(image=upload())
+
+        source = ImageSource.objects.get(pk=post.image_source_id)
+        self.assertEqual(source.status, ImageSource.Status.PENDING)
+
+        pipeline.flush()
+        source.refresh_from_db()
+        self.assertEqual(source.status, ImageSource.Status.DONE)
+        self.assertEqual(pipeline.stats()['rendered'], 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestMediaServing(APITestCase):
+    content = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestMediaServing, cls).setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'files'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, 'files', 'attachment.bin'), 'wb') as file:
+            file.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        super(TestMediaServing, cls).tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, path='files/attachment.bin', **headers):
+        return self.client.get(reverse('media', kwargs={'path': path}), **headers)
+
+    def test_conditional_requests(self):
+        response = self.get()
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_ranges(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 10-19/1024'))
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        self.assertEqual(b''.join(self.get(HTTP_RANGE='bytes=-4').streaming_content), self.content[-4:])
+        self.assertEqual(self.get(HTTP_RANGE='bytes=2000-').status_code, 416)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+    def test_sendfile_offload(self):
+        with mock.patch('images.views.MEDIA_SENDFILE', 'x-accel-redirect'):
+            response = self.get()
+
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/files/attachment.bin')
+        self.assertEqual(response.content, b'')
+
+        name = 'r\u00e9sum\u00e9 2021.bin'
+        with open(os.path.join(MEDIA_ROOT, 'files', name), 'wb') as file:
+            file.write(b'x')
+        with mock.patch('images.views.MEDIA_SENDFILE', 'x-accel-redirect'):
+            response = self.get(f'files/{name}')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/files/r%C3%A9sum%C3%A9%202021.bin')
+
+    def test_hashed_names_are_immutable_and_paths_stay_in_media_root(self):
+        name = f'{"a" * 64}-thumbnail.bin'
+        with open(os.path.join(MEDIA_ROOT, 'files', name), 'wb') as file:
+            file.write(b'x')
+
+        self.assertIn('immutable', self.get(f'files/{name}')['Cache-Control'])
+        self.assertEqual(self.get('../etc/passwd').status_code, 404)
+
+    def test_files_outside_media_root_are_not_served(self):
+        outside = tempfile.NamedTemporaryFile(dir=os.path.dirname(MEDIA_ROOT), suffix='.py')
+        self.addCleanup(outside.close)
+
+        self.assertEqual(self.get(f'../{os.path.basename(outside.name)}').status_code, 404)
+        self.assertEqual(self.get('config/settings.py').status_code, 404)
+        self.assertEqual(self.get(os.path.abspath('config/settings.py')).status_code, 404)
+
+        with override_settings(MEDIA_ROOT=''), self.assertRaises(ImproperlyConfigured):
+            self.get('config/settings.py')
@@ -0,0 +1,142 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import Http404, HttpResponse, FileResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+# `None` streams the files from django, 'x-accel-redirect' (nginx) and 'x-sendfile' (apache, lighttpd) hand the
+# response over to the web server, which then sends the bytes zero-copy instead of a django worker
+MEDIA_SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)
+# internal location of MEDIA_ROOT in the nginx config, for 'x-accel-redirect'
+MEDIA_SENDFILE_PREFIX = getattr(settings, 'MEDIA_SENDFILE_PREFIX', '/protected-media/')
+# how long clients may cache files whose name doesn't change with their content
+MEDIA_CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+
+# names holding the sha256 of their content (the renditions) never change, so they are cached "forever"
+CONTENT_HASHED = re.compile(r'(^|/)[0-9a-f]{64}[^/]*$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _file_of(path):
+    if not settings.MEDIA_ROOT:
+        raise ImproperlyConfigured('MEDIA_ROOT must be set to serve the media files')
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('file not found')
+
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('file not found')
+    return full_path, stat_result
+
+
+def _parse_range(header, size):
+    """`(start, end)` (inclusive) of a single byte range, `None` to send the whole file, `False` if unsatisfiable"""
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None  # multiple or malformed ranges are ignored, as the RFC allows
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:  # the last n bytes
+        start, end = max(size - int(last), 0), size - 1
+
+    return (start, end) if start < size and end >= start else False
+
+
+def _if_range_passes(request, etag, last_modified):
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _read(full_path, start, length):
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """
+    serves a file of MEDIA_ROOT with `ETag`/`Last-Modified` validators (answering conditional requests with 304),
+    single `Range` requests (206) and cache headers: content-hashed names are immutable, the rest are cached for
+    `MEDIA_CACHE_MAX_AGE` seconds. with `MEDIA_SENDFILE` set, the bytes (and ranges) are left to the web server.
+    """
+    full_path, stat_result = _file_of(path)
+    size, last_modified = stat_result.st_size, int(stat_result.st_mtime)
+    etag = quote_etag(f'{size:x}-{stat_result.st_mtime_ns:x}')
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, full_path, size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if CONTENT_HASHED.search(path):
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={MEDIA_CACHE_MAX_AGE}'
+    return response
+
+
+def _file_response(request, path, full_path, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_SENDFILE:
+        # percent-encoded, header values are ascii: nginx decodes the uri before looking it up, as mod_xsendfile
+        # (`XSendFileUnescape`, on by default) and lighttpd do the path
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(MEDIA_SENDFILE_PREFIX.rstrip('/') + '/' + path.lstrip('/'))
+        else:
+            response['X-Sendfile'] = quote(full_path)
+        return response
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_passes(request, etag, last_modified):
+        byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read(full_path, start, end - start + 1), status=206,
+                                         content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        # `FileResponse` goes through the server's `wsgi.file_wrapper`, i.e. `sendfile()` where available
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response